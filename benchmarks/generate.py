@@ -0,0 +1,137 @@
+"""
+Generate reproducible input files for the benchmarks.
+
+Run from the repository root:
+
+    python -m benchmarks.generate input/bench.txt --size 1GB --distribution zipf --seed 42
+"""
+import argparse
+import random
+from typing import Callable, IO
+
+DISTRIBUTIONS = ('uniform', 'zipf', 'duplicates', 'ascending', 'descending')
+SIZE_UNITS = {'B': 1, 'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3, 'TB': 1024 ** 4}
+URL_PREFIX = 'http://api.tech.com/item/'
+MAX_VALUE = 10 ** 9
+BATCH_LINES = 10_000
+
+
+def parse_size(size: str) -> int:
+    """
+    Parse a human readable size such as ``512KB`` or ``50GB``.
+
+    Args:
+        size (str): The size, a number optionally followed by B, KB, MB, GB or TB.
+
+    Returns:
+        int: The size in bytes.
+
+    Raises:
+        ValueError: If the size can not be parsed.
+    """
+    text = size.strip().upper()
+    for unit in sorted(SIZE_UNITS, key=len, reverse=True):
+        if text.endswith(unit):
+            return int(float(text[:-len(unit)]) * SIZE_UNITS[unit])
+    return int(text)
+
+
+def value_generator(distribution: str, rng: random.Random) -> Callable[[int], int]:
+    """
+    Create the value function of a distribution.
+
+    Args:
+        distribution (str): One of ``DISTRIBUTIONS``.
+        rng (random.Random): The seeded random number generator.
+
+    Returns:
+        Callable[[int], int]: A function mapping a line number to its value.
+
+    Raises:
+        ValueError: If the distribution is unknown.
+    """
+    if distribution == 'uniform':
+        return lambda _: rng.randrange(MAX_VALUE)
+    if distribution == 'zipf':
+        return lambda _: min(int(rng.paretovariate(1.1)), MAX_VALUE)
+    if distribution == 'duplicates':
+        return lambda _: 100 if rng.random() < 0.9 else rng.randrange(1000)
+    if distribution == 'ascending':
+        return lambda line: line
+    if distribution == 'descending':
+        return lambda line: MAX_VALUE - line
+    raise ValueError(f"Unknown distribution: {distribution}")
+
+
+def generate_file(file: IO, size: int, url_length: int = 40, distribution: str = 'uniform', seed: int = 0) -> int:
+    """
+    Write lines of ``<url> <value>`` until the file reaches the requested size.
+
+    Args:
+        file (IO): The text file to write to.
+        size (int): The minimum number of bytes to write.
+        url_length (int, optional): The length of every URL. Defaults to 40.
+        distribution (str, optional): The value distribution. Defaults to ``uniform``.
+        seed (int, optional): The random seed. Defaults to 0.
+
+    Returns:
+        int: The number of lines written.
+    """
+    rng = random.Random(seed)
+    value_of = value_generator(distribution, rng)
+    id_length = max(1, url_length - len(URL_PREFIX))
+    id_bits = 4 * min(id_length, 16)
+    written = 0
+    lines = 0
+    while written < size:
+        batch = []
+        for line in range(lines, lines + BATCH_LINES):
+            batch.append(f"{URL_PREFIX}{rng.getrandbits(id_bits):0{id_length}x} {value_of(line)}\n")
+        text = "".join(batch)
+        if written + len(text) > size:
+            text = "".join(_take_bytes(batch, size - written))
+        file.write(text)
+        written += len(text)
+        lines += text.count("\n")
+    return lines
+
+
+def _take_bytes(lines: list[str], size: int) -> list[str]:
+    """
+    Take whole lines until at least ``size`` bytes are taken.
+
+    Args:
+        lines (list[str]): The lines to take from.
+        size (int): The number of bytes to reach.
+
+    Returns:
+        list[str]: The first lines reaching the size.
+    """
+    taken, total = [], 0
+    for line in lines:
+        if total >= size:
+            break
+        taken.append(line)
+        total += len(line)
+    return taken
+
+
+def main() -> None:
+    """Generate a benchmark input file."""
+    parser = argparse.ArgumentParser(description="Generate a reproducible benchmark input file.")
+    parser.add_argument('file_path', type=str, help='The path of the file to write')
+    parser.add_argument('--size', type=parse_size, default=parse_size('100MB'),
+                        help='Size of the file, e.g. 1MB or 50GB (default: 100MB)')
+    parser.add_argument('--url-length', type=int, default=40, help='Length of every url (default: 40)')
+    parser.add_argument('--distribution', choices=DISTRIBUTIONS, default='uniform',
+                        help='Distribution of the values (default: uniform)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+    args = parser.parse_args()
+
+    with open(args.file_path, 'w') as file:
+        lines = generate_file(file, args.size, args.url_length, args.distribution, args.seed)
+    print(f"Wrote {lines} lines to {args.file_path}")
+
+
+if __name__ == "__main__":
+    main()
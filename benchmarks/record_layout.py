@@ -0,0 +1,93 @@
+"""
+Compare the memory and heap throughput of the record layout with the former dataclass.
+
+Run from the repository root:
+
+    python -m benchmarks.record_layout --records 1000000 --top 1000
+"""
+import argparse
+import heapq
+import random
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from src.models import Record
+
+
+@dataclass
+class DataclassRecord:
+    """The former record layout: a dataclass comparing values in Python methods."""
+    value: int
+    url: str
+
+    def __lt__(self, other: 'DataclassRecord') -> bool:
+        return self.value < other.value
+
+    def __le__(self, other: 'DataclassRecord') -> bool:
+        return self.value <= other.value
+
+    def __gt__(self, other: 'DataclassRecord') -> bool:
+        return self.value > other.value
+
+    def __ge__(self, other: 'DataclassRecord') -> bool:
+        return self.value >= other.value
+
+
+def record_size(record: Any) -> int:
+    """
+    Get the memory used by a record itself, excluding the shared value and URL objects.
+
+    Args:
+        record (Any): The record to measure.
+
+    Returns:
+        int: The size of the record and its instance dictionary, in bytes.
+    """
+    size = sys.getsizeof(record)
+    if hasattr(record, '__dict__'):
+        size += sys.getsizeof(record.__dict__)
+    return size
+
+
+def heap_ops_per_second(make_record: Callable[[int, str], Any], values: list[int], top: int) -> float:
+    """
+    Measure how many records per second go through a bounded min-heap.
+
+    Args:
+        make_record (Callable[[int, str], Any]): The record constructor.
+        values (list[int]): The values of the records.
+        top (int): The size of the heap.
+
+    Returns:
+        float: The number of heap operations per second.
+    """
+    records = [make_record(value, f"http://api.tech.com/item/{i}") for i, value in enumerate(values)]
+    heap: list[Any] = []
+    start = time.perf_counter()
+    for record in records:
+        if len(heap) < top:
+            heapq.heappush(heap, record)
+        else:
+            heapq.heappushpop(heap, record)
+    return len(records) / (time.perf_counter() - start)
+
+
+def main() -> None:
+    """Print the per-record memory and heap throughput of both layouts."""
+    parser = argparse.ArgumentParser(description="Compare record layouts.")
+    parser.add_argument('--records', type=int, default=1_000_000, help='Number of records (default: 1000000)')
+    parser.add_argument('--top', type=int, default=1000, help='Size of the heap (default: 1000)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+    args = parser.parse_args()
+
+    values = random.Random(args.seed).choices(range(10 ** 9), k=args.records)
+    for name, make_record in (('dataclass (before)', DataclassRecord), ('Record (after)', Record)):
+        size = record_size(make_record(1, "http://api.tech.com/item/1"))
+        rate = heap_ops_per_second(make_record, values, args.top)
+        print(f"{name:<20} {size:>4} bytes/record {rate:>14,.0f} heap ops/s")
+
+
+if __name__ == "__main__":
+    main()
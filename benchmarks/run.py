@@ -0,0 +1,138 @@
+"""
+Run every engine against benchmark files and record the results as JSON.
+
+Every run is a separate ``src/main.py`` process, so wall time includes startup and peak RSS
+covers the process and its workers. Run from the repository root:
+
+    python -m benchmarks.run input/bench.txt --engines text mmap process --tops 10 1000 --output results.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from src.file_processors import ENGINES
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def count_lines(file_path: str) -> int:
+    """
+    Count the lines of a file.
+
+    Args:
+        file_path (str): The path to the file.
+
+    Returns:
+        int: The number of lines.
+    """
+    with open(file_path, 'rb') as file:
+        return sum(block.count(b'\n') for block in iter(lambda: file.read(1 << 20), b''))
+
+
+def run_once(file_path: str, engine: str, chunk_size: int, top: int, workers: Optional[int]) -> dict[str, Any]:
+    """
+    Run ``src/main.py`` once and measure it.
+
+    Args:
+        file_path (str): The path to the input file.
+        engine (str): The engine to run.
+        chunk_size (int): The chunk size passed to ``--chunk-size``.
+        top (int): The number of top records to retrieve.
+        workers (Optional[int]): The number of workers, or None for the default.
+
+    Returns:
+        dict[str, Any]: The wall time in seconds, the peak RSS in KB and the return code.
+    """
+    command = [sys.executable, os.path.join(REPO_ROOT, 'src', 'main.py'), file_path,
+               '--engine', engine, '--top', str(top), '--chunk-size', str(chunk_size)]
+    if workers:
+        command += ['--workers', str(workers)]
+    env = {**os.environ, 'PYTHONPATH': REPO_ROOT, 'LOG_LEVEL': 'ERROR'}
+    start = time.perf_counter()
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL)
+    _, status, usage = os.wait4(process.pid, 0)
+    wall = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is in KB on Linux and covers the waited-for worker processes as well
+    return {'wall_s': wall, 'peak_rss_kb': usage.ru_maxrss, 'returncode': process.returncode}
+
+
+def run_benchmarks(file_paths: list[str], engines: list[str], chunk_sizes: list[int], tops: list[int],
+                   workers: Optional[int] = None, repeat: int = 1) -> dict[str, Any]:
+    """
+    Run every combination of file, engine, chunk size and top, keeping the fastest repetition.
+
+    Args:
+        file_paths (list[str]): The input files.
+        engines (list[str]): The engines to run.
+        chunk_sizes (list[int]): The chunk sizes to run.
+        tops (list[int]): The numbers of top records to run.
+        workers (Optional[int], optional): The number of workers. Defaults to None.
+        repeat (int, optional): The number of repetitions of every run. Defaults to 1.
+
+    Returns:
+        dict[str, Any]: The environment description and one result per combination.
+    """
+    results = []
+    for file_path in file_paths:
+        size = os.stat(file_path).st_size
+        lines = count_lines(file_path)
+        for engine in engines:
+            for chunk_size in chunk_sizes:
+                for top in tops:
+                    runs = [run_once(file_path, engine, chunk_size, top, workers) for _ in range(repeat)]
+                    best = min(runs, key=lambda run: run['wall_s'])
+                    results.append({
+                        'file': file_path,
+                        'size_bytes': size,
+                        'lines': lines,
+                        'engine': engine,
+                        'chunk_size': chunk_size,
+                        'top': top,
+                        'workers': workers,
+                        'wall_s': round(best['wall_s'], 4),
+                        'lines_per_s': round(lines / best['wall_s']),
+                        'mb_per_s': round(size / best['wall_s'] / 1024 ** 2, 2),
+                        'peak_rss_kb': max(run['peak_rss_kb'] for run in runs),
+                        'returncode': best['returncode'],
+                    })
+                    print(f"{engine:<8} chunk={chunk_size:<10} top={top:<8} {results[-1]['wall_s']:>9.3f} s "
+                          f"{results[-1]['mb_per_s']:>9.2f} MB/s {results[-1]['peak_rss_kb']:>9} KB")
+    return {
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'results': results,
+    }
+
+
+def main() -> None:
+    """Run the benchmarks and write the results as JSON."""
+    parser = argparse.ArgumentParser(description="Benchmark the engines of src/main.py.")
+    parser.add_argument('file_paths', nargs='+', help='The input files to benchmark')
+    parser.add_argument('--engines', nargs='+', choices=ENGINES, default=list(ENGINES),
+                        help='Engines to run (default: all)')
+    parser.add_argument('--chunk-sizes', nargs='+', type=int, default=[0],
+                        help='Values passed to --chunk-size (default: 0)')
+    parser.add_argument('--tops', nargs='+', type=int, default=[10], help='Values passed to --top (default: 10)')
+    parser.add_argument('--workers', type=int, default=None, help='Value passed to --workers (default: unset)')
+    parser.add_argument('--repeat', type=int, default=1, help='Repetitions of every run, the fastest is kept (default: 1)')
+    parser.add_argument('--output', type=str, default='bench_results.json',
+                        help='The JSON file to write (default: bench_results.json)')
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.file_paths, args.engines, args.chunk_sizes, args.tops, args.workers, args.repeat)
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f"Wrote {len(report['results'])} results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
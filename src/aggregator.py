@@ -0,0 +1,175 @@
+import heapq
+import os
+import shutil
+import tempfile
+import zlib
+from typing import Optional
+
+from src.heap_manager import HeapManager
+from src.helpers import Logger
+from src.models import Record
+
+logger = Logger().get_logger()
+
+AGGREGATES = ('sum', 'max', 'count')
+ENTRY_BYTES = 120  # Approximate memory of a dict entry, its int and the str object, besides the URL itself
+PARTITION_BITS = 6
+MAX_LEVEL = 32 // PARTITION_BITS  # Every level partitions on other bits of the CRC-32 of the URL
+
+
+class Aggregator(HeapManager):
+    """
+    Aggregates the values of every URL, then keeps the top N URLs by their aggregate.
+
+    When the URLs held in memory exceed the memory budget, they are hash-partitioned into spill files.
+    Every URL goes to the same partition whichever aggregator spills it, so partitions are aggregated
+    one at a time at the end, each partition spilling into sub-partitions again if it is too large.
+    """
+
+    ranks_lines = False
+
+    def __init__(self, n: int, aggregate: str = 'sum', memory_budget: int = 512 * 1024 * 1024,
+                 spill_dir: Optional[str] = None, level: int = 0) -> None:
+        """
+        Initialize the aggregator.
+
+        Args:
+            n (int): The number of top URLs to keep.
+            aggregate (str, optional): ``sum``, ``max`` or ``count`` of the values of a URL. Defaults to ``sum``.
+            memory_budget (int, optional): The approximate number of bytes of URLs and aggregates held in
+                memory before spilling them. Defaults to 512 MB.
+            spill_dir (Optional[str], optional): The directory spill files are created in. Defaults to the
+                temporary directory of the system.
+            level (int, optional): The partitioning level, 0 for the aggregation of the scan and one more
+                for every spilled partition being aggregated. Defaults to 0.
+
+        Raises:
+            ValueError: If the aggregate is unknown.
+        """
+        if aggregate not in AGGREGATES:
+            raise ValueError(f"Unknown aggregate: {aggregate}")
+        super().__init__(n)
+        self.threshold = float('-inf') if n > 0 else float('inf')  # Every line counts towards its URL
+        self.aggregate = aggregate
+        self.memory_budget = memory_budget
+        self.spill_dir = spill_dir
+        self.level = level
+        self.values: dict[str, int] = {}
+        self.partitions: list[list[str]] = [[] for _ in range(1 << PARTITION_BITS)]
+        self.directories: list[str] = []
+        self.spills = 0
+        self.__size = 0
+
+    def add_record(self, record: Record) -> None:
+        """
+        Add the value of a line to the aggregate of its URL.
+
+        Args:
+            record (Record): The record of the line.
+        """
+        self.add(record.url, 1 if self.aggregate == 'count' else record.value)
+
+    def add(self, url: str, value: int) -> None:
+        """
+        Combine a partial aggregate of a URL with its aggregate.
+
+        Args:
+            url (str): The URL.
+            value (int): The partial aggregate: a value, or a count for ``count``.
+        """
+        current = self.values.get(url)
+        if current is None:
+            self.values[url] = value
+            self.__size += len(url) + ENTRY_BYTES
+            if self.__size > self.memory_budget and self.level < MAX_LEVEL:
+                self.spill()
+        elif self.aggregate == 'max':
+            if value > current:
+                self.values[url] = value
+        else:
+            self.values[url] = current + value
+
+    def merge(self, *others: 'Aggregator') -> None:
+        """
+        Merge the partial aggregates of other aggregators, such as the workers', into this one.
+
+        Args:
+            *others (Aggregator): The aggregators to merge into this one.
+        """
+        for other in others:
+            for url, value in other.values.items():
+                self.add(url, value)
+            for partition, files in zip(self.partitions, other.partitions):
+                partition.extend(files)
+            self.directories.extend(other.directories)
+            self.spills += other.spills
+            self.replacements += other.replacements
+            self.rejected += other.rejected
+            self.rejected_early += other.rejected_early
+
+    def empty_copy(self) -> 'Aggregator':
+        """
+        Create an empty aggregator with the same aggregate, budget and partitioning.
+
+        Returns:
+            Aggregator: A new, empty aggregator.
+        """
+        return Aggregator(self.n, self.aggregate, self.memory_budget, self.spill_dir, self.level)
+
+    def spill(self) -> None:
+        """Append the aggregates held in memory to the files of their partitions and clear them."""
+        if not self.values:
+            return
+        if not self.directories:
+            self.directories.append(tempfile.mkdtemp(prefix='topn-spill-', dir=self.spill_dir))
+        shift = PARTITION_BITS * self.level
+        mask = (1 << PARTITION_BITS) - 1
+        lines: list[list[str]] = [[] for _ in self.partitions]
+        for url, value in self.values.items():
+            lines[(zlib.crc32(url.encode('utf-8')) >> shift) & mask].append(f"{url} {value}\n")
+        for index, partition in enumerate(lines):
+            if not partition:
+                continue
+            path = os.path.join(self.directories[0], f"{self.level}-{index}")
+            with open(path, 'a', encoding='utf-8') as file:
+                file.writelines(partition)
+            if path not in self.partitions[index]:
+                self.partitions[index].append(path)
+        logger.debug(f"Spilled {len(self.values)} URLs to {self.directories[0]}")
+        self.spills += 1
+        self.values = {}
+        self.__size = 0
+
+    def get_top_records(self) -> list[Record]:
+        """
+        Get the top URLs by their aggregate, aggregating the spilled partitions one at a time.
+
+        Returns:
+            List[Record]: The top URLs and their aggregates sorted in descending order.
+        """
+        if self.n <= 0:
+            return []
+        if not self.spills:
+            return heapq.nlargest(self.n, (Record(value, url) for url, value in self.values.items()))
+        self.spill()
+        top: list[Record] = []
+        for files in self.partitions:
+            if not files:
+                continue
+            partition = Aggregator(self.n, self.aggregate, self.memory_budget, self.spill_dir, self.level + 1)
+            try:
+                for path in files:
+                    with open(path, 'r', encoding='utf-8') as file:
+                        for line in file:
+                            url, value = line.rsplit(' ', 1)
+                            partition.add(url, int(value))
+                top = heapq.nlargest(self.n, [*top, *partition.get_top_records()])
+            finally:
+                partition.close()
+        return top
+
+    def close(self) -> None:
+        """Remove the spill files."""
+        for directory in self.directories:
+            shutil.rmtree(directory, ignore_errors=True)
+        self.directories = []
@@ -0,0 +1,218 @@
+import json
+import os
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from src.filters import LineFilter
+from src.heap_manager import HeapManager
+from src.models import Record
+from src.selection import selector_for
+
+FILTER_FIELDS = ('url_prefix', 'url_contains', 'url_regex', 'min_value', 'max_value')
+
+
+@dataclass(frozen=True)
+class BatchQuery:
+    """A query of a batch: its number of top records and the conditions its lines must meet."""
+    top: int
+    line_filter: Optional[LineFilter] = None
+    id: Any = None
+
+
+def load_queries(path: str, default_top: int = 10) -> list[BatchQuery]:
+    """
+    Read the queries of a batch from a JSONL file, one JSON object per line with ``top`` and any of
+    ``url_prefix``, ``url_contains``, ``url_regex``, ``min_value``, ``max_value`` and ``id``.
+
+    Args:
+        path (str): The path to the file of queries.
+        default_top (int, optional): The number of top records of the queries without ``top``. Defaults to 10.
+
+    Returns:
+        list[BatchQuery]: The queries, their ids defaulting to their line numbers.
+
+    Raises:
+        ValueError: If a line is not a valid query, or there is no query.
+        OSError: If the file can not be read.
+    """
+    queries = []
+    with open(path, 'r', encoding='utf-8') as file:
+        for number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            try:
+                spec = json.loads(line)
+                if not isinstance(spec, dict):
+                    raise ValueError("a query must be a JSON object")
+                unknown = set(spec) - {'top', 'id', *FILTER_FIELDS}
+                if unknown:
+                    raise ValueError(f"unknown fields {', '.join(sorted(unknown))}")
+                top = spec.get('top', default_top)
+                if not isinstance(top, int) or isinstance(top, bool) or top < 0:
+                    raise ValueError(f"invalid top {top!r}")
+                line_filter = LineFilter(*(spec.get(field) for field in FILTER_FIELDS))
+            except ValueError as e:
+                raise ValueError(f"Invalid query on line {number} of {path}: {e}") from e
+            queries.append(BatchQuery(top, line_filter or None, spec.get('id', number)))
+    if not queries:
+        raise ValueError(f"No query in {path}")
+    return queries
+
+
+def shared_filter(filters: list[Optional[LineFilter]]) -> Optional[LineFilter]:
+    """
+    Get the strictest filter that every line passing any of the filters also passes, so the readers drop
+    the lines no query needs before records are built.
+
+    Args:
+        filters (list[Optional[LineFilter]]): The filters of the queries, None for a query without one.
+
+    Returns:
+        Optional[LineFilter]: The shared filter, or None if every line may be needed.
+    """
+    if not filters or any(line_filter is None for line_filter in filters):
+        return None
+    prefixes = [line_filter.url_prefix for line_filter in filters]
+    prefix = os.path.commonprefix(prefixes) if None not in prefixes else ''
+    minima = [line_filter.min_value for line_filter in filters]
+    maxima = [line_filter.max_value for line_filter in filters]
+
+    def same(field: str) -> Optional[str]:
+        values = {getattr(line_filter, field) for line_filter in filters}
+        return values.pop() if len(values) == 1 else None
+
+    shared = LineFilter(prefix or None, same('url_contains'), same('url_regex'),
+                        None if None in minima else min(minima), None if None in maxima else max(maxima))
+    return shared or None
+
+
+class BatchHeapManager(HeapManager):
+    """
+    Keeps the top records of several queries in one scan.
+
+    Every record built by the readers is offered to the selector of every query whose filter it passes.
+    The admission threshold is the lowest threshold of the queries, so a line is only parsed into a
+    record if it can enter the top records of at least one query.
+    """
+
+    ranks_lines = False
+
+    def __init__(self, queries: list[BatchQuery], memory_budget: int = 512 * 1024 * 1024,
+                 spill_dir: Optional[str] = None) -> None:
+        """
+        Initialize the batch heap manager.
+
+        Args:
+            queries (list[BatchQuery]): The queries.
+            memory_budget (int, optional): The approximate number of bytes of top records held in memory by
+                the selector of every query. Defaults to 512 MB.
+            spill_dir (Optional[str], optional): The directory the selectors spill to. Defaults to the
+                temporary directory of the system.
+        """
+        super().__init__(max((query.top for query in queries), default=0))
+        self.queries = queries
+        self.memory_budget = memory_budget
+        self.spill_dir = spill_dir
+        self.selectors = [selector_for(query.top, memory_budget, spill_dir) for query in queries]
+        self.__conditions = self.__query_conditions()
+        self.threshold = self.__lowest_threshold()
+
+    def __query_conditions(self) -> list[tuple[float, float, Optional[Callable[[Record], bool]], HeapManager]]:
+        """
+        Get the value range, the URL test and the selector of every query, the value range being tested
+        inline so most records are rejected without a call.
+
+        Returns:
+            list[tuple[float, float, Optional[Callable[[Record], bool]], HeapManager]]: The lowest and highest
+                values, the record test (None unless the query filters URLs) and the selector of every query.
+        """
+        conditions = []
+        for query, selector in zip(self.queries, self.selectors):
+            line_filter = query.line_filter or LineFilter()
+            low, high = line_filter.value_range()
+            test = line_filter.record_test() if line_filter.filters_urls() else None
+            conditions.append((low, high, test, selector))
+        return conditions
+
+    def __getstate__(self) -> dict[str, Any]:
+        # The record tests are closures, rebuilt from the filters when a worker unpickles the manager
+        state = self.__dict__.copy()
+        del state['_BatchHeapManager__conditions']
+        return state
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self.__conditions = self.__query_conditions()
+
+    def add_record(self, record: Record) -> None:
+        """
+        Offer a record to the selector of every query whose filter it passes.
+
+        Args:
+            record (Record): The record to add.
+        """
+        value = record.value
+        added = False
+        for low, high, test, selector in self.__conditions:
+            if low <= value <= high and value >= selector.threshold and (test is None or test(record)):
+                selector.add_record(record)
+                added = True
+        if added:  # Thresholds only rise when a selector takes a record
+            self.threshold = self.__lowest_threshold()
+
+    def __lowest_threshold(self) -> float:
+        """
+        Get the lowest value any query can still take: the lowest of the thresholds of the queries, each raised
+        to the lowest value of its value range.
+
+        Returns:
+            float: The admission threshold of the batch.
+        """
+        return min((max(low, selector.threshold) for low, _, _, selector in self.__conditions), default=float('inf'))
+
+    def merge(self, *others: 'BatchHeapManager') -> None:
+        """
+        Merge the selectors of other batch heap managers, such as the workers', query by query.
+
+        Args:
+            *others (BatchHeapManager): The batch heap managers to merge into this one.
+        """
+        for index, selector in enumerate(self.selectors):
+            selector.merge(*(other.selectors[index] for other in others))
+        self.threshold = self.__lowest_threshold()
+        for other in others:
+            self.replacements += other.replacements
+            self.rejected += other.rejected
+            self.rejected_early += other.rejected_early
+
+    def empty_copy(self) -> 'BatchHeapManager':
+        """
+        Create an empty batch heap manager for the same queries.
+
+        Returns:
+            BatchHeapManager: A new, empty batch heap manager.
+        """
+        return BatchHeapManager(self.queries, self.memory_budget, self.spill_dir)
+
+    def results(self) -> list[list[Record]]:
+        """
+        Get the top records of every query.
+
+        Returns:
+            list[list[Record]]: The top records of every query sorted in descending order, in the order of the queries.
+        """
+        return [selector.get_top_records() for selector in self.selectors]
+
+    def get_top_records(self) -> list[Record]:
+        """
+        Get the top records of every query, one query after the other.
+
+        Returns:
+            List[Record]: The top records of the first query, then those of the second one, and so on.
+        """
+        return [record for records in self.results() for record in records]
+
+    def close(self) -> None:
+        """Release the spill files of the selectors."""
+        for selector in self.selectors:
+            selector.close()
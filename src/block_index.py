@@ -0,0 +1,99 @@
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from typing import Optional
+
+from src.helpers import Logger, write_json_atomic
+
+logger = Logger().get_logger()
+
+INDEX_SUFFIX = '.topn-index'
+INDEX_VERSION = 1
+
+
+@dataclass
+class Block:
+    """A block of whole lines of an indexed file."""
+    start: int
+    end: int
+    max_value: Optional[int]
+    lines: int
+
+
+@dataclass
+class BlockIndex:
+    """Byte offsets, maximum values and line counts of the blocks of a file."""
+    size: int
+    mtime_ns: int
+    block_size: int
+    blocks: list[Block] = field(default_factory=list)
+
+    @staticmethod
+    def path_for(file_path: str) -> str:
+        """
+        Get the path of the sidecar index of a file.
+
+        Args:
+            file_path (str): The path to the indexed file.
+
+        Returns:
+            str: The path of the sidecar index.
+        """
+        return file_path + INDEX_SUFFIX
+
+    @classmethod
+    def for_file(cls, file_path: str, block_size: int) -> 'BlockIndex':
+        """
+        Create an empty index stamped with the current size and modification time of a file.
+
+        Args:
+            file_path (str): The path to the file to index.
+            block_size (int): The approximate number of bytes in each block.
+
+        Returns:
+            BlockIndex: The empty index.
+        """
+        stat = os.stat(file_path)
+        return cls(stat.st_size, stat.st_mtime_ns, block_size)
+
+    @classmethod
+    def load(cls, index_path: str, file_path: str) -> Optional['BlockIndex']:
+        """
+        Load the index of a file, unless it is missing, unreadable or stale.
+
+        Args:
+            index_path (str): The path of the sidecar index.
+            file_path (str): The path to the indexed file.
+
+        Returns:
+            Optional[BlockIndex]: The index, or None if it can not be used.
+        """
+        try:
+            with open(index_path, 'r') as file:
+                data = json.load(file)
+            index = cls(data['size'], data['mtime_ns'], data['block_size'],
+                        [Block(**block) for block in data['blocks']])
+            if data['version'] != INDEX_VERSION:
+                return None
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable index {index_path}: {e}")
+            return None
+        stat = os.stat(file_path)
+        if (index.size, index.mtime_ns) != (stat.st_size, stat.st_mtime_ns):
+            logger.info(f"Index {index_path} is stale, rebuilding it")
+            return None
+        return index
+
+    def save(self, index_path: str) -> None:
+        """
+        Write the index atomically, so readers never see a partial index.
+
+        Args:
+            index_path (str): The path of the sidecar index.
+        """
+        try:
+            write_json_atomic(index_path, {'version': INDEX_VERSION, **asdict(self)})
+        except OSError as e:
+            logger.warning(f"Unable to write index {index_path}: {e}")
@@ -0,0 +1,198 @@
+import json
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Optional
+
+from src.filters import LineFilter
+from src.heap_manager import HeapManager
+from src.helpers import Logger, write_json_atomic
+from src.models import Record
+
+logger = Logger().get_logger()
+
+CHECKPOINT_VERSION = 2
+
+
+def scan_query(line_filter: Optional[LineFilter] = None, skip_malformed: bool = False) -> dict[str, Any]:
+    """
+    Get the options of a scan its top records depend on, besides the file and their number.
+
+    Args:
+        line_filter (Optional[LineFilter], optional): The conditions the lines must meet. Defaults to None.
+        skip_malformed (bool, optional): Whether malformed lines are skipped. Defaults to False.
+
+    Returns:
+        dict[str, Any]: The JSON-serializable options.
+    """
+    return {'line_filter': None if line_filter is None else asdict(line_filter), 'skip_malformed': skip_malformed}
+
+
+@dataclass
+class Checkpoint:
+    """
+    Progress of a scan: the identity of the file and of the query, its chunks, the chunks done and their merged
+    top records.
+    """
+    file_path: str
+    size: int
+    mtime_ns: int
+    inode: int
+    top: int
+    ranges: list[tuple[int, int]]
+    done: list[tuple[int, int]] = field(default_factory=list)
+    records: list[Record] = field(default_factory=list)
+    query: dict[str, Any] = field(default_factory=scan_query)
+
+    @classmethod
+    def for_file(cls, file_path: str, top: int, ranges: list[tuple[int, int]],
+                 query: Optional[dict[str, Any]] = None) -> 'Checkpoint':
+        """
+        Create the checkpoint of a new scan.
+
+        Args:
+            file_path (str): The path to the scanned file.
+            top (int): The number of top records of the scan.
+            ranges (list[tuple[int, int]]): The byte ranges of the chunks of the scan.
+            query (Optional[dict[str, Any]], optional): The options of the scan, from ``scan_query``. Defaults to
+                None, an unfiltered scan failing on malformed lines.
+
+        Returns:
+            Checkpoint: The checkpoint, with no chunk done.
+        """
+        stat = os.stat(file_path)
+        return cls(os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns, stat.st_ino, top, list(ranges),
+                   query=query or scan_query())
+
+    @classmethod
+    def load(cls, checkpoint_path: str, file_path: str, top: int,
+             query: Optional[dict[str, Any]] = None) -> Optional['Checkpoint']:
+        """
+        Load the checkpoint of a scan, unless it is missing, unreadable or for another file or query.
+
+        Args:
+            checkpoint_path (str): The path of the checkpoint.
+            file_path (str): The path to the scanned file.
+            top (int): The number of top records of the scan.
+            query (Optional[dict[str, Any]], optional): The options of the scan, from ``scan_query``. Defaults to
+                None, an unfiltered scan failing on malformed lines.
+
+        Returns:
+            Optional[Checkpoint]: The checkpoint, or None if the scan can not be resumed from it.
+        """
+        try:
+            with open(checkpoint_path, 'r') as file:
+                data = json.load(file)
+            if data['version'] != CHECKPOINT_VERSION:
+                return None
+            checkpoint = cls(data['file_path'], data['size'], data['mtime_ns'], data['inode'], data['top'],
+                             [tuple(chunk) for chunk in data['ranges']], [tuple(chunk) for chunk in data['done']],
+                             [Record(value, url) for value, url in data['records']], data['query'])
+        except FileNotFoundError:
+            logger.info(f"No checkpoint at {checkpoint_path}, starting from the beginning")
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable checkpoint {checkpoint_path}: {e}")
+            return None
+        current = cls.for_file(file_path, top, [], query)
+        if (checkpoint.file_path, checkpoint.size, checkpoint.mtime_ns, checkpoint.inode, checkpoint.top,
+                checkpoint.query) != (current.file_path, current.size, current.mtime_ns, current.inode, current.top,
+                                      current.query):
+            logger.warning(f"Checkpoint {checkpoint_path} is for another file or query, starting from the beginning")
+            return None
+        return checkpoint
+
+    def pending(self) -> list[tuple[int, int]]:
+        """
+        Get the chunks that are not done yet.
+
+        Returns:
+            list[tuple[int, int]]: The byte ranges of the chunks left to scan.
+        """
+        done = set(self.done)
+        return [chunk for chunk in self.ranges if chunk not in done]
+
+    def heap_manager(self) -> HeapManager:
+        """
+        Get the top records of the chunks done.
+
+        Returns:
+            HeapManager: A heap manager holding the records of the checkpoint.
+        """
+        heap_manager = HeapManager(self.top)
+        for record in self.records:
+            heap_manager.add_record(record)
+        return heap_manager
+
+    def save(self, checkpoint_path: str) -> None:
+        """
+        Write the checkpoint atomically, so a scan killed while writing it leaves the previous one.
+
+        Args:
+            checkpoint_path (str): The path of the checkpoint.
+        """
+        data = {
+            'version': CHECKPOINT_VERSION,
+            'file_path': self.file_path,
+            'size': self.size,
+            'mtime_ns': self.mtime_ns,
+            'inode': self.inode,
+            'top': self.top,
+            'ranges': self.ranges,
+            'done': self.done,
+            'records': self.records,
+            'query': self.query,
+        }
+        try:
+            write_json_atomic(checkpoint_path, data)
+        except OSError as e:
+            logger.warning(f"Unable to write checkpoint {checkpoint_path}: {e}")
+
+
+class CheckpointWriter:
+    """Records the chunks done by a scan and writes its checkpoint at most once per interval."""
+
+    def __init__(self, checkpoint_path: str, checkpoint: Checkpoint, interval: float = 10.0) -> None:
+        """
+        Initialize the checkpoint writer.
+
+        Args:
+            checkpoint_path (str): The path of the checkpoint.
+            checkpoint (Checkpoint): The checkpoint of the scan.
+            interval (float, optional): The minimum number of seconds between two writes. Defaults to 10.
+        """
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint = checkpoint
+        self.interval = interval
+        self.__written = time.monotonic()
+
+    def chunk_done(self, start: int, end: int, heap_manager: HeapManager) -> None:
+        """
+        Record a chunk whose records were merged into the heap manager, writing the checkpoint if due.
+
+        Args:
+            start (int): The byte offset at which the chunk starts.
+            end (int): The byte offset at which the chunk ends.
+            heap_manager (HeapManager): The heap manager holding the records of every chunk done.
+        """
+        self.checkpoint.done.append((start, end))
+        if time.monotonic() - self.__written >= self.interval:
+            self.write(heap_manager)
+
+    def write(self, heap_manager: HeapManager) -> None:
+        """
+        Write the checkpoint with a snapshot of the heap manager.
+
+        Args:
+            heap_manager (HeapManager): The heap manager holding the records of every chunk done.
+        """
+        self.checkpoint.records = list(heap_manager.min_heap)
+        self.checkpoint.save(self.checkpoint_path)
+        self.__written = time.monotonic()
+
+    def finish(self) -> None:
+        """Remove the checkpoint of a scan that completed."""
+        try:
+            os.remove(self.checkpoint_path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,203 @@
+import os
+import shutil
+import struct
+import sys
+import tempfile
+from array import array
+from typing import NamedTuple, Optional, Sequence, Type
+
+from src.helpers import FileReadError
+from src.models import Record
+
+COLUMNAR_MAGIC = b'TOPNCOL\x00'
+COLUMNAR_VERSION = 1
+# Magic, version, reserved, number of lines, offsets of the value column, the URL offset column and the URL blob
+HEADER = struct.Struct('<8sIIQQQQ')
+WRITE_BATCH = 64 * 1024
+
+
+class ColumnarHeader(NamedTuple):
+    """
+    The header of a columnar file.
+
+    The file holds a little-endian ``int64`` value per line, then ``count + 1`` little-endian ``uint64`` offsets of
+    the URLs in the blob, then the blob of the UTF-8 URLs themselves.
+    """
+    count: int
+    values_offset: int
+    url_offsets_offset: int
+    urls_offset: int
+
+    @classmethod
+    def read(cls, buffer: bytes) -> 'ColumnarHeader':
+        """
+        Read the header at the start of a columnar file.
+
+        Args:
+            buffer (bytes): The file, or at least its first ``HEADER.size`` bytes.
+
+        Returns:
+            ColumnarHeader: The header.
+
+        Raises:
+            FileReadError: If the file is not a columnar file of this version.
+        """
+        if len(buffer) < HEADER.size:
+            raise FileReadError("Truncated columnar file")
+        magic, version, _, count, values_offset, url_offsets_offset, urls_offset = HEADER.unpack_from(buffer)
+        if magic != COLUMNAR_MAGIC:
+            raise FileReadError("Not a columnar file")
+        if version != COLUMNAR_VERSION:
+            raise FileReadError(f"Unsupported columnar file version {version}")
+        return cls(count, values_offset, url_offsets_offset, urls_offset)
+
+    def pack(self) -> bytes:
+        """
+        Pack the header.
+
+        Returns:
+            bytes: The header bytes.
+        """
+        return HEADER.pack(COLUMNAR_MAGIC, COLUMNAR_VERSION, 0, *self)
+
+
+def is_columnar(file_path: str) -> bool:
+    """
+    Check whether a file is a columnar file from its magic bytes.
+
+    Args:
+        file_path (str): The path to the file.
+
+    Returns:
+        bool: Whether the file starts with the columnar magic bytes.
+
+    Raises:
+        IOError: If the file can not be read.
+    """
+    with open(file_path, 'rb') as file:
+        return file.read(len(COLUMNAR_MAGIC)) == COLUMNAR_MAGIC
+
+
+def _little_endian(column: array) -> array:
+    """Convert a column to little-endian in place, on big-endian machines."""
+    if sys.byteorder == 'big':
+        column.byteswap()
+    return column
+
+
+def read_column(buffer: bytes, offset: int, count: int, typecode: str) -> Sequence[int]:
+    """
+    Read a column of 64-bit integers, without a copy on little-endian machines.
+
+    The returned view holds an export of the buffer, so it must be released before a memory map is closed.
+
+    Args:
+        buffer (bytes): The columnar file, usually memory-mapped.
+        offset (int): The offset of the column.
+        count (int): The number of integers.
+        typecode (str): ``q`` for signed and ``Q`` for unsigned integers.
+
+    Returns:
+        Sequence[int]: The integers.
+    """
+    view = memoryview(buffer)[offset:offset + count * 8]
+    if sys.byteorder == 'little':
+        return view.cast(typecode)
+    column = array(typecode, view)
+    view.release()
+    column.byteswap()
+    return column
+
+
+class ColumnarWriter:
+    """
+    Writes records to a columnar file.
+
+    Values are written straight after the header, URL offsets and URLs go to temporary files next to the
+    output that are appended once the number of lines is known, so memory stays bounded whatever the
+    number of lines. The file is renamed into place when the writer is closed.
+    """
+
+    def __init__(self, output_path: str) -> None:
+        """
+        Initialize the writer.
+
+        Args:
+            output_path (str): The path of the columnar file.
+
+        Raises:
+            OSError: If the output can not be created.
+        """
+        self.output_path = output_path
+        directory = os.path.dirname(os.path.abspath(output_path))
+        self.count = 0
+        self.__url_bytes = 0
+        self.__values = array('q')
+        self.__offsets = array('Q')
+        self.__urls: list[bytes] = []
+        self.__output = tempfile.NamedTemporaryFile('wb', dir=directory, suffix='.tmp', delete=False)
+        self.__offsets_file = tempfile.TemporaryFile(dir=directory)
+        self.__urls_file = tempfile.TemporaryFile(dir=directory)
+        self.__output.write(bytes(HEADER.size))
+
+    def add(self, record: Record) -> None:
+        """
+        Add a record.
+
+        Args:
+            record (Record): The record.
+
+        Raises:
+            FileReadError: If its value does not fit a 64-bit integer.
+        """
+        try:
+            self.__values.append(record.value)
+        except OverflowError as e:
+            raise FileReadError(f"Value {record.value} of {record.url} does not fit the columnar format") from e
+        url = record.url.encode('utf-8')
+        self.__offsets.append(self.__url_bytes)
+        self.__urls.append(url)
+        self.__url_bytes += len(url)
+        self.count += 1
+        if len(self.__values) >= WRITE_BATCH:
+            self.__flush()
+
+    def __flush(self) -> None:
+        """Write the buffered values, URL offsets and URLs."""
+        _little_endian(self.__values).tofile(self.__output)
+        _little_endian(self.__offsets).tofile(self.__offsets_file)
+        self.__urls_file.write(b''.join(self.__urls))
+        self.__values, self.__offsets, self.__urls = array('q'), array('Q'), []
+
+    def close(self) -> None:
+        """Append the URL offsets and URLs, write the header and rename the file into place."""
+        self.__offsets.append(self.__url_bytes)
+        self.__flush()
+        values_offset = HEADER.size
+        url_offsets_offset = values_offset + self.count * 8
+        header = ColumnarHeader(self.count, values_offset, url_offsets_offset,
+                                url_offsets_offset + (self.count + 1) * 8)
+        for column in (self.__offsets_file, self.__urls_file):
+            column.seek(0)
+            shutil.copyfileobj(column, self.__output)
+            column.close()
+        self.__output.seek(0)
+        self.__output.write(header.pack())
+        self.__output.close()
+        os.replace(self.__output.name, self.output_path)
+
+    def discard(self) -> None:
+        """Remove the partial file."""
+        for file in (self.__offsets_file, self.__urls_file, self.__output):
+            file.close()
+        os.remove(self.__output.name)
+
+    def __enter__(self) -> 'ColumnarWriter':
+        return self
+
+    def __exit__(self, exc_type: Optional[Type[BaseException]], exc_val: Optional[BaseException],
+                 exc_tb: Optional[Type[BaseException]]) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
@@ -0,0 +1,223 @@
+import bz2
+import gzip
+import lzma
+import struct
+import zlib
+from typing import IO, Iterator, NamedTuple, Optional
+
+MAGIC_BYTES = {
+    'gzip': b'\x1f\x8b',
+    'bz2': b'BZh',
+    'xz': b'\xfd7zXZ\x00',
+}
+OPENERS = {
+    'gzip': gzip.open,
+    'bz2': bz2.open,
+    'xz': lzma.open,
+}
+
+_GZIP_FEXTRA = 0x04
+_GZIP_HEADER_SIZE = 12
+BGZF_MEMBER_SIZE = 0xff00
+
+
+class Member(NamedTuple):
+    """A BGZF member: its compressed byte range and its uncompressed size."""
+    start: int
+    end: int
+    size: int
+
+
+def detect_compression(file_path: str) -> Optional[str]:
+    """
+    Detect the compression of a file from its magic bytes.
+
+    Args:
+        file_path (str): The path to the file.
+
+    Returns:
+        Optional[str]: ``gzip``, ``bz2`` or ``xz``, or None if the file is not compressed.
+
+    Raises:
+        IOError: If the file can not be read.
+    """
+    with open(file_path, 'rb') as file:
+        head = file.read(max(len(magic) for magic in MAGIC_BYTES.values()))
+    for compression, magic in MAGIC_BYTES.items():
+        if head.startswith(magic):
+            return compression
+    return None
+
+
+def open_compressed(file_path: str, compression: str, mode: str = 'rt') -> IO:
+    """
+    Open a compressed file as a stream of its decompressed content.
+
+    Args:
+        file_path (str): The path to the file.
+        compression (str): ``gzip``, ``bz2`` or ``xz``.
+        mode (str, optional): The mode to open the file in. Defaults to ``rt``.
+
+    Returns:
+        IO: The decompressing file object.
+    """
+    return OPENERS[compression](file_path, mode)
+
+
+def bgzf_members(file: IO) -> Optional[list[Member]]:
+    """
+    List the members of a BGZF file, a gzip file made of members that record their own compressed size.
+
+    Only the member headers and trailers are read, so the members can be decompressed independently.
+
+    Args:
+        file (IO): The gzip file object, opened in binary mode.
+
+    Returns:
+        Optional[list[Member]]: The members of the file, or None if a member does not record its size.
+    """
+    try:
+        return list(_iter_members(file, 0))
+    except ValueError:
+        return None
+
+
+def bgzf_compress(data: bytes, member_size: int = BGZF_MEMBER_SIZE) -> bytes:
+    """
+    Compress data as BGZF members, each recording its compressed size, followed by an empty end member.
+
+    Args:
+        data (bytes): The data to compress.
+        member_size (int, optional): The number of uncompressed bytes in each member. Defaults to
+            ``BGZF_MEMBER_SIZE``.
+
+    Returns:
+        bytes: The compressed data.
+    """
+    members = []
+    for start in range(0, len(data), member_size):
+        members.append(_bgzf_member(data[start:start + member_size]))
+    members.append(_bgzf_member(b''))
+    return b''.join(members)
+
+
+def inflate_range(file: IO, start: int, end: int) -> bytes:
+    """
+    Decompress the BGZF members found in a byte range, one member at a time.
+
+    Args:
+        file (IO): The BGZF file object, opened in binary mode.
+        start (int): The byte offset of the first member.
+        end (int): The byte offset at which the last member ends.
+
+    Returns:
+        bytes: The decompressed content of the members.
+
+    Raises:
+        ValueError: If a member does not record its size.
+    """
+    file.seek(start)
+    data = memoryview(file.read(end - start))
+    parts = []
+    position = 0
+    while position < len(data):
+        xlen = struct.unpack('<H', data[position + 10:position + 12])[0]
+        block_size = _bsize(bytes(data[position + _GZIP_HEADER_SIZE:position + _GZIP_HEADER_SIZE + xlen]))
+        if block_size is None:
+            raise ValueError(f"No BGZF block size at offset {start + position}")
+        parts.append(zlib.decompress(data[position:position + block_size + 1], 31))
+        position += block_size + 1
+    return b''.join(parts)
+
+
+def inflate_line_end(file: IO, start: int) -> bytes:
+    """
+    Decompress the BGZF members from a byte offset until the end of the line they start in.
+
+    Args:
+        file (IO): The BGZF file object, opened in binary mode.
+        start (int): The byte offset of a member.
+
+    Returns:
+        bytes: The decompressed content up to and including the first newline, or up to the end of
+            the file if there is no newline.
+    """
+    parts = []
+    for member in _iter_members(file, start):
+        content = inflate_range(file, member.start, member.end)
+        newline = content.find(b'\n')
+        if newline >= 0:
+            parts.append(content[:newline + 1])
+            break
+        parts.append(content)
+    return b''.join(parts)
+
+
+def _iter_members(file: IO, start: int) -> Iterator[Member]:
+    """
+    Iterate over the BGZF members of a file from a byte offset.
+
+    Args:
+        file (IO): The BGZF file object, opened in binary mode.
+        start (int): The byte offset of a member.
+
+    Yields:
+        Iterator[Member]: The members from the offset to the end of the file.
+
+    Raises:
+        ValueError: If a member does not record its size.
+    """
+    while True:
+        file.seek(start)
+        header = file.read(_GZIP_HEADER_SIZE)
+        if not header:
+            return
+        if len(header) < _GZIP_HEADER_SIZE or header[:2] != MAGIC_BYTES['gzip'] or not header[3] & _GZIP_FEXTRA:
+            raise ValueError(f"No BGZF member at offset {start}")
+        block_size = _bsize(file.read(struct.unpack('<H', header[10:12])[0]))
+        if block_size is None:
+            raise ValueError(f"No BGZF block size at offset {start}")
+        end = start + block_size + 1
+        file.seek(end - 4)
+        trailer = file.read(4)
+        if len(trailer) < 4:
+            raise ValueError(f"Truncated BGZF member at offset {start}")
+        yield Member(start, end, struct.unpack('<I', trailer)[0])
+        start = end
+
+
+def _bgzf_member(data: bytes) -> bytes:
+    """
+    Compress data as a single BGZF member.
+
+    Args:
+        data (bytes): The data to compress.
+
+    Returns:
+        bytes: The member.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+    deflated = compressor.compress(data) + compressor.flush()
+    header = struct.pack('<BBBBIBBH', 0x1f, 0x8b, 8, _GZIP_FEXTRA, 0, 0, 0xff, 6)
+    extra = struct.pack('<2sHH', b'BC', 2, _GZIP_HEADER_SIZE + 6 + len(deflated) + 8 - 1)
+    trailer = struct.pack('<II', zlib.crc32(data), len(data) & 0xffffffff)
+    return header + extra + deflated + trailer
+
+
+def _bsize(extra: bytes) -> Optional[int]:
+    """
+    Find the BSIZE subfield (the total member size minus one) in the extra field of a gzip header.
+
+    Args:
+        extra (bytes): The extra field.
+
+    Returns:
+        Optional[int]: The BSIZE value, or None if the extra field has no BSIZE subfield.
+    """
+    position = 0
+    while position + 4 <= len(extra):
+        length = struct.unpack('<H', extra[position + 2:position + 4])[0]
+        if extra[position:position + 2] == b'BC' and length == 2:
+            return struct.unpack('<H', extra[position + 4:position + 6])[0]
+        position += 4 + length
+    return None
@@ -0,0 +1,84 @@
+import argparse
+import os
+from typing import Iterable
+
+from src.columnar import ColumnarWriter
+from src.compression import detect_compression, open_compressed
+from src.file_processors import FileProcessor, expand_paths
+from src.helpers import Logger, FileReadError
+from src.stats import ScanStats
+
+logger = Logger().get_logger()
+
+
+def convert(sources: Iterable[str], output_path: str, skip_malformed: bool = False) -> ScanStats:
+    """
+    Convert text files, compressed or not, to a single columnar file.
+
+    The lines are parsed once, so later queries on the columnar file read the values without parsing text.
+
+    Args:
+        sources (Iterable[str]): The files to convert: file paths, directories (read recursively) or glob patterns.
+        output_path (str): The path of the columnar file, replaced only once the conversion succeeds.
+        skip_malformed (bool, optional): Whether to skip malformed lines instead of failing. Defaults to False.
+
+    Returns:
+        ScanStats: The statistics of reading the sources.
+
+    Raises:
+        FileReadError: If a source can not be read or a line can not be converted.
+    """
+    stats = ScanStats()
+    try:
+        with ColumnarWriter(output_path) as writer:
+            for file_path in expand_paths(sources):
+                if os.path.abspath(file_path) == os.path.abspath(output_path):
+                    continue
+                compression = detect_compression(file_path)
+                file = open_compressed(file_path, compression) if compression else open(file_path, 'r')
+                with FileProcessor(file) as processor:
+                    processor.skip_malformed = skip_malformed
+                    for record in processor.read_records():
+                        writer.add(record)
+                    stats.merge(processor.stats)
+    except OSError as e:
+        logger.error(f"Unable to convert to {output_path}: {e}")
+        raise FileReadError(f"Unable to convert to {output_path}: {e}") from e
+    logger.info(f"Converted {writer.count} lines to {output_path}")
+    return stats
+
+
+def parse_convert_arguments(argv: list[str]) -> argparse.Namespace:
+    """
+    Parse the arguments of the ``convert`` command.
+
+    Args:
+        argv (list[str]): The arguments following ``convert``.
+
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(prog='main.py convert',
+                                     description='Convert text files to a columnar file that is queried without '
+                                                 'parsing text')
+    parser.add_argument('sources', type=str, nargs='+',
+                        help='The files to convert: file paths, directories (read recursively) or glob patterns')
+    parser.add_argument('-o', '--output', type=str, required=True, help='The path of the columnar file')
+    parser.add_argument('--skip-malformed', action='store_true',
+                        help='Skip malformed lines instead of failing')
+    return parser.parse_args(argv)
+
+
+def convert_main(argv: list[str]) -> None:
+    """
+    Run the ``convert`` command.
+
+    Args:
+        argv (list[str]): The arguments following ``convert``.
+    """
+    args = parse_convert_arguments(argv)
+    try:
+        convert(args.sources, args.output, args.skip_malformed)
+    except FileReadError as e:
+        logger.error(e)
+        exit(1)
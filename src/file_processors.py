@@ -1,16 +1,333 @@
+import functools
+import glob
+import heapq
+import mmap
+import os
+import queue
+import stat
+import sys
+import threading
+import time
+import zlib
 from abc import ABC, abstractmethod
-from typing import Generator, IO, Optional, Type
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from array import array
+from contextlib import ExitStack, contextmanager
+from typing import Any, AnyStr, Callable, Generator, IO, Iterable, Iterator, NamedTuple, Optional, Sequence, Type
+from concurrent.futures import (FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor,
+                                as_completed, wait)
 
+from src.block_index import INDEX_SUFFIX, Block, BlockIndex
+from src.checkpoint import Checkpoint, CheckpointWriter, scan_query
+from src.columnar import ColumnarHeader, is_columnar, read_column
+from src.compression import Member, bgzf_members, detect_compression, inflate_line_end, inflate_range, open_compressed
+from src.filters import LineFilter
 from src.models import Record
-from src.helpers import Logger, FileReadError
+from src.heap_manager import HeapManager
+from src.helpers import Logger, FileReadError, available_cpus
+from src.planner import CALIBRATION_BYTES, CALIBRATION_MIN_SIZE, DEFAULT_RATES, ScanPlan, plan_scan
+from src.selection import selector_for
+from src.stats import ChunkStats, ScanStats
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, the numpy engine falls back to the mmap engine without it
+    np = None
 
 logger = Logger().get_logger()
 
+CHUNK_MODES = ('lines', 'bytes')
+ENGINES = ('auto', 'text', 'process', 'mmap', 'numpy', 'indexed', 'stream')
+STDIN_PATH = '-'
+MALFORMED_EXCERPT = 200  # The start of a malformed line quoted in its error, a binary file being a single line
+
+
+def split_byte_ranges(file_path: str, chunk_bytes: int) -> list[tuple[int, int]]:
+    """
+    Split a file into byte ranges whose boundaries fall on line starts.
+
+    The file is cut at ``size / N`` offsets and every cut is moved forward to the
+    byte following the next newline, so no line is shared between two ranges.
+
+    Args:
+        file_path (str): The path to the file to be split.
+        chunk_bytes (int): The approximate number of bytes in each range.
+
+    Returns:
+        list[tuple[int, int]]: A list of ``(start, end)`` byte offsets, end exclusive.
+    """
+    size = os.stat(file_path).st_size
+    if size == 0:
+        return []
+    num_chunks = max(1, -(-size // max(1, chunk_bytes)))
+    boundaries = [0]
+    with open(file_path, 'rb') as file:
+        for i in range(1, num_chunks):
+            file.seek(size * i // num_chunks - 1)
+            file.readline()  # Snap to the start of the next line
+            boundary = file.tell()
+            if boundaries[-1] < boundary < size:
+                boundaries.append(boundary)
+    boundaries.append(size)
+    return list(zip(boundaries, boundaries[1:]))
+
+
+def expand_paths(paths: Iterable[str]) -> list[str]:
+    """
+    Expand directories (recursively) and glob patterns into the paths of the files they hold.
+
+    Other paths are kept as they are, so a missing file fails when it is opened. Sidecar block
+    indexes are left out.
+
+    Args:
+        paths (Iterable[str]): File paths, directories and glob patterns.
+
+    Returns:
+        list[str]: The file paths, without duplicates, in the order they were given.
+
+    Raises:
+        FileReadError: If a glob pattern matches no file.
+    """
+    expanded: dict[str, None] = {}
+    for path in paths:
+        if os.path.isdir(path):
+            matches = sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+        elif any(char in path for char in '*?['):
+            matches = sorted(match for match in glob.glob(path, recursive=True) if os.path.isfile(match))
+            if not matches:
+                logger.error(f"No file matches {path}")
+                raise FileReadError(f"No file matches {path}")
+        else:
+            matches = [path]
+        expanded.update((match, None) for match in matches if not match.endswith(INDEX_SUFFIX))
+    return list(expanded)
+
+
+def _excerpt(line: AnyStr) -> str:
+    """
+    Quote the start of a malformed line for its error.
+
+    Args:
+        line (AnyStr): The line.
+
+    Returns:
+        str: The line, or its first ``MALFORMED_EXCERPT`` characters or bytes and its length when it is longer.
+    """
+    excerpt = repr(line[:MALFORMED_EXCERPT]) if isinstance(line, bytes) else line[:MALFORMED_EXCERPT]
+    if len(line) <= MALFORMED_EXCERPT:
+        return excerpt
+    return f"{excerpt}... ({len(line)} {'bytes' if isinstance(line, bytes) else 'characters'})"
+
+
+def _parse_line(line: str) -> Record:
+    """
+    Parse a text line into a record.
+
+    Args:
+        line (str): The line, with or without its trailing newline.
+
+    Returns:
+        Record: The parsed record.
+
+    Raises:
+        FileReadError: If the line is not a URL followed by an integer value.
+    """
+    try:
+        url, value = line.rsplit(maxsplit=1)
+        return Record(int(value), url)
+    except ValueError as e:
+        raise FileReadError(f"Error processing line: {_excerpt(line)}") from e
+
+
+def _parse_line_bytes(line: bytes) -> Record:
+    """
+    Parse a raw line into a record.
+
+    Args:
+        line (bytes): The raw line, with or without its trailing newline.
+
+    Returns:
+        Record: The parsed record.
+
+    Raises:
+        FileReadError: If the line is not a URL followed by an integer value.
+    """
+    try:
+        url, value = line.rsplit(maxsplit=1)
+        return Record(int(value), url.decode('utf-8'))
+    except ValueError as e:
+        raise FileReadError(f"Error processing line: {_excerpt(line)}") from e
+
+
+def _is_pipe(file_path: str) -> bool:
+    """
+    Check whether a path is a named pipe, which can only be read once from start to end.
+
+    Args:
+        file_path (str): The path to check.
+
+    Returns:
+        bool: Whether the path is a named pipe, False if it does not exist.
+    """
+    try:
+        return stat.S_ISFIFO(os.stat(file_path).st_mode)
+    except OSError:
+        return False
+
+
+def _file_size(file: IO) -> int:
+    """
+    Get the size of an open file.
+
+    Args:
+        file (IO): The file object.
+
+    Returns:
+        int: The size of the file in bytes, or 0 if the file object has no usable descriptor.
+    """
+    try:
+        return os.fstat(file.fileno()).st_size
+    except (OSError, TypeError, ValueError):
+        return 0
+
+
+def _parse_records(lines: Iterable[AnyStr], parse_line: Callable[[AnyStr], Record], stats: ScanStats,
+                   skip_malformed: bool = False,
+                   line_filter: Optional[LineFilter] = None) -> Generator[Record, None, None]:
+    """
+    Parse every line into a record.
+
+    Args:
+        lines (Iterable[AnyStr]): The text or raw lines to parse.
+        parse_line (Callable[[AnyStr], Record]): The line parser.
+        stats (ScanStats): The stats counting the lines.
+        skip_malformed (bool, optional): Whether malformed lines are skipped instead of raising.
+            Defaults to False.
+        line_filter (Optional[LineFilter], optional): The conditions the records must meet. Defaults
+            to None.
+
+    Yields:
+        Generator[Record, None, None]: A generator yielding Record objects.
+
+    Raises:
+        FileReadError: If there is an error processing a line and malformed lines are not skipped.
+    """
+    passes = line_filter.record_test() if line_filter else None
+    for line in lines:
+        stats.lines += 1
+        try:
+            record = parse_line(line)
+        except FileReadError as e:
+            stats.malformed_lines += 1
+            if not skip_malformed:
+                logger.error(e)
+                raise
+            logger.debug(e)
+            continue
+        if passes is not None and not passes(record):
+            stats.filtered_lines += 1
+            continue
+        yield record
+
+
+def _populate_lines(lines: Iterable[AnyStr], heap_manager: HeapManager, stats: ScanStats, binary: bool = False,
+                    skip_malformed: bool = False, line_filter: Optional[LineFilter] = None) -> None:
+    """
+    Add the records of the lines that can enter the heap manager.
+
+    The value of a line is parsed and compared with the admission threshold of the heap
+    manager first. The URL and the record are only built when the value reaches it, lines
+    rejected this way are counted in ``heap_manager.rejected_early``. Values equal to the
+    threshold are left to the heap manager, which breaks the tie on the URL.
+
+    A line filter is evaluated on the raw line, cheapest condition first: the URL prefix
+    before the value is parsed, the value range before the threshold, and the URL substring
+    and pattern before the URL is decoded. Filtered lines are counted in ``stats.filtered_lines``.
+
+    Args:
+        lines (Iterable[AnyStr]): The text or raw lines to parse.
+        heap_manager (HeapManager): The heap manager collecting the top records.
+        stats (ScanStats): The stats of the scan.
+        binary (bool, optional): Whether the lines are raw bytes. Defaults to False.
+        skip_malformed (bool, optional): Whether malformed lines are skipped instead of raising.
+            Defaults to False.
+        line_filter (Optional[LineFilter], optional): The conditions the lines must meet. Defaults
+            to None.
+
+    Raises:
+        FileReadError: If there is an error processing a line and malformed lines are not skipped.
+    """
+    separator, parse_line = (b' ', _parse_line_bytes) if binary else (' ', _parse_line)
+    prefix = url_test = passes = None
+    low, high = float('-inf'), float('inf')
+    if line_filter:
+        prefix = line_filter.prefix(binary)
+        low, high = line_filter.value_range()
+        url_test = line_filter.url_test(binary)
+        passes = line_filter.record_test()
+    bounded = low > float('-inf') or high < float('inf')
+    filtered = 0
+    clock = time.perf_counter
+    threshold = heap_manager.threshold
+    rejected = 0
+    count = 0
+    heap_time = 0.0
+    io_before = stats.io_s
+    started = clock()
+    try:
+        for count, line in enumerate(lines, 1):
+            if prefix is not None and not line.startswith(prefix):
+                filtered += 1
+                continue
+            space = line.rfind(separator)
+            try:
+                if space <= 0:
+                    raise ValueError
+                value = int(line[space + 1:])
+            except ValueError:
+                try:
+                    record = parse_line(line)  # Falls back to any whitespace
+                except FileReadError as e:
+                    stats.malformed_lines += 1
+                    if not skip_malformed:
+                        logger.error(e)
+                        raise
+                    logger.debug(e)
+                    continue
+                if passes is not None and not passes(record):
+                    filtered += 1
+                    continue
+                tick = clock()
+                heap_manager.add_record(record)
+                heap_time += clock() - tick
+                threshold = heap_manager.threshold
+                continue
+            if bounded and not low <= value <= high:
+                filtered += 1
+                continue
+            if value < threshold:
+                rejected += 1
+                continue
+            url = line[:space].rstrip()
+            if url_test is not None and not url_test(url):
+                filtered += 1
+                continue
+            tick = clock()
+            heap_manager.add_record(Record(value, url.decode('utf-8') if binary else url))
+            heap_time += clock() - tick
+            threshold = heap_manager.threshold
+    finally:
+        heap_manager.rejected_early += rejected
+        stats.filtered_lines += filtered
+        stats.lines += count
+        stats.add_scan(clock() - started, stats.io_s - io_before, heap_time)
+
 
 class AbstractFileProcessor(ABC):
     """Abstract base class for file processors."""
 
+    skip_malformed = False
+    line_filter: Optional[LineFilter] = None
+
     def __init__(self, file: IO) -> None:
         """
         Initialize the file processor.
@@ -19,6 +336,7 @@ class AbstractFileProcessor(ABC):
             file (IO): The file object to be processed.
         """
         self.file = file
+        self.stats = ScanStats()
 
     @abstractmethod
     def read_records(self) -> Generator[Record, None, None]:
@@ -30,6 +348,25 @@ class AbstractFileProcessor(ABC):
         """
         pass
 
+    def populate(self, heap_manager: HeapManager) -> None:
+        """
+        Add every record read from the file to the heap manager.
+
+        Args:
+            heap_manager (HeapManager): The heap manager collecting the top records.
+        """
+        clock = time.perf_counter
+        heap_time = 0.0
+        io_before = self.stats.io_s
+        started = clock()
+        try:
+            for record in self.read_records():
+                tick = clock()
+                heap_manager.add_record(record)
+                heap_time += clock() - tick
+        finally:
+            self.stats.add_scan(clock() - started, self.stats.io_s - io_before, heap_time)
+
     def __enter__(self) -> 'AbstractFileProcessor':
         """Enter the runtime context related to this object."""
         return self
@@ -59,13 +396,22 @@ class FileProcessor(AbstractFileProcessor):
         Raises:
             FileReadError: If there is an error processing a line.
         """
-        for line in self.file:
-            try:
-                url, value = line.rsplit(maxsplit=1)
-                yield Record(int(value), url)
-            except ValueError as e:
-                logger.error(f"Error processing line: {line}")
-                raise FileReadError(f"Error processing line: {line}") from e
+        yield from _parse_records(self.file, _parse_line, self.stats, self.skip_malformed,
+                                  self.line_filter)
+
+    def populate(self, heap_manager: HeapManager) -> None:
+        """
+        Add the records of the file that can enter the heap manager.
+
+        Args:
+            heap_manager (HeapManager): The heap manager collecting the top records.
+
+        Raises:
+            FileReadError: If there is an error processing a line.
+        """
+        _populate_lines(self.file, heap_manager, self.stats, skip_malformed=self.skip_malformed,
+                        line_filter=self.line_filter)
+        self.stats.bytes_read += _file_size(self.file)
 
 
 class ChunkFileProcessor(AbstractFileProcessor):
@@ -94,99 +440,1777 @@ class ChunkFileProcessor(AbstractFileProcessor):
         Raises:
             FileReadError: If there is an error processing a line.
         """
+        yield from _parse_records(self.__lines(), _parse_line, self.stats, self.skip_malformed,
+                                  self.line_filter)
+
+    def populate(self, heap_manager: HeapManager) -> None:
+        """
+        Add the records of the chunk that can enter the heap manager.
+
+        Args:
+            heap_manager (HeapManager): The heap manager collecting the top records.
+
+        Raises:
+            FileReadError: If there is an error processing a line.
+        """
+        _populate_lines(self.__lines(), heap_manager, self.stats, skip_malformed=self.skip_malformed,
+                        line_filter=self.line_filter)
+
+    def __lines(self) -> Iterator[str]:
+        """
+        Iterate over the lines of the chunk.
+
+        Yields:
+            Iterator[str]: The lines of the chunk.
+        """
         for _ in range(self.__start_line):
             self.file.readline()  # Skip lines until start_line
         for _ in range(self.__chunk_size):
             line = self.file.readline()
             if not line:
                 break
+            yield line
+
+
+class ByteRangeFileProcessor(AbstractFileProcessor):
+    """Processor for reading the lines that start inside a byte range of a file."""
+
+    def __init__(self, file: IO, start: int, end: int) -> None:
+        """
+        Initialize the byte range file processor.
+
+        Args:
+            file (IO): The file object to be processed, opened in binary mode.
+            start (int): The byte offset of the first line in the range.
+            end (int): The byte offset at which the range ends (exclusive).
+        """
+        super().__init__(file)
+        self.__start = start
+        self.__end = end
+
+    def read_records(self) -> Generator[Record, None, None]:
+        """
+        Read the records of the byte range, seeking straight to its start.
+
+        Yields:
+            Generator[Record, None, None]: A generator yielding Record objects.
+
+        Raises:
+            FileReadError: If there is an error processing a line.
+        """
+        yield from _parse_records(self.__lines(), _parse_line_bytes, self.stats, self.skip_malformed,
+                                  self.line_filter)
+
+    def populate(self, heap_manager: HeapManager) -> None:
+        """
+        Add the records of the byte range that can enter the heap manager.
+
+        Args:
+            heap_manager (HeapManager): The heap manager collecting the top records.
+
+        Raises:
+            FileReadError: If there is an error processing a line.
+        """
+        _populate_lines(self.__lines(), heap_manager, self.stats, binary=True, skip_malformed=self.skip_malformed,
+                        line_filter=self.line_filter)
+
+    def __lines(self) -> Iterator[bytes]:
+        """
+        Iterate over the raw lines of the byte range.
+
+        Yields:
+            Iterator[bytes]: The raw lines starting inside the range.
+        """
+        self.file.seek(self.__start)
+        position = self.__start
+        while position < self.__end:
+            line = self.file.readline()
+            if not line:
+                break
+            position += len(line)
+            self.stats.bytes_read += len(line)
+            yield line
+
+
+class MmapFileProcessor(AbstractFileProcessor):
+    """Processor for scanning a memory-mapped file as raw bytes."""
+
+    block_size = 4 * 1024 * 1024
+
+    def __init__(self, file: IO, start: int = 0, end: Optional[int] = None) -> None:
+        """
+        Initialize the memory-mapped file processor.
+
+        Args:
+            file (IO): The file object to be processed, opened in binary mode.
+            start (int, optional): The byte offset of the first line to read. Defaults to 0.
+            end (Optional[int], optional): The byte offset at which reading stops (exclusive).
+                Defaults to the end of the file.
+        """
+        super().__init__(file)
+        self.__start = start
+        self.__end = end
+
+    def read_records(self) -> Generator[Record, None, None]:
+        """
+        Read every record of the mapped range.
+
+        Yields:
+            Generator[Record, None, None]: A generator yielding Record objects.
+
+        Raises:
+            FileReadError: If there is an error processing a line.
+        """
+        yield from _parse_records(self.__lines(), _parse_line_bytes, self.stats, self.skip_malformed,
+                                  self.line_filter)
+
+    def populate(self, heap_manager: HeapManager) -> None:
+        """
+        Scan the mapped range and add the records that enter the heap manager.
+
+        The mapped range is cut into large blocks on line boundaries. The value of every line
+        is parsed straight from its bytes and compared with the admission threshold of the heap
+        manager, the URL is only decoded when the value beats it.
+
+        Args:
+            heap_manager (HeapManager): The heap manager collecting the top records.
+
+        Raises:
+            FileReadError: If there is an error processing a line.
+        """
+        _populate_lines(self.__lines(), heap_manager, self.stats, binary=True, skip_malformed=self.skip_malformed,
+                        line_filter=self.line_filter)
+
+    def _blocks(self) -> Iterator[bytes]:
+        """
+        Iterate over the mapped range in large blocks cut on line boundaries.
+
+        Yields:
+            Iterator[bytes]: Blocks of whole lines, every block but the last ending with a newline.
+        """
+        buffer = self.__map()
+        if buffer is None:
+            return
+        with buffer:
+            end = len(buffer) if self.__end is None else min(self.__end, len(buffer))
+            position = self.__start
+            while position < end:
+                cut = min(position + self.block_size, end)
+                if cut < end:
+                    newline = buffer.rfind(b'\n', position, cut)
+                    if newline < 0:
+                        newline = buffer.find(b'\n', cut, end)  # A single line longer than a block
+                    cut = end if newline < 0 else newline + 1
+                tick = time.perf_counter()
+                block = buffer[position:cut]
+                self.stats.io_s += time.perf_counter() - tick
+                self.stats.bytes_read += len(block)
+                yield block
+                position = cut
+
+    def __lines(self) -> Iterator[bytes]:
+        """
+        Iterate over the raw lines of the mapped range, without their trailing newlines.
+
+        Yields:
+            Iterator[bytes]: The raw lines starting inside the range.
+        """
+        for block in self._blocks():
+            lines = block.split(b'\n')
+            if not lines[-1]:
+                lines.pop()  # The block ends with a newline
+            yield from lines
+
+    def __map(self) -> Optional[mmap.mmap]:
+        """
+        Memory-map the whole file read-only.
+
+        Returns:
+            Optional[mmap.mmap]: The mapped file, or None if the file is empty.
+        """
+        if os.fstat(self.file.fileno()).st_size == 0:
+            return None
+        tick = time.perf_counter()
+        buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.stats.open_s += time.perf_counter() - tick
+        return buffer
+
+
+class IndexedFileProcessor(AbstractFileProcessor):
+    """Processor for scanning the blocks of a file in descending order of their maximum value, using a sidecar index."""
+
+    def __init__(self, file: IO, block_size: int = 0, index_path: Optional[str] = None) -> None:
+        """
+        Initialize the indexed file processor.
+
+        Args:
+            file (IO): The file object to be processed, opened in binary mode.
+            block_size (int, optional): The number of bytes in each indexed block. Defaults to 0, which
+                uses the block size of the mmap engine.
+            index_path (Optional[str], optional): The path of the sidecar index. Defaults to the path of
+                the file with the ``.topn-index`` suffix.
+        """
+        super().__init__(file)
+        self.block_size = block_size if block_size > 0 else MmapFileProcessor.block_size
+        self.index_path = index_path or BlockIndex.path_for(file.name)
+
+    def read_records(self) -> Generator[Record, None, None]:
+        """
+        Read every record of the file.
+
+        Without a threshold no block can be skipped, so this is a plain scan of the mapped file.
+
+        Yields:
+            Generator[Record, None, None]: A generator yielding Record objects.
+
+        Raises:
+            FileReadError: If there is an error processing a line.
+        """
+        processor = MmapFileProcessor(self.file)
+        processor.skip_malformed = self.skip_malformed
+        processor.line_filter = self.line_filter
+        yield from processor.read_records()
+        self.stats.merge(processor.stats)
+
+    def populate(self, heap_manager: HeapManager) -> None:
+        """
+        Add the records that enter the heap manager, scanning only the blocks that can hold one.
+
+        The first scan reads every block and writes the index. Later scans read the blocks with the
+        highest maximum values first and stop at the first block whose maximum is below the admission
+        threshold. A block whose maximum equals the threshold is still read, as a tied value can enter
+        the heap with a greater URL. Blocks whose maximum is below the minimum value of the line filter
+        are skipped too; without an index, a filtered scan reads every block and writes no index.
+
+        Args:
+            heap_manager (HeapManager): The heap manager collecting the top records.
+
+        Raises:
+            FileReadError: If there is an error processing a line.
+        """
+        index = BlockIndex.load(self.index_path, self.file.name)
+        if index is None and self.line_filter:
+            # The maxima of filtered blocks would not hold for other queries, so no index is written
+            logger.info(f"No index for {self.file.name}, scanning it without writing one as lines are filtered")
+            self.__populate_block(0, _file_size(self.file), heap_manager)
+            return
+        if index is None:
+            self.__build_index(heap_manager)
+            return
+        min_value = self.line_filter.min_value if self.line_filter else None
+        blocks = sorted((block for block in index.blocks if block.max_value is not None),
+                        key=lambda block: block.max_value, reverse=True)
+        for position, block in enumerate(blocks):
+            if block.max_value < heap_manager.threshold or (min_value is not None and block.max_value < min_value):
+                self.stats.blocks_skipped += len(blocks) - position
+                break
+            self.__populate_block(block.start, block.end, heap_manager)
+        logger.info(f"Read {self.stats.blocks_read} of {len(index.blocks)} indexed blocks")
+
+    def __build_index(self, heap_manager: HeapManager) -> None:
+        """
+        Scan every block into its own heap manager to find its maximum value, then write the index.
+
+        Args:
+            heap_manager (HeapManager): The heap manager the top records of every block are merged into.
+        """
+        index = BlockIndex.for_file(self.file.name, self.block_size)
+        for start, end in split_byte_ranges(self.file.name, self.block_size):
+            block_heap = heap_manager.empty_copy() if heap_manager.n > 0 else HeapManager(1)
+            stats = self.__populate_block(start, end, block_heap)
+            index.blocks.append(Block(start, end, block_heap.max_value(), stats.lines))
+            heap_manager.merge(block_heap)
+        index.save(self.index_path)
+
+    def __populate_block(self, start: int, end: int, heap_manager: HeapManager) -> ScanStats:
+        """
+        Scan a block of the mapped file into the heap manager.
+
+        Args:
+            start (int): The byte offset at which the block starts.
+            end (int): The byte offset at which the block ends (exclusive).
+            heap_manager (HeapManager): The heap manager collecting the top records.
+
+        Returns:
+            ScanStats: The stats of the block.
+        """
+        processor = MmapFileProcessor(self.file, start, end)
+        processor.skip_malformed = self.skip_malformed
+        processor.line_filter = self.line_filter
+        processor.populate(heap_manager)
+        self.stats.merge(processor.stats)
+        self.stats.blocks_read += 1
+        return processor.stats
+
+
+class RecordBatch(NamedTuple):
+    """
+    The records of a chunk in compact form: their values in an ``int64`` array (a list if one does not
+    fit) and their URLs joined by newlines, two objects instead of a record, an int and a str per line.
+    """
+    values: Sequence[int]
+    urls: str
+
+    @classmethod
+    def pack(cls, records: Iterable[Record]) -> 'RecordBatch':
+        """
+        Pack records into a batch.
+
+        Args:
+            records (Iterable[Record]): The records.
+
+        Returns:
+            RecordBatch: The batch.
+        """
+        values: Sequence[int] = array('q')
+        urls = []
+        for value, url in records:
             try:
-                url, value = line.rsplit(maxsplit=1)
-                yield Record(int(value), url)
-            except ValueError as e:
-                logger.error(f"Error processing line: {line}")
-                raise FileReadError(f"Error processing line: {line}") from e
+                values.append(value)
+            except OverflowError:
+                values = [*values, value]
+            urls.append(url)
+        return cls(values, '\n'.join(urls))
+
+    def __iter__(self) -> Iterator[Record]:
+        """
+        Unpack the records of the batch.
+
+        Yields:
+            Iterator[Record]: The records, in the order they were packed.
+        """
+        if self.values:
+            yield from map(Record, self.values, self.urls.split('\n'))
+
+    def __len__(self) -> int:
+        return len(self.values)
 
 
 class ParallelFileProcessor(AbstractFileProcessor):
-    """Processor for reading files in parallel using chunks."""
+    """
+    Processor for reading files in parallel using chunks.
+
+    At most ``max_inflight_chunks`` chunks are submitted or held as results at a time: a new chunk is
+    only submitted once the result of an earlier one is consumed, so memory does not grow with the
+    size of the file when the consumer is slower than the threads.
+    """
+
+    max_inflight_chunks = 0
 
-    def __init__(self, file: IO, chunk_size: int) -> None:
+    def __init__(self, file: IO, chunk_size: int, chunk_mode: str = 'lines') -> None:
         """
         Initialize the parallel file processor.
 
         Args:
             file (IO): The file object to be processed.
-            chunk_size (int): The number of lines to read in each chunk.
+            chunk_size (int): The number of lines (or bytes, in ``bytes`` mode) in each chunk.
+            chunk_mode (str, optional): ``lines`` to split by line counts, ``bytes`` to split
+                by byte offsets. Defaults to ``lines``.
         """
         super().__init__(file)
+        if chunk_mode not in CHUNK_MODES:
+            raise ValueError(f"Unknown chunk mode: {chunk_mode}")
         self.chunk_size = chunk_size
+        self.chunk_mode = chunk_mode
+        self.threads = min(32, (os.cpu_count() or 1) + 4)  # The default of ThreadPoolExecutor
 
     def read_records(self) -> Generator[Record, None, None]:
         """
         Read records from the file in parallel.
 
+        Every chunk is read into a compact record batch, unpacked as it is consumed.
+
         Yields:
             Generator[Record, None, None]: A generator yielding Record objects.
         """
-        total_lines = sum(1 for _ in self.file)
-        self.file.seek(0)  # Reset file pointer to the beginning
-        chunks = [(i, self.chunk_size) for i in range(0, total_lines, self.chunk_size)]
+        for batch, stats in self.__run_chunks(self.__read_chunk):
+            self.stats.merge(stats)
+            yield from batch
 
-        with ThreadPoolExecutor() as executor:
-            futures = [executor.submit(self.__process_chunk, start_line,
-                                       self.chunk_size) for start_line, _ in chunks]
-            for future in as_completed(futures):
-                for record in future.result():
-                    yield record
+    def populate(self, heap_manager: HeapManager) -> None:
+        """
+        Add the top records of every chunk to the heap manager.
+
+        Every chunk is scanned into its own empty copy of the heap manager, so only the top records of a
+        chunk are held until it is merged.
+
+        Args:
+            heap_manager (HeapManager): The heap manager collecting the top records.
 
-    def __process_chunk(self, start_line: int, chunk_size: int) -> list[Record]:
+        Raises:
+            FileReadError: If there is an error opening the file or processing a line.
+        """
+        for chunk_heap, stats in self.__run_chunks(functools.partial(self.__populate_chunk, heap_manager=heap_manager)):
+            self.stats.merge(stats)
+            heap_manager.merge(chunk_heap)
+
+    def __run_chunks(self, function: Callable[..., tuple[Any, ScanStats]]) -> Iterator[tuple[Any, ScanStats]]:
         """
-        Process a chunk of the file and return records.
+        Run a function on every chunk in a thread pool, yielding the results as they complete.
+
+        A chunk is only submitted while fewer than ``max_inflight_chunks`` (by default twice the number of
+        threads) are running or waiting to be consumed.
 
         Args:
-            start_line (int): The starting line for the chunk.
-            chunk_size (int): The number of lines to read in the chunk.
+            function (Callable[..., tuple[Any, ScanStats]]): Called with the start and end of a chunk.
+
+        Yields:
+            Iterator[tuple[Any, ScanStats]]: The results of the chunks, in completion order.
+        """
+        window = self.max_inflight_chunks or 2 * self.threads
+        with ThreadPoolExecutor(self.threads) as executor:
+            pending: set[Future] = set()
+            try:
+                for start, end in self.__chunk_bounds():
+                    if len(pending) >= window:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            yield future.result()
+                    pending.add(executor.submit(function, start, end))
+                for future in as_completed(pending):
+                    pending.discard(future)
+                    yield future.result()
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def __chunk_bounds(self) -> list[tuple[int, int]]:
+        """
+        Split the file into chunks.
 
         Returns:
-            list[Record]: A list of Record objects.
+            list[tuple[int, int]]: The start and end of every chunk, in lines or bytes.
+        """
+        if self.chunk_mode == 'bytes':
+            return split_byte_ranges(self.file.name, self.chunk_size)
+        total_lines = sum(1 for _ in self.file)
+        self.file.seek(0)  # Reset file pointer to the beginning
+        return [(start, start + self.chunk_size) for start in range(0, total_lines, self.chunk_size)]
 
-        Raises:
-            FileReadError: If there is an error opening the file.
+    def __read_chunk(self, start: int, end: int) -> tuple[RecordBatch, ScanStats]:
         """
-        try:
-            with open(self.file.name, 'r') as file:
-                chunk_processor = ChunkFileProcessor(file, start_line, chunk_size)
-                return list(chunk_processor.read_records())
-        except IOError as e:
-            logger.error(f"Unable to open file {self.file.name}")
-            raise FileReadError(f"Unable to open file {self.file.name}") from e
+        Read every record of a chunk into a compact batch.
 
+        Args:
+            start (int): The start of the chunk, in lines or bytes.
+            end (int): The end of the chunk, in lines or bytes.
 
-class ProcessorFactory:
-    """Factory class to create and manage processors."""
+        Returns:
+            tuple[RecordBatch, ScanStats]: The records of the chunk and the stats of the chunk.
 
-    @staticmethod
-    def create_processor(file_path: str, chunk_size: int = 0) -> AbstractFileProcessor:
+        Raises:
+            FileReadError: If there is an error opening the file or processing a line.
         """
-        Create a file processor for the given file path.
+        return self.__scan_chunk(start, end, lambda processor: RecordBatch.pack(processor.read_records()))
+
+    def __populate_chunk(self, start: int, end: int, heap_manager: HeapManager) -> tuple[HeapManager, ScanStats]:
+        """
+        Scan a chunk into an empty copy of a heap manager.
 
         Args:
-            file_path (str): The path to the file to be processed.
-            chunk_size (int, optional): The number of lines to read in each chunk. Defaults to 0.
+            start (int): The start of the chunk, in lines or bytes.
+            end (int): The end of the chunk, in lines or bytes.
+            heap_manager (HeapManager): The heap manager to copy, only read for its settings.
 
         Returns:
-            AbstractFileProcessor: The created file processor.
+            tuple[HeapManager, ScanStats]: The heap manager holding the top records of the chunk and
+                the stats of the chunk.
 
         Raises:
-            FileReadError: If there is an error opening the file.
+            FileReadError: If there is an error opening the file or processing a line.
         """
-        try:
-            file = open(file_path, 'r')
-            if chunk_size > 0:
-                return ParallelFileProcessor(file, chunk_size)
+        chunk_heap = heap_manager.empty_copy()
+
+        def populate(processor: AbstractFileProcessor) -> HeapManager:
+            processor.populate(chunk_heap)
+            return chunk_heap
+
+        return self.__scan_chunk(start, end, populate)
+
+    def __scan_chunk(self, start: int, end: int,
+                     scan: Callable[[AbstractFileProcessor], Any]) -> tuple[Any, ScanStats]:
+        """
+        Open the file for a chunk, scan the chunk with its processor and time it.
+
+        Args:
+            start (int): The start of the chunk, in lines or bytes.
+            end (int): The end of the chunk, in lines or bytes.
+            scan (Callable[[AbstractFileProcessor], Any]): Scans the processor of the chunk.
+
+        Returns:
+            tuple[Any, ScanStats]: The result of the scan and the stats of the chunk.
+
+        Raises:
+            FileReadError: If there is an error opening the file.
+        """
+        try:
+            if self.chunk_mode == 'bytes':
+                file = open(self.file.name, 'rb')
+                processor: AbstractFileProcessor = ByteRangeFileProcessor(file, start, end)
+            else:
+                file = open(self.file.name, 'r')
+                processor = ChunkFileProcessor(file, start, end - start)
+        except IOError as e:
+            logger.error(f"Unable to open file {self.file.name}")
+            raise FileReadError(f"Unable to open file {self.file.name}") from e
+        with file:
+            processor.skip_malformed = self.skip_malformed
+            processor.line_filter = self.line_filter
+            started = time.perf_counter()
+            result = scan(processor)
+        seconds = time.perf_counter() - started
+        processor.stats.chunks.append(ChunkStats(start, end, seconds, processor.stats.lines,
+                                                 threading.get_native_id()))
+        return result, processor.stats
+
+
+class NumpyBlockFileProcessor(MmapFileProcessor):
+    """Processor for selecting the top records of a memory-mapped file with vectorized NumPy blocks."""
+
+    block_size = 16 * 1024 * 1024
+    max_digits = 18  # Every 18 digit number fits in an int64
+
+    def populate(self, heap_manager: HeapManager) -> None:
+        """
+        Scan the mapped range block by block and add the block candidates to the heap manager.
+
+        The newline and last-space offsets of a whole block are found at once, its values are
+        converted to an ``int64`` array in bulk and the candidates that can enter the heap are
+        picked with ``np.partition``. Only the URLs of the candidates are decoded. A value range
+        filter is applied to the whole array; URL filters, and heap managers that need every line,
+        are handled line by line, as by the ``mmap`` engine.
+
+        Args:
+            heap_manager (HeapManager): The heap manager collecting the top records.
+
+        Raises:
+            FileReadError: If there is an error processing a line.
+        """
+        if np is None or not heap_manager.ranks_lines or (self.line_filter and self.line_filter.filters_urls()):
+            super().populate(heap_manager)
+            return
+        for block in self._blocks():
+            self.__populate_block(block, heap_manager)
+
+    def __populate_lines(self, lines: Iterable[bytes], heap_manager: HeapManager) -> None:
+        """
+        Add the records of lines the vectorized parser can not handle, parsing them one by one.
+
+        Args:
+            lines (Iterable[bytes]): The raw lines.
+            heap_manager (HeapManager): The heap manager collecting the top records.
+
+        Raises:
+            FileReadError: If there is an error processing a line.
+        """
+        _populate_lines(lines, heap_manager, self.stats, binary=True, skip_malformed=self.skip_malformed,
+                        line_filter=self.line_filter)
+
+    def __populate_block(self, block: bytes, heap_manager: HeapManager) -> None:
+        """
+        Add the candidates of a block of whole lines to the heap manager.
+
+        Lines the vectorized parser can not handle (other separators, trailing whitespace,
+        values too long for an ``int64``) are parsed line by line.
+
+        Args:
+            block (bytes): The block of lines.
+            heap_manager (HeapManager): The heap manager collecting the top records.
+
+        Raises:
+            FileReadError: If there is an error processing a line.
+        """
+        started = time.perf_counter()
+        data = np.frombuffer(block, dtype=np.uint8)
+        ends = np.flatnonzero(data == ord('\n'))
+        if block[-1:] != b'\n':
+            ends = np.append(ends, len(block))  # The last line of the file has no newline
+        starts = np.empty_like(ends)
+        starts[0] = 0
+        starts[1:] = ends[:-1] + 1
+        last = len(block) - 1
+        stops = ends - ((ends > starts) & (data[np.maximum(ends - 1, 0)] == ord('\r')))
+
+        spaces = np.flatnonzero(data == ord(' '))
+        if spaces.size == 0:
+            self.__populate_lines((block[start:end] for start, end in zip(starts, ends)), heap_manager)
+            return
+        space_index = np.searchsorted(spaces, stops) - 1
+        separators = np.where(space_index >= 0, spaces[np.maximum(space_index, 0)], -1)
+
+        valid = separators > starts
+        digits_start = separators + 1
+        negative = valid & (digits_start < stops) & (data[np.minimum(digits_start, last)] == ord('-'))
+        digits_start = digits_start + negative
+        lengths = stops - digits_start
+        valid &= (lengths >= 1) & (lengths <= self.max_digits)
+
+        values = np.zeros(len(ends), dtype=np.int64)
+        for k in range(int(lengths[valid].max(initial=0))):
+            active = valid & (lengths > k)
+            digits = data[np.minimum(digits_start + k, last)].astype(np.int64) - ord('0')
+            valid &= ~(active & ((digits < 0) | (digits > 9)))
+            values = np.where(active, values * 10 + digits, values)
+        values = np.where(negative, -values, values)
+
+        passed = valid
+        if self.line_filter:
+            if self.line_filter.min_value is not None:
+                passed = passed & (values >= self.line_filter.min_value)
+            if self.line_filter.max_value is not None:
+                passed = passed & (values <= self.line_filter.max_value)
+        lines = np.flatnonzero(passed)
+        parsed = int(np.count_nonzero(valid))
+        self.stats.lines += parsed
+        self.stats.filtered_lines += parsed - int(lines.size)
+        if heap_manager.n > 0 and lines.size:
+            self.__add_candidates(block, starts, separators, values, lines, heap_manager)
+        else:
+            heap_manager.rejected_early += int(lines.size)
+        self.stats.parse_s += time.perf_counter() - started
+
+        invalid = np.flatnonzero(~valid)
+        if invalid.size:
+            self.__populate_lines((block[starts[i]:ends[i]] for i in invalid), heap_manager)
+
+    def __add_candidates(self, block: bytes, starts: 'np.ndarray', separators: 'np.ndarray', values: 'np.ndarray',
+                         lines: 'np.ndarray', heap_manager: HeapManager) -> None:
+        """
+        Pick the lines of a block that can enter the heap manager and add their records.
+
+        Args:
+            block (bytes): The block of lines.
+            starts (np.ndarray): The offsets of the line starts in the block.
+            separators (np.ndarray): The offsets of the last space of every line.
+            values (np.ndarray): The parsed value of every line.
+            lines (np.ndarray): The indices of the lines that were parsed.
+            heap_manager (HeapManager): The heap manager collecting the top records.
+        """
+        line_values = values[lines]
+        floor = heap_manager.threshold
+        if line_values.size > heap_manager.n:
+            kth = line_values.size - heap_manager.n
+            floor = max(floor, int(np.partition(line_values, kth)[kth]))
+        above = lines[line_values > floor]
+        ties = lines[line_values == floor]
+        need = heap_manager.n - above.size
+        if ties.size > need:
+            # Ties are broken by URL, and UTF-8 bytes sort like the decoded strings
+            ties = heapq.nlargest(need, ties, key=lambda i: block[starts[i]:separators[i]].rstrip())
+        candidates = [*above, *ties]
+        heap_manager.rejected_early += int(lines.size) - len(candidates)
+        tick = time.perf_counter()
+        for i in candidates:
+            url = block[starts[i]:separators[i]].rstrip().decode('utf-8')
+            heap_manager.add_record(Record(int(values[i]), url))
+        self.stats.heap_s += time.perf_counter() - tick
+        self.stats.parse_s -= time.perf_counter() - tick  # Accounted as heap time instead
+
+
+class ColumnarFileProcessor(AbstractFileProcessor):
+    """
+    Processor for the columnar files written by ``convert``: the value column is memory-mapped and scanned
+    without parsing text, and only the URLs of the lines that enter the heap manager are decoded.
+    """
+
+    block_values = 1024 * 1024
+
+    def read_records(self) -> Generator[Record, None, None]:
+        """
+        Read every record of the file.
+
+        Yields:
+            Generator[Record, None, None]: A generator yielding Record objects.
+
+        Raises:
+            FileReadError: If the file is not a valid columnar file.
+        """
+        passes = self.line_filter.record_test() if self.line_filter else None
+        with self.__columns() as (header, values, offsets, buffer):
+            urls = header.urls_offset
+            for index, value in enumerate(values):
+                self.stats.lines += 1
+                record = Record(value, buffer[urls + offsets[index]:urls + offsets[index + 1]].decode('utf-8'))
+                if passes is not None and not passes(record):
+                    self.stats.filtered_lines += 1
+                    continue
+                yield record
+            self.stats.bytes_read += header.count * 16 + offsets[header.count]
+
+    def populate(self, heap_manager: HeapManager) -> None:
+        """
+        Scan the value column and add the records that enter the heap manager.
+
+        With NumPy, a heap manager that keeps the lines with the largest values and no URL filter, only the
+        largest values of every block are visited, in descending order; otherwise every value is compared with
+        the admission threshold. URLs are only sliced and decoded for the values that pass.
+
+        Args:
+            heap_manager (HeapManager): The heap manager collecting the top records.
+
+        Raises:
+            FileReadError: If the file is not a valid columnar file.
+        """
+        started = time.perf_counter()
+        heap_before = self.stats.heap_s
+        with self.__columns() as (header, values, offsets, buffer):
+            self.stats.lines += header.count
+            self.stats.bytes_read += header.count * 8
+            if (np is not None and heap_manager.ranks_lines and heap_manager.n > 0
+                    and not (self.line_filter and self.line_filter.filters_urls())):
+                column = np.frombuffer(buffer, dtype='<i8', count=header.count, offset=header.values_offset)
+                try:
+                    for start in range(0, header.count, self.block_values):
+                        self.__populate_block(column, start, min(start + self.block_values, header.count),
+                                              heap_manager, header, offsets, buffer)
+                finally:
+                    del column  # Releases its export of the map
+            else:
+                self.__populate_values(values, heap_manager, header, offsets, buffer)
+        self.stats.parse_s += time.perf_counter() - started - (self.stats.heap_s - heap_before)
+
+    def __populate_values(self, values: Sequence[int], heap_manager: HeapManager, header: ColumnarHeader,
+                          offsets: Sequence[int], buffer: mmap.mmap) -> None:
+        """
+        Compare every value with the value range and the admission threshold, then build the records that pass.
+
+        Args:
+            values (Sequence[int]): The value column.
+            heap_manager (HeapManager): The heap manager collecting the top records.
+            header (ColumnarHeader): The header of the file.
+            offsets (Sequence[int]): The URL offset column.
+            buffer (mmap.mmap): The mapped file.
+        """
+        low, high = self.line_filter.value_range() if self.line_filter else (float('-inf'), float('inf'))
+        accept_url = self.__url_test()
+        urls = header.urls_offset
+        threshold = heap_manager.threshold
+        for index, value in enumerate(values):
+            if value < low or value > high:
+                self.stats.filtered_lines += 1
+            elif value < threshold:
+                heap_manager.rejected_early += 1
+            else:
+                url = buffer[urls + offsets[index]:urls + offsets[index + 1]]
+                self.stats.bytes_read += len(url)
+                if accept_url is not None and not accept_url(url):
+                    self.stats.filtered_lines += 1
+                    continue
+                tick = time.perf_counter()
+                heap_manager.add_record(Record(value, url.decode('utf-8')))
+                self.stats.heap_s += time.perf_counter() - tick
+                threshold = heap_manager.threshold
+
+    def __populate_block(self, column: 'np.ndarray', start: int, end: int, heap_manager: HeapManager,
+                         header: ColumnarHeader, offsets: Sequence[int], buffer: mmap.mmap) -> None:
+        """
+        Visit the values of a block that can enter the heap manager in descending order, until one can not.
+
+        Args:
+            column (np.ndarray): The value column.
+            start (int): The index of the first value of the block.
+            end (int): The index after the last value of the block.
+            heap_manager (HeapManager): The heap manager collecting the top records, keeping the lines with
+                the largest values.
+            header (ColumnarHeader): The header of the file.
+            offsets (Sequence[int]): The URL offset column.
+            buffer (mmap.mmap): The mapped file.
+        """
+        block = column[start:end]
+        passed = np.ones(block.size, dtype=bool)
+        if self.line_filter:
+            if self.line_filter.min_value is not None:
+                passed &= block >= self.line_filter.min_value
+            if self.line_filter.max_value is not None:
+                passed &= block <= self.line_filter.max_value
+            self.stats.filtered_lines += block.size - int(np.count_nonzero(passed))
+        in_range = int(np.count_nonzero(passed))
+        if heap_manager.threshold > float('-inf'):
+            passed &= block >= heap_manager.threshold
+        lines = np.flatnonzero(passed)
+        if lines.size > heap_manager.n:
+            # Only the N largest values, and the values tied with the N-th, can enter
+            kth = lines.size - heap_manager.n
+            floor = np.partition(block[lines], kth)[kth]
+            lines = lines[block[lines] >= floor]
+        lines = lines[np.argsort(block[lines], kind='stable')[::-1]]
+        urls = header.urls_offset
+        visited = 0
+        for index, value in zip((lines + start).tolist(), block[lines].tolist()):
+            if value < heap_manager.threshold:
+                break  # Every later value is lower
+            visited += 1
+            url = buffer[urls + offsets[index]:urls + offsets[index + 1]]
+            self.stats.bytes_read += len(url)
+            tick = time.perf_counter()
+            heap_manager.add_record(Record(value, url.decode('utf-8')))
+            self.stats.heap_s += time.perf_counter() - tick
+        heap_manager.rejected_early += in_range - visited
+
+    def __url_test(self) -> Optional[Callable[[bytes], bool]]:
+        """
+        Get the test of the URL conditions on raw URLs.
+
+        Returns:
+            Optional[Callable[[bytes], bool]]: The test, or None if any URL passes.
+        """
+        if not self.line_filter or not self.line_filter.filters_urls():
+            return None
+        prefix = self.line_filter.prefix(binary=True) or b''
+        test = self.line_filter.url_test(binary=True) or (lambda url: True)
+        return lambda url: url.startswith(prefix) and test(url)
+
+    @contextmanager
+    def __columns(self) -> Iterator[tuple[ColumnarHeader, Sequence[int], Sequence[int], mmap.mmap]]:
+        """
+        Map the file and its columns, releasing the columns before the map is closed.
+
+        Yields:
+            Iterator[tuple[ColumnarHeader, Sequence[int], Sequence[int], mmap.mmap]]: The header, the value
+                column, the URL offset column and the mapped file.
+
+        Raises:
+            FileReadError: If the file is not a valid columnar file.
+        """
+        tick = time.perf_counter()
+        try:
+            buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError as e:  # An empty file can not be mapped
+            raise FileReadError(f"Truncated columnar file {self.file.name}") from e
+        self.stats.open_s += time.perf_counter() - tick
+        with buffer:
+            header = ColumnarHeader.read(buffer)
+            if header.urls_offset > len(buffer):
+                raise FileReadError(f"Truncated columnar file {self.file.name}")
+            values = read_column(buffer, header.values_offset, header.count, 'q')
+            offsets = read_column(buffer, header.url_offsets_offset, header.count + 1, 'Q')
+            try:
+                yield header, values, offsets, buffer
+            finally:
+                for column in (values, offsets):
+                    if isinstance(column, memoryview):
+                        column.release()
+
+
+def _populate_byte_range(file_path: str, start: int, end: int, heap_manager: HeapManager,
+                         skip_malformed: bool = False,
+                         line_filter: Optional[LineFilter] = None) -> tuple[HeapManager, ScanStats]:
+    """
+    Collect the top records of a byte range of a file in a worker process.
+
+    Args:
+        file_path (str): The path to the file to be processed.
+        start (int): The byte offset at which the range starts.
+        end (int): The byte offset at which the range ends (exclusive).
+        heap_manager (HeapManager): The empty, worker-local heap manager.
+        skip_malformed (bool, optional): Whether malformed lines are skipped instead of raising.
+            Defaults to False.
+        line_filter (Optional[LineFilter], optional): The conditions the lines must meet. Defaults
+            to None.
+
+    Returns:
+        tuple[HeapManager, ScanStats]: The heap manager holding the top records of the range and
+            the stats of the range.
+
+    Raises:
+        FileReadError: If there is an error opening the file or processing a line.
+    """
+    started = time.perf_counter()
+    try:
+        with open(file_path, 'rb') as file:
+            processor = MmapFileProcessor(file, start, end)
+            processor.skip_malformed = skip_malformed
+            processor.line_filter = line_filter
+            processor.populate(heap_manager)
+    except IOError as e:
+        logger.error(f"Unable to open file {file_path}")
+        raise FileReadError(f"Unable to open file {file_path}") from e
+    stats = processor.stats
+    stats.chunks.append(ChunkStats(start, end, time.perf_counter() - started, stats.lines, os.getpid(), file_path))
+    return heap_manager, stats
+
+
+class ProcessPoolFileProcessor(AbstractFileProcessor):
+    """Processor for reading byte ranges of a file in worker processes, each keeping its own top records."""
+
+    checkpoint_path: Optional[str] = None
+    resume = False
+    checkpoint_interval = 10.0
+    checkpoint_chunk_bytes = 256 * 1024 * 1024
+
+    def __init__(self, file: IO, top: int, chunk_size: int = 0, workers: Optional[int] = None,
+                 executor: Optional[Executor] = None) -> None:
+        """
+        Initialize the process pool file processor.
+
+        Args:
+            file (IO): The file object to be processed.
+            top (int): The number of top records each worker keeps.
+            chunk_size (int, optional): The number of bytes in each chunk. Defaults to 0, which splits
+                the file evenly between the workers.
+            workers (Optional[int], optional): The number of worker processes. Defaults to the CPU count.
+            executor (Optional[Executor], optional): An existing executor to run the chunks on instead
+                of a new process pool. Defaults to None.
+        """
+        super().__init__(file)
+        self.top = top
+        self.chunk_size = chunk_size
+        self.workers = workers or available_cpus()
+        self.executor = executor
+
+    def read_records(self) -> Generator[Record, None, None]:
+        """
+        Read the top records of the file.
+
+        Only the merged top records of the workers are yielded, not every record of the file.
+
+        Yields:
+            Generator[Record, None, None]: A generator yielding Record objects.
+        """
+        heap_manager = HeapManager(self.top)
+        self.populate(heap_manager)
+        yield from heap_manager.get_top_records()
+
+    def populate(self, heap_manager: HeapManager) -> None:
+        """
+        Collect the top records of every chunk in worker processes and merge them into the heap manager.
+
+        With a checkpoint path, the chunks done and their merged top records are written to it
+        periodically, and on resume only the chunks that are not done are scanned.
+
+        Args:
+            heap_manager (HeapManager): The heap manager collecting the top records.
+        """
+        ranges = self._ranges()
+        writer = self.__checkpoint_writer(ranges, heap_manager)
+        if writer is not None:
+            ranges = writer.checkpoint.pending()
+        if self.executor is not None:
+            self.__run_chunks(self.executor, ranges, heap_manager, writer)
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                self.__run_chunks(executor, ranges, heap_manager, writer)
+
+    def __run_chunks(self, executor: Executor, ranges: list[tuple[int, int]], heap_manager: HeapManager,
+                     writer: Optional[CheckpointWriter] = None) -> None:
+        """
+        Submit every chunk to the executor and merge the worker-local heap managers as they complete.
+
+        Args:
+            executor (Executor): The executor to run the chunks on.
+            ranges (list[tuple[int, int]]): The byte ranges of the chunks.
+            heap_manager (HeapManager): The heap manager collecting the top records.
+            writer (Optional[CheckpointWriter], optional): The writer recording the chunks done.
+                Defaults to None.
+        """
+        futures = {self._submit(executor, start, end, heap_manager.empty_copy()): (start, end)
+                   for start, end in ranges}
+        completed = False
+        try:
+            for future in as_completed(futures):
+                heap, stats = future.result()
+                self.stats.merge(stats)
+                tick = time.perf_counter()
+                heap_manager.merge(heap)
+                self.stats.heap_s += time.perf_counter() - tick
+                if writer is not None:
+                    writer.chunk_done(*futures[future], heap_manager)
+            completed = True
+        finally:
+            if writer is not None and completed:
+                writer.finish()
+            elif writer is not None:
+                writer.write(heap_manager)
+
+    def __checkpoint_writer(self, ranges: list[tuple[int, int]],
+                            heap_manager: HeapManager) -> Optional[CheckpointWriter]:
+        """
+        Create the checkpoint writer of the scan, resuming from the checkpoint when asked to.
+
+        The top records of the checkpoint are merged into the heap manager.
+
+        Args:
+            ranges (list[tuple[int, int]]): The byte ranges of the chunks.
+            heap_manager (HeapManager): The heap manager collecting the top records.
+
+        Returns:
+            Optional[CheckpointWriter]: The checkpoint writer, or None without a checkpoint path.
+        """
+        if not self.checkpoint_path:
+            return None
+        query = scan_query(self.line_filter, self.skip_malformed)
+        checkpoint = Checkpoint.load(self.checkpoint_path, self.file.name, heap_manager.n, query) if self.resume \
+            else None
+        if checkpoint is not None and checkpoint.ranges != ranges:
+            logger.warning(f"Checkpoint {self.checkpoint_path} has other chunks, starting from the beginning")
+            checkpoint = None
+        if checkpoint is None:
+            checkpoint = Checkpoint.for_file(self.file.name, heap_manager.n, ranges, query)
+        else:
+            heap_manager.merge(checkpoint.heap_manager())
+            logger.info(f"Resuming from {self.checkpoint_path}: {len(checkpoint.done)} of {len(ranges)} chunks done")
+        return CheckpointWriter(self.checkpoint_path, checkpoint, self.checkpoint_interval)
+
+    def _ranges(self) -> list[tuple[int, int]]:
+        """
+        Split the file into the byte ranges of the chunks.
+
+        Returns:
+            list[tuple[int, int]]: The byte ranges of the chunks.
+        """
+        size = os.stat(self.file.name).st_size
+        chunk_size = self.chunk_size
+        if chunk_size <= 0:
+            chunk_size = -(-size // self.workers)
+            if self.checkpoint_path:
+                chunk_size = min(chunk_size, self.checkpoint_chunk_bytes)  # Less work lost when resuming
+        return split_byte_ranges(self.file.name, chunk_size)
+
+    def _submit(self, executor: Executor, start: int, end: int, heap_manager: HeapManager) -> Future:
+        """
+        Submit a chunk to the executor.
+
+        Args:
+            executor (Executor): The executor to run the chunk on.
+            start (int): The byte offset at which the chunk starts.
+            end (int): The byte offset at which the chunk ends (exclusive).
+            heap_manager (HeapManager): The empty, worker-local heap manager.
+
+        Returns:
+            Future: The future of the worker-local heap manager and stats of the chunk.
+        """
+        return executor.submit(_populate_byte_range, self.file.name, start, end, heap_manager, self.skip_malformed,
+                               self.line_filter)
+
+
+def _populate_bgzf_range(file_path: str, start: int, end: int, heap_manager: HeapManager,
+                         skip_malformed: bool = False, previous: Optional[Member] = None,
+                         line_filter: Optional[LineFilter] = None) -> tuple[HeapManager, ScanStats]:
+    """
+    Decompress a range of BGZF members in a worker process and collect the top records of its lines.
+
+    A line belongs to the range holding its first byte: when the previous member does not end with
+    a newline, the first line of the range is left to the previous range, and the last line of the
+    range is completed from the members that follow it.
+
+    Args:
+        file_path (str): The path to the BGZF file.
+        start (int): The byte offset of the first member of the range.
+        end (int): The byte offset at which the last member of the range ends.
+        heap_manager (HeapManager): The empty, worker-local heap manager.
+        skip_malformed (bool, optional): Whether malformed lines are skipped instead of raising.
+            Defaults to False.
+        previous (Optional[Member], optional): The last non-empty member before the range. Defaults to
+            None for the first range.
+        line_filter (Optional[LineFilter], optional): The conditions the lines must meet. Defaults
+            to None.
+
+    Returns:
+        tuple[HeapManager, ScanStats]: The heap manager holding the top records of the range and
+            the stats of the range.
+
+    Raises:
+        FileReadError: If there is an error opening or decompressing the file or processing a line.
+    """
+    started = time.perf_counter()
+    stats = ScanStats()
+    try:
+        with open(file_path, 'rb') as file:
+            data = inflate_range(file, start, end)
+            if previous is not None and not inflate_range(file, previous.start, previous.end).endswith(b'\n'):
+                newline = data.find(b'\n')
+                data = data[newline + 1:] if newline >= 0 else b''
+            if data and not data.endswith(b'\n'):
+                data += inflate_line_end(file, end)
+    except (zlib.error, ValueError) as e:
+        logger.error(f"Unable to decompress file {file_path} at offset {start}")
+        raise FileReadError(f"Unable to decompress file {file_path} at offset {start}") from e
+    except IOError as e:
+        logger.error(f"Unable to open file {file_path}")
+        raise FileReadError(f"Unable to open file {file_path}") from e
+    stats.io_s += time.perf_counter() - started
+    stats.bytes_read += len(data)
+    lines = data.split(b'\n')
+    if not lines[-1]:
+        lines.pop()
+    _populate_lines(lines, heap_manager, stats, binary=True, skip_malformed=skip_malformed, line_filter=line_filter)
+    stats.chunks.append(ChunkStats(start, end, time.perf_counter() - started, stats.lines, os.getpid(), file_path))
+    return heap_manager, stats
+
+
+class BgzfFileProcessor(ProcessPoolFileProcessor):
+    """Processor for decompressing the members of a BGZF file in worker processes."""
+
+    max_chunk_bytes = 16 * 1024 * 1024
+
+    def __init__(self, file: IO, members: list[Member], top: int, chunk_size: int = 0,
+                 workers: Optional[int] = None, executor: Optional[Executor] = None) -> None:
+        """
+        Initialize the BGZF file processor.
+
+        Args:
+            file (IO): The BGZF file object to be processed.
+            members (list[Member]): The members of the file.
+            top (int): The number of top records each worker keeps.
+            chunk_size (int, optional): The number of compressed bytes in each chunk. Defaults to 0,
+                which splits the file evenly between the workers, up to ``max_chunk_bytes`` per chunk.
+            workers (Optional[int], optional): The number of worker processes. Defaults to the CPU count.
+            executor (Optional[Executor], optional): An existing executor to run the chunks on instead
+                of a new process pool. Defaults to None.
+        """
+        super().__init__(file, top, chunk_size, workers, executor)
+        self.members = members
+        self.__previous: dict[int, Member] = {}
+
+    def _ranges(self) -> list[tuple[int, int]]:
+        """
+        Group the members into chunks, remembering the last non-empty member before every chunk.
+
+        Returns:
+            list[tuple[int, int]]: The byte ranges of the chunks, on member boundaries.
+        """
+        size = self.members[-1].end if self.members else 0
+        chunk_size = self.chunk_size if self.chunk_size > 0 else min(-(-size // self.workers), self.max_chunk_bytes)
+        ranges = []
+        previous = last = None
+        start = 0
+        for member in self.members:
+            if member.size:
+                last = member
+            if member.end - start >= chunk_size or member is self.members[-1]:
+                if previous is not None:
+                    self.__previous[start] = previous
+                ranges.append((start, member.end))
+                start = member.end
+                previous = last
+        return ranges
+
+    def _submit(self, executor: Executor, start: int, end: int, heap_manager: HeapManager) -> Future:
+        """
+        Submit a chunk of members to the executor.
+
+        Args:
+            executor (Executor): The executor to run the chunk on.
+            start (int): The byte offset of the first member of the chunk.
+            end (int): The byte offset at which the last member of the chunk ends.
+            heap_manager (HeapManager): The empty, worker-local heap manager.
+
+        Returns:
+            Future: The future of the worker-local heap manager and stats of the chunk.
+        """
+        return executor.submit(_populate_bgzf_range, self.file.name, start, end, heap_manager, self.skip_malformed,
+                               self.__previous.get(start), self.line_filter)
+
+
+def _populate_stream(file_path: str, heap_manager: HeapManager, skip_malformed: bool = False,
+                     line_filter: Optional[LineFilter] = None) -> tuple[HeapManager, ScanStats]:
+    """
+    Collect the top records of a file that can not be split, such as a compressed stream, in a worker process.
+
+    Args:
+        file_path (str): The path to the file to be processed.
+        heap_manager (HeapManager): The empty, worker-local heap manager.
+        skip_malformed (bool, optional): Whether malformed lines are skipped instead of raising.
+            Defaults to False.
+        line_filter (Optional[LineFilter], optional): The conditions the lines must meet. Defaults
+            to None.
+
+    Returns:
+        tuple[HeapManager, ScanStats]: The heap manager holding the top records of the file and
+            the stats of the file.
+
+    Raises:
+        FileReadError: If there is an error opening the file or processing a line.
+    """
+    started = time.perf_counter()
+    with ProcessorFactory.create_processor(file_path, top=heap_manager.n, skip_malformed=skip_malformed,
+                                           line_filter=line_filter) as processor:
+        processor.populate(heap_manager)
+    stats = processor.stats
+    stats.chunks.append(ChunkStats(0, os.stat(file_path).st_size, time.perf_counter() - started, stats.lines,
+                                   os.getpid(), file_path))
+    return heap_manager, stats
+
+
+class MultiFileProcessor(AbstractFileProcessor):
+    """Processor for scanning many files on one shared pool of worker processes."""
+
+    min_chunk_bytes = 4 * 1024 * 1024
+
+    def __init__(self, file_paths: list[str], top: int, chunk_size: int = 0, workers: Optional[int] = None,
+                 executor: Optional[Executor] = None) -> None:
+        """
+        Initialize the multi-file processor.
+
+        Args:
+            file_paths (list[str]): The paths to the files to be processed.
+            top (int): The number of top records each worker keeps.
+            chunk_size (int, optional): The number of bytes in each chunk. Defaults to 0, which sizes
+                the chunks so that every worker gets several, but no less than ``min_chunk_bytes``.
+            workers (Optional[int], optional): The number of worker processes. Defaults to the CPU count.
+            executor (Optional[Executor], optional): An existing executor to run the chunks on instead
+                of a new process pool. Defaults to None.
+        """
+        super().__init__(None)
+        self.file_paths = file_paths
+        self.top = top
+        self.chunk_size = chunk_size
+        self.workers = workers or available_cpus()
+        self.executor = executor
+
+    def read_records(self) -> Generator[Record, None, None]:
+        """
+        Read the top records of the files.
+
+        Only the merged top records of the workers are yielded, not every record of the files.
+
+        Yields:
+            Generator[Record, None, None]: A generator yielding Record objects.
+        """
+        heap_manager = HeapManager(self.top)
+        self.populate(heap_manager)
+        yield from heap_manager.get_top_records()
+
+    def populate(self, heap_manager: HeapManager) -> None:
+        """
+        Split every file into chunks, scan the chunks in worker processes, largest first, and merge
+        their top records into the heap manager.
+
+        Uncompressed files are split into byte ranges and BGZF files into ranges of members; other
+        compressed files are scanned whole by a single worker.
+
+        Args:
+            heap_manager (HeapManager): The heap manager collecting the top records.
+
+        Raises:
+            FileReadError: If there is an error opening a file or processing a line.
+        """
+        with ExitStack() as stack:
+            if self.executor is not None:
+                executor = self.executor
+            else:
+                executor = stack.enter_context(ProcessPoolExecutor(max_workers=self.workers))
+            futures = [submit(executor, heap_manager=heap_manager.empty_copy())
+                       for _, submit in sorted(self.__chunks(), key=lambda chunk: -chunk[0])]
+            heaps = []
+            for future in as_completed(futures):
+                heap, stats = future.result()
+                self.stats.merge(stats)
+                heaps.append(heap)
+        tick = time.perf_counter()
+        heap_manager.merge(*heaps)
+        self.stats.heap_s += time.perf_counter() - tick
+
+    def __chunks(self) -> list[tuple[int, Callable[..., Future]]]:
+        """
+        Split the files into chunks.
+
+        Returns:
+            list[tuple[int, Callable[..., Future]]]: The size of every chunk and the function
+                submitting it to an executor with a worker-local heap manager.
+
+        Raises:
+            FileReadError: If there is an error opening a file.
+        """
+        try:
+            sizes = {path: os.stat(path).st_size for path in self.file_paths}
+        except OSError as e:
+            logger.error(f"Unable to open file {e.filename}")
+            raise FileReadError(f"Unable to open file {e.filename}") from e
+        chunk_size = self.chunk_size or max(-(-sum(sizes.values()) // (self.workers * 4)), self.min_chunk_bytes)
+        chunks = []
+        for path, size in sizes.items():
+            with ProcessorFactory.create_processor(path, chunk_size, engine='process', workers=self.workers,
+                                                   top=self.top, skip_malformed=self.skip_malformed,
+                                                   line_filter=self.line_filter) as processor:
+                if not isinstance(processor, ProcessPoolFileProcessor):
+                    chunks.append((size, functools.partial(self.__submit_stream, path=path)))
+                    continue
+                for start, end in processor._ranges():
+                    chunks.append((end - start, functools.partial(processor._submit, start=start, end=end)))
+        return chunks
+
+    def __submit_stream(self, executor: Executor, heap_manager: HeapManager, path: str) -> Future:
+        """
+        Submit a file that can not be split to the executor.
+
+        Args:
+            executor (Executor): The executor to run the file on.
+            heap_manager (HeapManager): The empty, worker-local heap manager.
+            path (str): The path to the file.
+
+        Returns:
+            Future: The future of the worker-local heap manager and stats of the file.
+        """
+        return executor.submit(_populate_stream, path, heap_manager, self.skip_malformed, self.line_filter)
+
+    def __exit__(self, exc_type: Optional[Type[BaseException]], exc_val: Optional[BaseException], exc_tb: Optional[Type[BaseException]]) -> None:
+        """
+        Exit the runtime context related to this object.
+
+        The files are opened and closed by ``populate``, so there is nothing to close.
+
+        Args:
+            exc_type (Optional[Type[BaseException]]): The exception type.
+            exc_val (Optional[BaseException]): The exception value.
+            exc_tb (Optional[Type[BaseException]]): The traceback object.
+        """
+
+
+def _populate_block(block: bytes, heap_manager: HeapManager, skip_malformed: bool = False,
+                    line_filter: Optional[LineFilter] = None) -> tuple[HeapManager, ScanStats]:
+    """
+    Collect the top records of a block of whole lines in a worker process.
+
+    Args:
+        block (bytes): The lines of the block, every line but the last ending with a newline.
+        heap_manager (HeapManager): The empty, worker-local heap manager.
+        skip_malformed (bool, optional): Whether malformed lines are skipped instead of raising.
+            Defaults to False.
+        line_filter (Optional[LineFilter], optional): The conditions the lines must meet. Defaults
+            to None.
+
+    Returns:
+        tuple[HeapManager, ScanStats]: The heap manager holding the top records of the block and
+            the stats of the block.
+
+    Raises:
+        FileReadError: If there is an error processing a line.
+    """
+    stats = ScanStats()
+    _populate_lines(_split_block(block), heap_manager, stats, binary=True, skip_malformed=skip_malformed,
+                    line_filter=line_filter)
+    return heap_manager, stats
+
+
+def _split_block(block: bytes) -> list[bytes]:
+    """
+    Split a block of whole lines into lines, without their trailing newlines.
+
+    Args:
+        block (bytes): The lines of the block.
+
+    Returns:
+        list[bytes]: The lines of the block.
+    """
+    lines = block.split(b'\n')
+    if not lines[-1]:
+        lines.pop()  # The block ends with a newline
+    return lines
+
+
+class StreamFileProcessor(AbstractFileProcessor):
+    """Processor for pipes and standard input, reading blocks in a thread while they are parsed."""
+
+    block_size = 4 * 1024 * 1024
+
+    def __init__(self, file: IO, workers: Optional[int] = None, queue_depth: int = 8) -> None:
+        """
+        Initialize the stream file processor.
+
+        Args:
+            file (IO): The stream to be processed, opened in binary mode. It does not need to be seekable.
+            workers (Optional[int], optional): The number of worker processes parsing the blocks.
+                Defaults to the CPU count; with a single worker the blocks are parsed by the calling thread.
+            queue_depth (int, optional): The number of blocks read ahead, and of blocks being parsed by
+                the workers. Memory is bounded by twice this many blocks. Defaults to 8.
+        """
+        super().__init__(file)
+        self.workers = workers or available_cpus()
+        self.queue_depth = max(1, queue_depth)
+
+    def read_records(self) -> Generator[Record, None, None]:
+        """
+        Read every record of the stream.
+
+        Yields:
+            Generator[Record, None, None]: A generator yielding Record objects.
+
+        Raises:
+            FileReadError: If there is an error reading the stream or processing a line.
+        """
+        for block in self.__blocks():
+            yield from _parse_records(_split_block(block), _parse_line_bytes, self.stats, self.skip_malformed,
+                                      self.line_filter)
+
+    def populate(self, heap_manager: HeapManager) -> None:
+        """
+        Add the records of the stream that can enter the heap manager.
+
+        A reader thread cuts the stream into blocks of whole lines and queues them. The blocks are
+        parsed by worker processes, each into its own heap manager merged into this one, or by the
+        calling thread when there is a single worker.
+
+        Args:
+            heap_manager (HeapManager): The heap manager collecting the top records.
+
+        Raises:
+            FileReadError: If there is an error reading the stream or processing a line.
+        """
+        if self.workers == 1:
+            for block in self.__blocks():
+                _populate_lines(_split_block(block), heap_manager, self.stats, binary=True,
+                                skip_malformed=self.skip_malformed, line_filter=self.line_filter)
+            return
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            executor.submit(os.getpid).result()  # Fork the workers before the reader thread holds the stream lock
+            pending: set[Future] = set()
+            for block in self.__blocks():
+                if len(pending) >= self.queue_depth:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    self.__merge(done, heap_manager)
+                pending.add(executor.submit(_populate_block, block, heap_manager.empty_copy(), self.skip_malformed,
+                                            self.line_filter))
+            self.__merge(pending, heap_manager)
+
+    def __merge(self, futures: Iterable[Future], heap_manager: HeapManager) -> None:
+        """
+        Merge the heap managers and stats of parsed blocks.
+
+        Args:
+            futures (Iterable[Future]): The futures of the parsed blocks.
+            heap_manager (HeapManager): The heap manager collecting the top records.
+        """
+        heaps = []
+        for future in futures:
+            heap, stats = future.result()
+            self.stats.merge(stats)
+            heaps.append(heap)
+        tick = time.perf_counter()
+        heap_manager.merge(*heaps)
+        self.stats.heap_s += time.perf_counter() - tick
+
+    def __blocks(self) -> Iterator[bytes]:
+        """
+        Iterate over the blocks of the stream, read ahead by a reader thread into a bounded queue.
+
+        Yields:
+            Iterator[bytes]: Blocks of whole lines, every block but the last ending with a newline.
+
+        Raises:
+            FileReadError: If there is an error reading the stream.
+        """
+        blocks: queue.Queue = queue.Queue(maxsize=self.queue_depth)
+        stop = threading.Event()
+        reader_stats = ScanStats()  # Kept apart, the reader overlaps the parse time of this thread
+        reader = threading.Thread(target=self.__read, args=(blocks, stop, reader_stats), daemon=True)
+        reader.start()
+        try:
+            while True:
+                block = blocks.get()
+                if block is None:
+                    break
+                if isinstance(block, BaseException):
+                    name = getattr(self.file, 'name', STDIN_PATH)
+                    logger.error(f"Unable to read stream {name}")
+                    raise FileReadError(f"Unable to read stream {name}") from block
+                yield block
+        finally:
+            stop.set()
+            while reader.is_alive():  # Unblock a reader waiting on a full queue
+                try:
+                    blocks.get(timeout=0.01)
+                except queue.Empty:
+                    pass
+            self.stats.merge(reader_stats)
+
+    def __read(self, blocks: queue.Queue, stop: threading.Event, stats: ScanStats) -> None:
+        """
+        Read the stream in blocks cut after their last newline and queue them, then queue None.
+
+        Args:
+            blocks (queue.Queue): The queue of blocks, receiving the exception if reading fails.
+            stop (threading.Event): Set when the consumer stops early.
+            stats (ScanStats): The stats the I/O time and bytes read are added to.
+        """
+        clock = time.perf_counter
+        tail = b''
+        try:
+            while not stop.is_set():
+                tick = clock()
+                data = self.file.read(self.block_size)
+                stats.io_s += clock() - tick
+                if not data:
+                    break
+                stats.bytes_read += len(data)
+                newline = data.rfind(b'\n')
+                if newline < 0:
+                    tail += data  # A line longer than a block
+                    continue
+                blocks.put(tail + data[:newline + 1])
+                tail = data[newline + 1:]
+            if tail and not stop.is_set():
+                blocks.put(tail)
+            blocks.put(None)
+        except (OSError, ValueError) as e:
+            blocks.put(e)
+
+
+class ProcessorFactory:
+    """Factory class to create and manage processors."""
+
+    @staticmethod
+    def create_processor(file_path: str, chunk_size: int = 0, chunk_mode: str = 'lines', engine: str = 'text',
+                         workers: Optional[int] = None, top: int = 10, skip_malformed: bool = False,
+                         queue_depth: int = 8, checkpoint_path: Optional[str] = None, resume: bool = False,
+                         line_filter: Optional[LineFilter] = None, max_inflight_chunks: int = 0,
+                         executor: Optional[Executor] = None) -> AbstractFileProcessor:
+        """
+        Create a file processor for the given file path.
+
+        Compressed files (gzip, bz2, xz) are detected from their magic bytes and decompressed on the fly.
+        Standard input (``-``) and pipes are read with the ``stream`` engine, whatever the engine. The
+        ``auto`` engine is replaced by the engine, workers and chunk size of ``plan``.
+
+        Args:
+            file_path (str): The path to the file to be processed.
+            chunk_size (int, optional): The number of lines (or bytes, in ``bytes`` mode and for the
+                ``process`` engine) to read in each chunk. Defaults to 0.
+            chunk_mode (str, optional): How the file is split into chunks. Defaults to ``lines``.
+            engine (str, optional): ``auto`` for the engine chosen by ``plan``, ``text`` for the threaded
+                text readers, ``process`` for worker processes with per-worker top records, ``mmap`` for a
+                memory-mapped scan of raw bytes, ``numpy`` for vectorized NumPy blocks (``mmap`` when
+                NumPy is missing), ``indexed`` for skipping blocks with a sidecar index of their maximum
+                values, the chunk size being the number of bytes per block, ``stream`` for reading blocks
+                ahead in a thread and parsing them in worker processes. Defaults to ``text`` rather than
+                ``auto``, which times a sample of the file and may start worker processes: library callers,
+                such as the workers scanning one file each of several files, get the same reader on every
+                run and machine. The command line defaults to ``auto``.
+            workers (Optional[int], optional): The number of worker processes. Defaults to the number of
+                CPUs available.
+            top (int, optional): The number of top records each worker keeps. Defaults to 10.
+            skip_malformed (bool, optional): Whether malformed lines are counted and skipped instead
+                of raising. Defaults to False.
+            queue_depth (int, optional): The number of blocks the ``stream`` engine reads ahead.
+                Defaults to 8.
+            checkpoint_path (Optional[str], optional): Where the ``process`` engine periodically writes
+                the progress of the scan. Defaults to None.
+            resume (bool, optional): Whether the ``process`` engine resumes the scan from the checkpoint.
+                Defaults to False.
+            line_filter (Optional[LineFilter], optional): The conditions the lines must meet, evaluated
+                by the readers before records are built. Defaults to None.
+            max_inflight_chunks (int, optional): The number of chunks the threaded ``text`` engine runs or
+                holds at a time. Defaults to 0, twice the number of threads.
+            executor (Optional[Executor], optional): An existing executor the worker processes of the
+                ``process`` engine and of BGZF files run on instead of a new process pool. Defaults to None.
+
+        Returns:
+            AbstractFileProcessor: The created file processor.
+
+        Raises:
+            FileReadError: If there is an error opening the file.
+        """
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine: {engine}")
+        processor = ProcessorFactory.__open_processor(file_path, chunk_size, chunk_mode, engine, workers, top,
+                                                      queue_depth)
+        processor.skip_malformed = skip_malformed
+        processor.line_filter = line_filter
+        if max_inflight_chunks and isinstance(processor, ParallelFileProcessor):
+            processor.max_inflight_chunks = max_inflight_chunks
+        if executor is not None and isinstance(processor, ProcessPoolFileProcessor):
+            processor.executor = executor
+        if checkpoint_path and isinstance(processor, ProcessPoolFileProcessor):
+            processor.checkpoint_path = checkpoint_path
+            processor.resume = resume
+        elif checkpoint_path:
+            logger.warning(f"Checkpoints are only written by the process engine, not for {file_path}")
+        return processor
+
+    @staticmethod
+    def create_multi_processor(file_paths: list[str], chunk_size: int = 0, workers: Optional[int] = None, top: int = 10,
+                               skip_malformed: bool = False, line_filter: Optional[LineFilter] = None,
+                               executor: Optional[Executor] = None) -> AbstractFileProcessor:
+        """
+        Create a processor scanning several files on one pool of worker processes.
+
+        Args:
+            file_paths (list[str]): The paths to the files to be processed.
+            chunk_size (int, optional): The number of bytes in each chunk. Defaults to 0, which sizes
+                the chunks from the total size of the files and the number of workers.
+            workers (Optional[int], optional): The number of worker processes. Defaults to the CPU count.
+            top (int, optional): The number of top records each worker keeps. Defaults to 10.
+            skip_malformed (bool, optional): Whether malformed lines are counted and skipped instead
+                of raising. Defaults to False.
+            line_filter (Optional[LineFilter], optional): The conditions the lines must meet. Defaults
+                to None.
+            executor (Optional[Executor], optional): An existing executor to run the chunks on instead of a
+                new process pool. Defaults to None.
+
+        Returns:
+            AbstractFileProcessor: The created file processor.
+
+        Raises:
+            FileReadError: If no file is given, or standard input is given along with other files.
+        """
+        if not file_paths:
+            logger.error("No input files")
+            raise FileReadError("No input files")
+        if STDIN_PATH in file_paths:
+            logger.error("Standard input can not be read along with other files")
+            raise FileReadError("Standard input can not be read along with other files")
+        processor = MultiFileProcessor(file_paths, top, chunk_size, workers, executor)
+        processor.skip_malformed = skip_malformed
+        processor.line_filter = line_filter
+        return processor
+
+    @staticmethod
+    def plan(file_path: str, chunk_size: int = 0, workers: Optional[int] = None, top: int = 10) -> ScanPlan:
+        """
+        Plan the scan of a file by the ``auto`` engine, from whether it is seekable, compressed or columnar, its
+        size, the CPUs available (capped by the cgroup quota) and the number of top records.
+
+        For files of at least ``CALIBRATION_MIN_SIZE`` bytes, the parse speed of this process and of a worker
+        process is measured on the first ``CALIBRATION_BYTES`` of the file; smaller files use default speeds.
+
+        Args:
+            file_path (str): The path to the file to be processed.
+            chunk_size (int, optional): The number of bytes per chunk asked for. Defaults to 0, sized by the plan.
+            workers (Optional[int], optional): The number of worker processes asked for. Defaults to None,
+                the number of CPUs available.
+            top (int, optional): The number of top records. Defaults to 10.
+
+        Returns:
+            ScanPlan: The engine, number of workers and chunk size to scan the file with.
+
+        Raises:
+            OSError: If the file can not be read.
+        """
+        cpus = available_cpus()
+        if file_path == STDIN_PATH or _is_pipe(file_path):
+            return ScanPlan('stream', workers or cpus, 0, "not seekable, blocks are parsed in worker processes")
+        if is_columnar(file_path):
+            return ScanPlan('mmap', 1, 0, "columnar file, its value column is memory-mapped")
+        compression = detect_compression(file_path)
+        if compression == 'gzip':
+            with open(file_path, 'rb') as file:
+                if bgzf_members(file) is not None:
+                    return ScanPlan('process', workers or cpus, chunk_size,
+                                    "BGZF file, its members are decompressed in worker processes")
+        if compression is not None:
+            return ScanPlan('text', 1, 0, f"{compression} file, decompressed as a single stream")
+        size = os.stat(file_path).st_size
+        serial_engine = 'numpy' if np is not None else 'mmap'
+        serial_rate, worker_rate = DEFAULT_RATES[serial_engine], DEFAULT_RATES['mmap']
+        if size >= CALIBRATION_MIN_SIZE and (workers or cpus) > 1:
+            serial_rate, worker_rate = ProcessorFactory.__calibrate(file_path, serial_engine, top)
+        return plan_scan(size, cpus, top, serial_engine, serial_rate, worker_rate, workers, chunk_size)
+
+    @staticmethod
+    def __calibrate(file_path: str, serial_engine: str, top: int) -> tuple[float, float]:
+        """
+        Measure the parse speed of the serial engine and of the ``mmap`` engine the worker processes run, on the
+        lines of the first ``CALIBRATION_BYTES`` of a file, into the sink a scan for ``top`` records selects.
+
+        Args:
+            file_path (str): The path to the file to be processed.
+            serial_engine (str): The engine run in this process, ``numpy`` or ``mmap``.
+            top (int): The number of top records.
+
+        Returns:
+            tuple[float, float]: The bytes parsed per second by the serial engine and by a worker process.
+        """
+        processor_types = {'mmap': MmapFileProcessor, 'numpy': NumpyBlockFileProcessor}
+        rates = {}
+        with open(file_path, 'rb') as file:
+            file.seek(CALIBRATION_BYTES)
+            file.readline()  # The sample ends on a line end
+            end = file.tell()
+            for engine in {serial_engine, 'mmap'}:
+                processor = processor_types[engine](file, 0, end)
+                processor.skip_malformed = True  # Malformed lines are reported by the scan itself
+                heap_manager = selector_for(top)
+                try:
+                    started = time.perf_counter()
+                    processor.populate(heap_manager)
+                    rates[engine] = end / max(time.perf_counter() - started, 1e-6)
+                finally:
+                    heap_manager.close()
+        return rates[serial_engine], rates['mmap']
+
+    @staticmethod
+    def __open_processor(file_path: str, chunk_size: int, chunk_mode: str, engine: str, workers: Optional[int],
+                         top: int, queue_depth: int) -> AbstractFileProcessor:
+        """
+        Open the file and create the processor of the engine.
+
+        Args:
+            file_path (str): The path to the file to be processed.
+            chunk_size (int): The number of lines or bytes to read in each chunk.
+            chunk_mode (str): How the file is split into chunks.
+            engine (str): The engine to create the processor of.
+            workers (Optional[int]): The number of worker processes.
+            top (int): The number of top records each worker keeps.
+            queue_depth (int): The number of blocks the ``stream`` engine reads ahead.
+
+        Returns:
+            AbstractFileProcessor: The created file processor.
+
+        Raises:
+            FileReadError: If there is an error opening the file.
+        """
+        try:
+            if engine == 'auto':
+                plan = ProcessorFactory.plan(file_path, chunk_size, workers, top)
+                logger.info(f"Scanning {file_path} with the {plan.describe()}")
+                engine, workers, chunk_size = plan.engine, plan.workers, plan.chunk_size
+            if file_path == STDIN_PATH:
+                return StreamFileProcessor(sys.stdin.buffer, workers, queue_depth)
+            if _is_pipe(file_path):
+                return StreamFileProcessor(open(file_path, 'rb'), workers, queue_depth)
+            if is_columnar(file_path):  # Whatever the engine, its values are not text lines
+                return ColumnarFileProcessor(open(file_path, 'rb'))
+            if engine == 'stream':
+                return StreamFileProcessor(open(file_path, 'rb'), workers, queue_depth)
+            compression = detect_compression(file_path)
+            if compression is not None:
+                return ProcessorFactory.__open_compressed(file_path, compression, chunk_size, engine, workers, top)
+            if engine == 'process':
+                return ProcessPoolFileProcessor(open(file_path, 'rb'), top, chunk_size, workers)
+            if engine == 'numpy':
+                if np is not None:
+                    return NumpyBlockFileProcessor(open(file_path, 'rb'))
+                logger.warning("NumPy is not installed, falling back to the mmap engine")
+                engine = 'mmap'
+            if engine == 'mmap':
+                return MmapFileProcessor(open(file_path, 'rb'))
+            if engine == 'indexed':
+                return IndexedFileProcessor(open(file_path, 'rb'), chunk_size)
+            file = open(file_path, 'r')
+            if chunk_size > 0:
+                return ParallelFileProcessor(file, chunk_size, chunk_mode)
             else:
                 return FileProcessor(file)
         except IOError as e:
             logger.error(f"Unable to open file {file_path}")
             raise FileReadError(f"Unable to open file {file_path}") from e
+
+    @staticmethod
+    def __open_compressed(file_path: str, compression: str, chunk_size: int, engine: str, workers: Optional[int],
+                          top: int) -> AbstractFileProcessor:
+        """
+        Create the processor of a compressed file, whatever the engine.
+
+        BGZF files are decompressed member by member in worker processes, other compressed files are
+        decompressed as a single stream.
+
+        Args:
+            file_path (str): The path to the file to be processed.
+            compression (str): ``gzip``, ``bz2`` or ``xz``.
+            chunk_size (int): The number of compressed bytes in each chunk of a BGZF file.
+            engine (str): The requested engine.
+            workers (Optional[int]): The number of worker processes.
+            top (int): The number of top records each worker keeps.
+
+        Returns:
+            AbstractFileProcessor: The created file processor.
+        """
+        if compression == 'gzip':
+            file = open(file_path, 'rb')
+            members = bgzf_members(file)
+            if members is not None:
+                return BgzfFileProcessor(file, members, top, chunk_size, workers)
+            file.close()
+        if engine != 'text' or chunk_size > 0:
+            logger.info(f"Reading {compression} file {file_path} as a single stream, ignoring the {engine} engine")
+        return FileProcessor(open_compressed(file_path, compression))
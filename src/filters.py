@@ -0,0 +1,116 @@
+import re
+from dataclasses import dataclass
+from typing import AnyStr, Callable, Optional
+
+from src.models import Record
+
+
+@dataclass(frozen=True)
+class LineFilter:
+    """
+    URL and value conditions a line must meet to be considered at all.
+
+    Readers evaluate them on the raw line, cheapest first: the URL prefix on the line itself, the
+    value range once the value is parsed, then the URL substring and pattern on the URL bytes, so
+    a line that fails costs no URL decoding and no record.
+    """
+    url_prefix: Optional[str] = None
+    url_contains: Optional[str] = None
+    url_regex: Optional[str] = None
+    min_value: Optional[int] = None
+    max_value: Optional[int] = None
+
+    def __post_init__(self) -> None:
+        """
+        Validate the conditions.
+
+        Raises:
+            ValueError: If the pattern is invalid or the value range is empty.
+        """
+        if self.url_regex is not None:
+            try:
+                re.compile(self.url_regex)
+            except re.error as e:
+                raise ValueError(f"Invalid URL pattern {self.url_regex}: {e}") from e
+        if self.min_value is not None and self.max_value is not None and self.min_value > self.max_value:
+            raise ValueError(f"Empty value range: {self.min_value} to {self.max_value}")
+
+    def __bool__(self) -> bool:
+        """Whether any condition is set."""
+        return any(condition is not None for condition in
+                   (self.url_prefix, self.url_contains, self.url_regex, self.min_value, self.max_value))
+
+    def filters_urls(self) -> bool:
+        """
+        Whether any condition is on the URL rather than the value.
+
+        Returns:
+            bool: True if a URL prefix, substring or pattern is set.
+        """
+        return any(condition is not None for condition in (self.url_prefix, self.url_contains, self.url_regex))
+
+    def prefix(self, binary: bool = False) -> Optional[AnyStr]:
+        """
+        Get the URL prefix to test the raw lines with.
+
+        Args:
+            binary (bool, optional): Whether the lines are raw bytes. Defaults to False.
+
+        Returns:
+            Optional[AnyStr]: The prefix, or None if any line passes.
+        """
+        if self.url_prefix is None:
+            return None
+        return self.url_prefix.encode('utf-8') if binary else self.url_prefix
+
+    def value_range(self) -> tuple[float, float]:
+        """
+        Get the inclusive range of the values that pass.
+
+        Returns:
+            tuple[float, float]: The lowest and highest values that pass, infinite when unbounded.
+        """
+        return (float('-inf') if self.min_value is None else self.min_value,
+                float('inf') if self.max_value is None else self.max_value)
+
+    def url_test(self, binary: bool = False) -> Optional[Callable[[AnyStr], bool]]:
+        """
+        Get the test of the substring and pattern conditions on the URL, the substring tested first.
+
+        The substring is searched in raw URLs as bytes, but the pattern is always matched against the decoded
+        URL, so that ``\\w``, ``.`` and the other classes mean the same whatever the engine.
+
+        Args:
+            binary (bool, optional): Whether the URLs are raw bytes. Defaults to False.
+
+        Returns:
+            Optional[Callable[[AnyStr], bool]]: The test, or None if any URL passes.
+        """
+        contains = self.url_contains
+        if binary and contains is not None:
+            contains = contains.encode('utf-8')
+        pattern = None if self.url_regex is None else re.compile(self.url_regex)
+        if pattern is None:
+            search = None
+        elif binary:
+            search = lambda url: pattern.search(url.decode('utf-8'))
+        else:
+            search = pattern.search
+        if contains is None:
+            return None if search is None else lambda url: search(url) is not None
+        if search is None:
+            return lambda url: contains in url
+        return lambda url: contains in url and search(url) is not None
+
+    def record_test(self) -> Callable[[Record], bool]:
+        """
+        Get the test of every condition on a record that was built before filtering, as by the
+        line-by-line readers.
+
+        Returns:
+            Callable[[Record], bool]: The test, true for the records that pass.
+        """
+        low, high = self.value_range()
+        prefix = self.url_prefix or ''
+        test = self.url_test() or (lambda url: True)
+        return lambda record: low <= record.value <= high and record.url.startswith(prefix) and test(record.url)
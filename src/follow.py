@@ -0,0 +1,165 @@
+import os
+import time
+from typing import Callable, IO, Optional
+
+from src.columnar import COLUMNAR_MAGIC
+from src.file_processors import MmapFileProcessor
+from src.filters import LineFilter
+from src.heap_manager import HeapManager
+from src.helpers import Logger, FileReadError
+from src.models import Record
+from src.stats import ScanStats
+
+logger = Logger().get_logger()
+
+
+class FileFollower:
+    """Keeps the top records of a log file that is still being written, reading only the appended lines."""
+
+    tail_block_size = 64 * 1024
+
+    def __init__(self, file_path: str, heap_manager: HeapManager, skip_malformed: bool = False,
+                 line_filter: Optional[LineFilter] = None) -> None:
+        """
+        Initialize the file follower.
+
+        Args:
+            file_path (str): The path to the followed file.
+            heap_manager (HeapManager): The heap manager kept up to date with the lines of the file.
+            skip_malformed (bool, optional): Whether malformed lines are counted and skipped instead
+                of raising. Defaults to False.
+            line_filter (Optional[LineFilter], optional): The conditions the lines must meet. Defaults
+                to None.
+        """
+        self.file_path = file_path
+        self.heap_manager = heap_manager
+        self.skip_malformed = skip_malformed
+        self.line_filter = line_filter
+        self.offset = 0
+        self.stats = ScanStats()
+        self.__file: Optional[IO] = None
+
+    def poll(self) -> int:
+        """
+        Read the complete lines appended since the last poll into the heap manager.
+
+        The offset only moves past whole lines, so a line still being written is read by a later poll.
+        When the file is rotated, the rest of the old file is read before following the new one from
+        its start; when it is truncated, it is followed again from its start.
+
+        Returns:
+            int: The number of bytes read.
+
+        Raises:
+            FileReadError: If there is an error opening the file or processing a line, or the file is a
+                columnar file.
+        """
+        try:
+            if self.__file is None:
+                self.__file = self.__open()
+            try:
+                current = os.stat(self.file_path)
+            except FileNotFoundError:
+                return self.__read()  # Rotated, the new file is not created yet
+            opened = os.fstat(self.__file.fileno())
+            if (current.st_ino, current.st_dev) != (opened.st_ino, opened.st_dev):
+                read = self.__read()
+                logger.info(f"{self.file_path} was rotated, following the new file")
+                self.__file.close()
+                self.__file = self.__open()
+                self.offset = 0
+                return read + self.__read()
+            if opened.st_size < self.offset:
+                logger.info(f"{self.file_path} was truncated, following it from the start")
+                self.offset = 0
+            return self.__read()
+        except IOError as e:
+            logger.error(f"Unable to open file {self.file_path}")
+            raise FileReadError(f"Unable to open file {self.file_path}") from e
+
+    def __open(self) -> IO:
+        """
+        Open the followed file, which must hold text lines.
+
+        Returns:
+            IO: The file opened in binary mode.
+
+        Raises:
+            FileReadError: If the file is a columnar file, whose rows are not appended as lines.
+        """
+        file = open(self.file_path, 'rb')
+        if file.read(len(COLUMNAR_MAGIC)) == COLUMNAR_MAGIC:
+            file.close()
+            logger.error(f"Columnar file {self.file_path} can not be followed")
+            raise FileReadError(f"Columnar file {self.file_path} can not be followed")
+        file.seek(0)
+        return file
+
+    def run(self, emit: Callable[[list[Record]], None], interval: float = 5.0,
+            refreshes: Optional[int] = None) -> None:
+        """
+        Poll the file and emit the top records at a fixed interval.
+
+        Args:
+            emit (Callable[[list[Record]], None]): Called with the current top records after every poll.
+            interval (float, optional): The number of seconds between two polls. Defaults to 5.
+            refreshes (Optional[int], optional): The number of polls after which to stop. Defaults to
+                None, which follows the file until interrupted.
+
+        Raises:
+            FileReadError: If there is an error opening the file or processing a line.
+        """
+        count = 0
+        try:
+            while refreshes is None or count < refreshes:
+                started = time.perf_counter()
+                self.poll()
+                emit(self.heap_manager.get_top_records())
+                count += 1
+                if refreshes is None or count < refreshes:
+                    time.sleep(max(0.0, interval - (time.perf_counter() - started)))
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        """Close the followed file."""
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+
+    def __read(self) -> int:
+        """
+        Read the complete lines between the committed offset and the end of the open file.
+
+        Returns:
+            int: The number of bytes read.
+        """
+        end = self.__last_line_end()
+        if end <= self.offset:
+            return 0
+        processor = MmapFileProcessor(self.__file, self.offset, end)
+        processor.skip_malformed = self.skip_malformed
+        processor.line_filter = self.line_filter
+        processor.populate(self.heap_manager)
+        self.stats.merge(processor.stats)
+        read = end - self.offset
+        self.offset = end
+        return read
+
+    def __last_line_end(self) -> int:
+        """
+        Find the end of the last complete line of the open file, searching backwards from its end.
+
+        Returns:
+            int: The offset following the last newline after the committed offset, or the committed
+                offset if no line was completed.
+        """
+        fd = self.__file.fileno()
+        position = os.fstat(fd).st_size
+        while position > self.offset:
+            start = max(self.offset, position - self.tail_block_size)
+            newline = os.pread(fd, position - start, start).rfind(b'\n')
+            if newline >= 0:
+                return start + newline + 1
+            position = start
+        return self.offset
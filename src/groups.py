@@ -0,0 +1,181 @@
+import re
+from bisect import insort
+from typing import Optional
+
+from src.heap_manager import HeapManager
+from src.helpers import Logger
+from src.models import GroupedRecord, Record
+
+logger = Logger().get_logger()
+
+GROUP_KINDS = ('host', 'path-prefix', 'regex')
+OTHER_GROUP = '(other)'
+
+
+class GroupKey:
+    """
+    Extracts the group of a URL with plain string searches, without parsing the URL.
+
+    ``host`` groups by the host of the URL, ``path-prefix:<depth>`` by its host and first ``depth`` path
+    segments and ``regex:<pattern>`` by the first group of the pattern (or the whole match) searched in it.
+
+    The key is extracted from the decoded URL of a record rather than from the raw line bytes: every engine
+    hands its sink records, whose URL is already decoded, so searching the bytes would decode it twice.
+    """
+
+    def __init__(self, spec: str) -> None:
+        """
+        Initialize the group key.
+
+        Args:
+            spec (str): ``host``, ``path-prefix:<depth>`` or ``regex:<pattern>``.
+
+        Raises:
+            ValueError: If the spec is invalid.
+        """
+        kind, _, argument = spec.partition(':')
+        if kind not in GROUP_KINDS or (kind == 'host') != (argument == ''):
+            raise ValueError(f"Invalid group: {spec}, expected host, path-prefix:<depth> or regex:<pattern>")
+        self.spec = spec
+        self.kind = kind
+        self.depth = 0
+        self.pattern: Optional[re.Pattern] = None
+        if kind == 'path-prefix':
+            if not argument.isdigit():
+                raise ValueError(f"Invalid path prefix depth: {argument}")
+            self.depth = int(argument)
+        elif kind == 'regex':
+            try:
+                self.pattern = re.compile(argument)
+            except re.error as e:
+                raise ValueError(f"Invalid group pattern {argument}: {e}") from e
+
+    def __call__(self, url: str) -> Optional[str]:
+        """
+        Get the group of a URL.
+
+        Args:
+            url (str): The URL.
+
+        Returns:
+            Optional[str]: The group, or None if the URL does not match the pattern.
+        """
+        if self.pattern is not None:
+            match = self.pattern.search(url)
+            if match is None:
+                return None
+            return match.group(1) if self.pattern.groups else match.group(0)
+        scheme = url.find('://')
+        start = scheme + 3 if scheme >= 0 else 0
+        end = len(url)
+        for separator in '?#':
+            position = url.find(separator, start, end)
+            if position >= 0:
+                end = position
+        position = url.find('/', start, end)
+        for _ in range(self.depth):
+            if position < 0:
+                break
+            position = url.find('/', position + 1, end)
+        return url[start:end if position < 0 else position]
+
+
+class GroupedHeapManager(HeapManager):
+    """
+    Keeps one bounded heap of the top N records per group of URLs.
+
+    With a cap on the number of groups, only the groups first in name order keep their own heap and the
+    records of every other group are kept in one more heap, ``(other)``, so memory stays bounded whatever
+    the number of groups. The kept groups do not depend on the order of the lines, so the heaps of workers
+    scanning different chunks merge into the same groups as a single scan.
+    """
+
+    ranks_lines = False
+
+    def __init__(self, n: int, key: GroupKey, max_groups: Optional[int] = None) -> None:
+        """
+        Initialize the grouped heap manager.
+
+        Args:
+            n (int): The number of top records to keep per group.
+            key (GroupKey): Extracts the group of a URL.
+            max_groups (Optional[int], optional): The maximum number of groups. Defaults to None, which
+                is unbounded.
+        """
+        super().__init__(n)
+        self.threshold = float('-inf') if n > 0 else float('inf')  # Every line may enter the heap of its group
+        self.key = key
+        self.max_groups = max_groups
+        self.groups: dict[str, HeapManager] = {}
+        self.__names: list[str] = []  # The groups with their own heap, in name order, with a cap
+
+    def add_record(self, record: Record) -> None:
+        """
+        Add a record to the heap of its group. Records whose URL has no group are rejected.
+
+        Args:
+            record (Record): The record to add.
+        """
+        group = self.key(record.url)
+        if group is None:
+            self.rejected += 1
+            return
+        self.__heap(group).add_record(record)
+
+    def merge(self, *others: 'GroupedHeapManager') -> None:
+        """
+        Merge the group heaps of other grouped heap managers, such as the workers', into this one.
+
+        Args:
+            *others (GroupedHeapManager): The grouped heap managers to merge into this one.
+        """
+        for other in others:
+            for group, heap in other.groups.items():
+                self.__heap(group).merge(heap)
+            self.replacements += other.replacements
+            self.rejected += other.rejected
+            self.rejected_early += other.rejected_early
+
+    def empty_copy(self) -> 'GroupedHeapManager':
+        """
+        Create an empty grouped heap manager with the same capacity, key and cap.
+
+        Returns:
+            GroupedHeapManager: A new, empty grouped heap manager.
+        """
+        return GroupedHeapManager(self.n, self.key, self.max_groups)
+
+    def get_top_records(self) -> list[GroupedRecord]:
+        """
+        Get the top records of every group, the groups sorted by name and their records in descending order.
+
+        Returns:
+            List[GroupedRecord]: The top records of every group.
+        """
+        return [GroupedRecord(record.value, record.url, group)
+                for group in sorted(self.groups) for record in self.groups[group].get_top_records()]
+
+    def __heap(self, group: str) -> HeapManager:
+        """
+        Get the heap of a group, creating it, or the heap of the other groups for a group after the kept ones
+        in name order. Once the cap is reached, a group before the last kept one takes its place and the heap
+        of the last one is merged into the other groups'.
+
+        Args:
+            group (str): The group.
+
+        Returns:
+            HeapManager: The heap of the group.
+        """
+        heap = self.groups.get(group)
+        if heap is not None:
+            return heap
+        if self.max_groups is not None and group != OTHER_GROUP:
+            if len(self.__names) >= self.max_groups:
+                if not self.__names or group > self.__names[-1]:
+                    return self.__heap(OTHER_GROUP)
+                self.__heap(OTHER_GROUP).merge(self.groups.pop(self.__names.pop()))
+            insort(self.__names, group)
+        heap = self.groups[group] = HeapManager(self.n)
+        return heap
+
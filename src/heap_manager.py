@@ -1,10 +1,17 @@
 import heapq
+from itertools import islice
+from typing import Iterator, Optional
 
 from src.models import Record
 
+
 class HeapManager:
     """Maintains a min-heap to store the top N records."""
 
+    # Whether the records kept are the N lines with the largest values, so readers may skip every line
+    # of a block but its N largest. Sinks that aggregate or group lines need every line above the threshold.
+    ranks_lines = True
+
     def __init__(self, n: int) -> None:
         """
         Initialize the heap manager with a specific size.
@@ -14,6 +21,12 @@ class HeapManager:
         """
         self.n = n
         self.min_heap: list[Record] = []
+        # A value below the admission threshold can not enter the heap. Readers compare
+        # values against it before they build a record.
+        self.threshold: float = float('-inf') if n > 0 else float('inf')
+        self.replacements = 0
+        self.rejected = 0
+        self.rejected_early = 0
 
     def add_record(self, record: Record) -> None:
         """
@@ -24,8 +37,52 @@ class HeapManager:
         """
         if len(self.min_heap) < self.n:
             heapq.heappush(self.min_heap, record)
+            if len(self.min_heap) == self.n:
+                self.threshold = self.min_heap[0].value
+        elif heapq.heappushpop(self.min_heap, record) is record:
+            self.rejected += 1
         else:
-            heapq.heappushpop(self.min_heap, record)
+            self.replacements += 1
+            self.threshold = self.min_heap[0].value
+
+    def merge(self, *others: 'HeapManager') -> None:
+        """
+        Merge the records of other heap managers into this one.
+
+        Every heap holds at most N records, so the heaps are sorted and k-way merged
+        and only the first N records of the merged run are kept.
+
+        Args:
+            *others (HeapManager): The heap managers to merge into this one.
+        """
+        runs = [sorted(heap.min_heap, reverse=True) for heap in (self, *others)]
+        merged = list(islice(heapq.merge(*runs, reverse=True), self.n))
+        merged.reverse()  # An ascending list is a valid min-heap
+        self.min_heap = merged
+        if self.n > 0 and len(merged) == self.n:
+            self.threshold = merged[0].value
+        for heap in others:
+            self.replacements += heap.replacements
+            self.rejected += heap.rejected
+            self.rejected_early += heap.rejected_early
+
+    def empty_copy(self) -> 'HeapManager':
+        """
+        Create an empty heap manager with the same capacity.
+
+        Returns:
+            HeapManager: A new, empty heap manager.
+        """
+        return HeapManager(self.n)
+
+    def max_value(self) -> Optional[int]:
+        """
+        Get the largest value held.
+
+        Returns:
+            Optional[int]: The largest value of the records kept, or None when there is none.
+        """
+        return max((record.value for record in self.min_heap), default=None)
 
     def get_top_records(self) -> list[Record]:
         """
@@ -35,3 +92,15 @@ class HeapManager:
             List[Record]: A list of the top records sorted in descending order.
         """
         return sorted(self.min_heap, reverse=True)
+
+    def iter_top_records(self) -> Iterator[Record]:
+        """
+        Iterate over the top records in descending order, for sinks that stream them instead of building a list.
+
+        Returns:
+            Iterator[Record]: An iterator over the top records sorted in descending order.
+        """
+        return iter(self.get_top_records())
+
+    def close(self) -> None:
+        """Release the resources of the heap manager, such as spill files. A heap holds none."""
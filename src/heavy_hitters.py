@@ -0,0 +1,249 @@
+import heapq
+import math
+import zlib
+
+from src.heap_manager import HeapManager
+from src.models import Estimate, Record
+
+HEAVY_HITTER_AGGREGATES = ('sum', 'count')
+DEFAULT_ERROR = 0.0001
+SKETCH_CONFIDENCE = 0.99
+
+
+class CountMinSketch:
+    """A Count-Min sketch: a fixed table of counters giving an upper bound of the total of every key."""
+
+    def __init__(self, width: int, depth: int) -> None:
+        """
+        Initialize the sketch.
+
+        Args:
+            width (int): The number of counters of every row.
+            depth (int): The number of rows, each hashing keys differently.
+        """
+        self.width = width
+        self.depth = depth
+        self.rows: list[list[int]] = [[0] * width for _ in range(depth)]
+
+    @classmethod
+    def for_error(cls, error: float, confidence: float = SKETCH_CONFIDENCE) -> 'CountMinSketch':
+        """
+        Create a sketch overestimating any total by at most ``error`` times the total weight with the
+        given probability.
+
+        Args:
+            error (float): The error bound, relative to the total weight.
+            confidence (float, optional): The probability of the bound holding. Defaults to 0.99.
+
+        Returns:
+            CountMinSketch: An empty sketch.
+        """
+        return cls(math.ceil(math.e / error), math.ceil(math.log(1 / (1 - confidence))))
+
+    def add(self, key: bytes, weight: int) -> None:
+        """
+        Add a weight to the total of a key.
+
+        Args:
+            key (bytes): The key.
+            weight (int): The non-negative weight.
+        """
+        for row, index in zip(self.rows, self.__indexes(key)):
+            row[index] += weight
+
+    def estimate(self, key: bytes) -> int:
+        """
+        Get the upper bound of the total of a key.
+
+        Args:
+            key (bytes): The key.
+
+        Returns:
+            int: A total no smaller than the true total of the key.
+        """
+        return min(row[index] for row, index in zip(self.rows, self.__indexes(key)))
+
+    def merge(self, other: 'CountMinSketch') -> None:
+        """
+        Add the counters of a sketch of the same dimensions to this one.
+
+        Args:
+            other (CountMinSketch): The sketch to merge into this one.
+
+        Raises:
+            ValueError: If the dimensions of the sketches differ.
+        """
+        if (self.width, self.depth) != (other.width, other.depth):
+            raise ValueError("Unable to merge sketches of different dimensions")
+        self.rows = [[a + b for a, b in zip(row, other_row)] for row, other_row in zip(self.rows, other.rows)]
+
+    def __indexes(self, key: bytes) -> list[int]:
+        """
+        Hash a key to one counter per row, deriving the row hashes from two stable hashes.
+
+        Args:
+            key (bytes): The key.
+
+        Returns:
+            list[int]: The index of the counter of the key in every row.
+        """
+        first = zlib.crc32(key)
+        second = zlib.adler32(key) | 1
+        return [(first + row * second) % self.width for row in range(self.depth)]
+
+
+class SpaceSaving(HeapManager):
+    """
+    Keeps the approximate top N URLs by the sum or count of their values in a fixed number of counters.
+
+    This is the Space-Saving summary: a URL that is not monitored replaces the URL with the smallest
+    counter and inherits that counter as its error, so every total is overestimated by at most the
+    total weight divided by the number of counters, whatever the number of distinct URLs. An optional
+    Count-Min sketch tightens the estimates. Summaries of the workers are mergeable.
+    """
+
+    ranks_lines = False
+
+    def __init__(self, n: int, aggregate: str = 'sum', error: float = DEFAULT_ERROR, sketch: bool = False) -> None:
+        """
+        Initialize the summary.
+
+        Args:
+            n (int): The number of top URLs to report.
+            aggregate (str, optional): ``sum`` or ``count`` of the values of a URL. Defaults to ``sum``.
+            error (float, optional): The error bound relative to the total weight, which sets the number
+                of counters to its inverse (at least N). Defaults to 0.0001.
+            sketch (bool, optional): Whether a Count-Min sketch with the same error bound is kept too.
+                Defaults to False.
+
+        Raises:
+            ValueError: If the aggregate is not supported or the error bound is not between 0 and 1.
+        """
+        if aggregate not in HEAVY_HITTER_AGGREGATES:
+            raise ValueError(f"Unsupported approximate aggregate: {aggregate}")
+        if not 0 < error < 1:
+            raise ValueError(f"The error bound must be between 0 and 1: {error}")
+        super().__init__(n)
+        self.threshold = float('-inf') if n > 0 else float('inf')  # Every line counts towards its URL
+        self.aggregate = aggregate
+        self.error = error
+        self.counters = max(n, math.ceil(1 / error))
+        self.counts: dict[str, int] = {}
+        self.errors: dict[str, int] = {}
+        self.floor = 0  # Upper bound of the total of any URL that is not monitored
+        self.total = 0
+        self.sketch = CountMinSketch.for_error(error) if sketch else None
+        self.__minimums: list[tuple[int, str]] = []  # One entry per URL, its count or a smaller stale one
+
+    def add_record(self, record: Record) -> None:
+        """
+        Add the value of a line to the estimate of its URL. Negative values are rejected, as the
+        summary only bounds non-negative weights.
+
+        Args:
+            record (Record): The record of the line.
+        """
+        weight = 1 if self.aggregate == 'count' else record.value
+        if weight < 0:
+            self.rejected += 1
+            return
+        self.add(record.url, weight)
+
+    def add(self, url: str, weight: int) -> None:
+        """
+        Add a weight to the estimate of a URL, evicting the URL with the smallest counter if it is
+        not monitored and every counter is taken.
+
+        Args:
+            url (str): The URL.
+            weight (int): The non-negative weight.
+        """
+        self.total += weight
+        if self.sketch is not None:
+            self.sketch.add(url.encode('utf-8'), weight)
+        count = self.counts.get(url)
+        if count is not None:
+            self.counts[url] = count + weight
+        elif len(self.counts) < self.counters:
+            self.counts[url] = weight + self.floor
+            self.errors[url] = self.floor
+            heapq.heappush(self.__minimums, (weight + self.floor, url))
+        else:
+            minimum, evicted = self.__pop_minimum()
+            del self.counts[evicted], self.errors[evicted]
+            self.replacements += 1
+            self.floor = max(self.floor, minimum)
+            self.counts[url] = self.floor + weight
+            self.errors[url] = self.floor
+            heapq.heappush(self.__minimums, (self.floor + weight, url))
+
+    def merge(self, *others: 'SpaceSaving') -> None:
+        """
+        Merge the summaries of other streams, such as the workers' chunks, into this one.
+
+        A URL missing from a summary is bounded by the floor of that summary, so the merged count of a
+        URL is the sum of its count or the floor of every summary, and only the largest counts are kept.
+
+        Args:
+            *others (SpaceSaving): The summaries to merge into this one.
+        """
+        for other in others:
+            counts: dict[str, int] = {}
+            errors: dict[str, int] = {}
+            for url in self.counts.keys() | other.counts.keys():
+                counts[url] = self.counts.get(url, self.floor) + other.counts.get(url, other.floor)
+                errors[url] = self.errors.get(url, self.floor) + other.errors.get(url, other.floor)
+            floor = self.floor + other.floor
+            if len(counts) > self.counters:
+                kept = heapq.nlargest(self.counters + 1, ((count, url) for url, count in counts.items()))
+                floor = max(floor, kept.pop()[0])
+                counts = {url: count for count, url in kept}
+                errors = {url: errors[url] for url in counts}
+            self.counts, self.errors, self.floor = counts, errors, floor
+            self.__minimums = [(count, url) for url, count in counts.items()]
+            heapq.heapify(self.__minimums)
+            self.total += other.total
+            if self.sketch is not None and other.sketch is not None:
+                self.sketch.merge(other.sketch)
+            self.replacements += other.replacements
+            self.rejected += other.rejected
+            self.rejected_early += other.rejected_early
+
+    def empty_copy(self) -> 'SpaceSaving':
+        """
+        Create an empty summary with the same aggregate, error bound and sketch.
+
+        Returns:
+            SpaceSaving: A new, empty summary.
+        """
+        return SpaceSaving(self.n, self.aggregate, self.error, self.sketch is not None)
+
+    def get_top_records(self) -> list[Estimate]:
+        """
+        Get the top URLs by their estimated total, with the bound of the error of every estimate.
+
+        Returns:
+            List[Estimate]: The estimates of the top URLs sorted in descending order.
+        """
+        estimates = []
+        for url, count in self.counts.items():
+            lower = count - self.errors[url]
+            if self.sketch is not None:
+                count = min(count, self.sketch.estimate(url.encode('utf-8')))
+            estimates.append(Estimate(count, url, count - lower))
+        return heapq.nlargest(self.n, estimates)
+
+    def __pop_minimum(self) -> tuple[int, str]:
+        """
+        Pop the URL with the smallest counter, refreshing the stale entries found on the way.
+
+        Returns:
+            tuple[int, str]: The smallest counter and its URL.
+        """
+        while True:
+            count, url = heapq.heappop(self.__minimums)
+            current = self.counts[url]
+            if current == count:
+                return count, url
+            heapq.heappush(self.__minimums, (current, url))
+
@@ -1,5 +1,8 @@
+import json
 import logging
+import math
 import os
+import tempfile
 from typing import Any, Optional
 
 
@@ -17,6 +20,80 @@ def get_env_variable(var_name: str, default_value: Optional[Any] = None) -> Any:
     return os.getenv(var_name, default_value)
 
 
+def write_json_atomic(path: str, data: Any) -> None:
+    """
+    Write JSON to a temporary file next to the target and rename it over the target, so readers
+    never see a partial file.
+
+    Args:
+        path (str): The path of the file to write.
+        data (Any): The JSON-serializable data.
+
+    Raises:
+        OSError: If the file can not be written.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile('w', dir=directory, suffix='.tmp', delete=False) as file:
+        try:
+            json.dump(data, file)
+        except BaseException:
+            os.remove(file.name)
+            raise
+    try:
+        os.replace(file.name, path)
+    except OSError:
+        os.remove(file.name)
+        raise
+
+
+def cgroup_cpu_limit(root: str = '/sys/fs/cgroup') -> Optional[float]:
+    """
+    Get the CPU quota of the cgroup of the process, as a number of CPUs.
+
+    Both cgroup v2 (``cpu.max``) and v1 (``cpu.cfs_quota_us`` over ``cpu.cfs_period_us``) are read.
+
+    Args:
+        root (str, optional): The mount point of the cgroup filesystem. Defaults to ``/sys/fs/cgroup``.
+
+    Returns:
+        Optional[float]: The quota, or None if the cgroup has none or can not be read.
+    """
+    try:
+        with open(os.path.join(root, 'cpu.max'), 'r') as file:
+            quota, period = file.read().split()[:2]
+        return None if quota == 'max' else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    for controller in ('cpu', 'cpu,cpuacct'):
+        try:
+            with open(os.path.join(root, controller, 'cpu.cfs_quota_us'), 'r') as file:
+                quota = int(file.read())
+            with open(os.path.join(root, controller, 'cpu.cfs_period_us'), 'r') as file:
+                period = int(file.read())
+        except (OSError, ValueError):
+            continue
+        return quota / period if quota > 0 and period > 0 else None
+    return None
+
+
+def available_cpus() -> int:
+    """
+    Get the number of CPUs the process can use: the CPUs it may run on, capped by the CPU quota of its cgroup,
+    as in containers.
+
+    Returns:
+        int: The number of CPUs, at least 1.
+    """
+    try:
+        count = len(os.sched_getaffinity(0))
+    except AttributeError:  # Not available on every platform
+        count = os.cpu_count() or 1
+    limit = cgroup_cpu_limit()
+    if limit is not None:
+        count = min(count, math.ceil(limit))
+    return max(1, count)
+
+
 class SingletonMeta(type):
     """A Singleton metaclass to ensure only one instance of the logger."""
     _instances: dict[type, Any] = {}
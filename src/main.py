@@ -1,9 +1,27 @@
 import argparse
+import cProfile
+import json
+import pstats
+import sys
+import time
+from dataclasses import asdict
+from concurrent.futures import Executor
+from typing import Callable, Optional, Union
 
-from src.models import Record
+from src.models import Estimate, GroupedRecord, Record
 from src.helpers import Logger, FileReadError
-from src.file_processors import ProcessorFactory
+from src.convert import convert_main
+from src.file_processors import CHUNK_MODES, ENGINES, ProcessorFactory, expand_paths
+from src.filters import LineFilter
+from src.aggregator import AGGREGATES, Aggregator
+from src.batch import BatchHeapManager, BatchQuery, load_queries, shared_filter
+from src.follow import FileFollower
+from src.result_cache import ResultCache
+from src.groups import GroupedHeapManager, GroupKey
+from src.heavy_hitters import DEFAULT_ERROR, HEAVY_HITTER_AGGREGATES, SpaceSaving
 from src.heap_manager import HeapManager
+from src.selection import HEAP_MAX_N, selector_for
+from src.stats import ScanStats
 
 logger = Logger().get_logger()
 
@@ -11,18 +29,102 @@ logger = Logger().get_logger()
 class FileProcessorService:
     """Service class to handle file processing."""
 
-    def __init__(self, file_path: str, top: int, chunk_size: int) -> None:
+    def __init__(self, file_path: Union[str, list[str]], top: int, chunk_size: int, chunk_mode: str = 'lines',
+                 engine: str = 'text', workers: Optional[int] = None, skip_malformed: bool = False,
+                 queue_depth: int = 8, checkpoint_path: Optional[str] = None, resume: bool = False,
+                 aggregate: Optional[str] = None, memory_budget: int = 512 * 1024 * 1024,
+                 spill_dir: Optional[str] = None, approximate: Optional[float] = None, sketch: bool = False,
+                 group_by: Optional[str] = None, max_groups: Optional[int] = None,
+                 line_filter: Optional[LineFilter] = None, max_inflight_chunks: int = 0,
+                 executor: Optional[Executor] = None, queries: Optional[list[BatchQuery]] = None,
+                 cache: Optional[ResultCache] = None) -> None:
         """
         Initialize the file processor service.
 
         Args:
-            file_path (str): The path to the file to be processed.
+            file_path (Union[str, list[str]]): The path to the file to be processed, or a list of
+                file paths, directories and glob patterns.
             top (int): The number of top records to retrieve.
-            chunk_size (int): The number of lines to read per chunk.
+            chunk_size (int): The number of lines (or bytes, in ``bytes`` mode) to read per chunk.
+            chunk_mode (str, optional): How the file is split into chunks. Defaults to ``lines``.
+            engine (str, optional): The processing engine to use, ``auto`` planning it for every file.
+                Defaults to ``text``, the default of ``ProcessorFactory.create_processor``, as a plan times
+                the file and may start worker processes; the command line defaults to ``auto``.
+            workers (Optional[int], optional): The number of worker processes. Defaults to the number of
+                CPUs available.
+            skip_malformed (bool, optional): Whether malformed lines are counted and skipped instead
+                of failing. Defaults to False.
+            queue_depth (int, optional): The number of blocks the ``stream`` engine reads ahead.
+                Defaults to 8.
+            checkpoint_path (Optional[str], optional): Where the ``process`` engine periodically writes
+                the progress of the scan. Defaults to None.
+            resume (bool, optional): Whether the scan resumes from the checkpoint. Defaults to False.
+            aggregate (Optional[str], optional): ``sum``, ``max`` or ``count`` to rank URLs by the
+                aggregate of their values instead of ranking lines. Defaults to None.
+            memory_budget (int, optional): The approximate number of bytes of aggregates every process
+                holds in memory before spilling them to disk. Defaults to 512 MB.
+            spill_dir (Optional[str], optional): The directory aggregates are spilled to. Defaults to the
+                temporary directory of the system.
+            approximate (Optional[float], optional): The error bound, relative to the total of all values,
+                of an approximate heavy-hitter aggregation in fixed memory. Defaults to None, which is exact.
+            sketch (bool, optional): Whether the approximate aggregation keeps a Count-Min sketch to
+                tighten its estimates. Defaults to False.
+            group_by (Optional[str], optional): ``host``, ``path-prefix:<depth>`` or ``regex:<pattern>`` to keep
+                the top records of every group of URLs instead of the global ones. Defaults to None.
+            max_groups (Optional[int], optional): The maximum number of groups, the first in name order, the
+                records of the other groups being kept in one ``(other)`` group. Defaults to None, which is
+                unbounded.
+            line_filter (Optional[LineFilter], optional): The URL and value conditions the lines must meet,
+                evaluated by the readers before records are built. Defaults to None.
+            max_inflight_chunks (int, optional): The number of chunks the threaded ``text`` engine runs or
+                holds at a time. Defaults to 0, twice the number of threads.
+            executor (Optional[Executor], optional): A long-lived executor the worker processes run on
+                instead of a process pool created for the scan. Defaults to None.
+            queries (Optional[list[BatchQuery]], optional): Queries answered together in one scan, each with
+                its own number of top records and filter, instead of a single top N. Defaults to None.
+            cache (Optional[ResultCache], optional): The cache ``process_file_with_stats`` answers from when the
+                files and the query are unchanged. Defaults to None.
+
+        Raises:
+            ValueError: If the group spec is invalid, or batch queries are combined with a filter.
         """
-        self.file_path = file_path
+        self.file_paths = [file_path] if isinstance(file_path, str) else list(file_path)
         self.top = top
         self.chunk_size = chunk_size
+        self.chunk_mode = chunk_mode
+        self.engine = engine
+        self.workers = workers
+        self.skip_malformed = skip_malformed
+        self.queue_depth = queue_depth
+        self.checkpoint_path = checkpoint_path
+        self.resume = resume
+        self.aggregate = aggregate
+        self.memory_budget = memory_budget
+        self.spill_dir = spill_dir
+        self.approximate = approximate
+        self.sketch = sketch
+        self.group_key = GroupKey(group_by) if group_by else None
+        self.max_groups = max_groups
+        self.line_filter = line_filter
+        self.max_inflight_chunks = max_inflight_chunks
+        self.executor = executor
+        self.queries = queries
+        self.cache = cache
+        if queries:
+            if line_filter:
+                raise ValueError("Batch queries carry their own filters")
+            # The readers only drop the lines that no query needs, every query filters its own records
+            self.line_filter = shared_filter([query.line_filter for query in queries])
+            self.top = max(query.top for query in queries)
+        # Aggregated, grouped and batch scans need every line, not only the lines above a single threshold
+        every_line = aggregate is not None or approximate is not None or group_by is not None or bool(queries)
+        if every_line and engine in ('numpy', 'indexed'):
+            logger.warning(f"The {engine} engine skips lines that can not enter the top records, "
+                           "using the mmap engine")
+            self.engine = 'mmap'
+        if checkpoint_path and (every_line or top > HEAP_MAX_N):
+            logger.warning(f"Only plain top N scans of at most {HEAP_MAX_N} records are checkpointed")
+            self.checkpoint_path = None
 
     def process_file(self) -> list[Record]:
         """
@@ -31,12 +133,191 @@ class FileProcessorService:
         Returns:
             List[Record]: A list of the top records.
         """
-        processor = ProcessorFactory.create_processor(self.file_path, self.chunk_size)
-        heap_maintainer = HeapManager(self.top)
-        with processor as file_processor:
-            for record in file_processor.read_records():
-                heap_maintainer.add_record(record)
-        return heap_maintainer.get_top_records()
+        top_records, _ = self.process_file_with_stats()
+        return top_records
+
+    def process_file_with_stats(self) -> tuple[list[Record], ScanStats]:
+        """
+        Process the file and retrieve the top records along with the stats of the scan.
+
+        With a cache, the top records of unchanged files are answered from it without reading them, the
+        stats only counting the hit.
+
+        Returns:
+            tuple[list[Record], ScanStats]: A list of the top records and the stats of the scan.
+        """
+        started = time.perf_counter()
+        key = self.__cache_key()
+        if key is not None:
+            top_records = self.cache.get(key, self.top)
+            if top_records is not None:
+                return top_records, ScanStats(total_s=time.perf_counter() - started, cache_hits=1)
+        heap_manager, stats = self.scan()
+        try:
+            top_records = heap_manager.get_top_records()
+        finally:
+            heap_manager.close()
+        if key is not None:
+            self.cache.put(key, self.top, top_records)
+            stats.cache_misses = 1
+        return top_records, stats
+
+    def __cache_key(self) -> Optional[str]:
+        """
+        Get the cache key of the files and the query.
+
+        Returns:
+            Optional[str]: The key, or None without a cache, for batch queries and for files that are not
+                regular files.
+        """
+        if self.cache is None or self.queries:
+            return None
+        query = {
+            'aggregate': self.aggregate,
+            'group_by': None if self.group_key is None else self.group_key.spec,
+            'max_groups': self.max_groups,
+            'line_filter': None if self.line_filter is None else asdict(self.line_filter),
+            'skip_malformed': self.skip_malformed,
+        }
+        if self.approximate is not None:
+            # Estimates depend on how the lines were split between the summaries that were merged
+            query.update(approximate=self.approximate, sketch=self.sketch, engine=self.engine,
+                         chunk_size=self.chunk_size, chunk_mode=self.chunk_mode, workers=self.workers)
+        return self.cache.key(expand_paths(self.file_paths), query)
+
+    def process_batch(self) -> tuple[list[list[Record]], ScanStats]:
+        """
+        Answer the batch queries in one scan of the file.
+
+        Returns:
+            tuple[list[list[Record]], ScanStats]: The top records of every query, in the order of the
+                queries, and the stats of the scan.
+
+        Raises:
+            ValueError: If the service has no batch queries.
+        """
+        if not self.queries:
+            raise ValueError("No batch queries")
+        heap_manager, stats = self.scan()
+        try:
+            return heap_manager.results(), stats
+        finally:
+            heap_manager.close()
+
+    def scan(self) -> tuple[HeapManager, ScanStats]:
+        """
+        Scan the file into the heap manager and get the stats of the scan, leaving the top records in the
+        heap manager so they can be streamed with ``iter_top_records``. The caller closes the heap manager.
+
+        Several files are scanned together on one pool of worker processes, whatever the engine.
+
+        Returns:
+            tuple[HeapManager, ScanStats]: The heap manager holding the top records and the stats of the scan.
+        """
+        started = time.perf_counter()
+        file_paths = expand_paths(self.file_paths)
+        if len(file_paths) == 1:
+            processor = ProcessorFactory.create_processor(file_paths[0], self.chunk_size, self.chunk_mode,
+                                                          self.engine, self.workers, self.top, self.skip_malformed,
+                                                          self.queue_depth, self.checkpoint_path, self.resume,
+                                                          self.line_filter, self.max_inflight_chunks, self.executor)
+        else:
+            processor = ProcessorFactory.create_multi_processor(file_paths, self.chunk_size, self.workers, self.top,
+                                                                self.skip_malformed, self.line_filter, self.executor)
+        opened = time.perf_counter()
+        heap_maintainer = self.__heap_manager()
+        try:
+            with processor as file_processor:
+                file_processor.populate(heap_maintainer)
+        except BaseException:
+            heap_maintainer.close()
+            raise
+
+        stats = processor.stats
+        stats.open_s += opened - started
+        stats.total_s = time.perf_counter() - started
+        stats.heap_replacements = heap_maintainer.replacements
+        stats.rejected_early = heap_maintainer.rejected_early
+        return heap_maintainer, stats
+
+    def follow_file(self, emit: Callable[[list[Record]], None], interval: float = 5.0,
+                    refreshes: Optional[int] = None) -> ScanStats:
+        """
+        Keep the top records of a file that is still being written, emitting them at a fixed interval.
+
+        Only the lines appended since the previous refresh are read, whatever the engine.
+
+        Args:
+            emit (Callable[[list[Record]], None]): Called with the current top records after every refresh.
+            interval (float, optional): The number of seconds between two refreshes. Defaults to 5.
+            refreshes (Optional[int], optional): The number of refreshes after which to stop. Defaults to
+                None, which follows the file until interrupted.
+
+        Returns:
+            ScanStats: The stats of every refresh.
+
+        Raises:
+            FileReadError: If there is not exactly one file to follow, or there is an error reading it.
+        """
+        file_paths = expand_paths(self.file_paths)
+        if len(file_paths) != 1 or file_paths[0] == '-':
+            logger.error("Follow mode needs exactly one file")
+            raise FileReadError("Follow mode needs exactly one file")
+        heap_manager = self.__heap_manager()
+        follower = FileFollower(file_paths[0], heap_manager, self.skip_malformed, self.line_filter)
+        try:
+            follower.run(emit, interval, refreshes)
+        finally:
+            heap_manager.close()
+        return follower.stats
+
+    def __heap_manager(self) -> HeapManager:
+        """
+        Create the heap manager collecting the top records: the batch heap manager, grouped heap manager,
+        heavy-hitter summary or aggregator of those modes, otherwise the selector suiting the number of top records.
+
+        Returns:
+            HeapManager: The heap manager.
+        """
+        if self.queries:
+            return BatchHeapManager(self.queries, self.memory_budget, self.spill_dir)
+        if self.group_key is not None:
+            return GroupedHeapManager(self.top, self.group_key, self.max_groups)
+        if self.approximate is not None:
+            return SpaceSaving(self.top, self.aggregate or 'sum', self.approximate, self.sketch)
+        if self.aggregate:
+            return Aggregator(self.top, self.aggregate, self.memory_budget, self.spill_dir)
+        return selector_for(self.top, self.memory_budget, self.spill_dir)
+
+
+def format_record(record: Union[Record, Estimate, GroupedRecord]) -> str:
+    """
+    Format a top record for the output: its URL, followed by its estimate and error bound for estimates
+    and preceded by its group for grouped records.
+
+    Args:
+        record (Union[Record, Estimate, GroupedRecord]): The top record.
+
+    Returns:
+        str: The output line.
+    """
+    if isinstance(record, GroupedRecord):
+        return f"{record.group} {record.url}"
+    if isinstance(record, Estimate):
+        return f"{record.url} {record.value} {record.error}"
+    return record.url
+
+
+def print_records(top_records: list[Record]) -> None:
+    """
+    Print the top records, followed by an empty line separating refreshes.
+
+    Args:
+        top_records (list[Record]): The top records.
+    """
+    for record in top_records:
+        print(format_record(record))
+    print(flush=True)
 
 
 def parse_arguments() -> argparse.Namespace:
@@ -47,28 +328,190 @@ def parse_arguments() -> argparse.Namespace:
         argparse.Namespace: The parsed arguments.
     """
     parser = argparse.ArgumentParser(
-        description="Process a file to find URLs with the largest values.")
-    parser.add_argument('file_path', type=str, help='The absolute path of the file to process')
+        description="Process files to find URLs with the largest values.")
+    parser.add_argument('file_paths', nargs='+', metavar='file_path',
+                        help='The files to process: file paths, directories (read recursively) or glob '
+                             'patterns; several files are scanned together on one pool of worker processes; '
+                             "'-' reads standard input")
     parser.add_argument('--top', type=int, default=10,
                         help='Number of top records to retrieve (default: 10)')
     parser.add_argument('--chunk-size', type=int, default=0,
-                        help='Number of lines to read per chunk (default: 0 for single-threaded)')
-    return parser.parse_args()
+                        help='Number of lines to read per chunk, or of bytes for the process engine and --engine '
+                             'auto (default: 0, sized by --engine auto, single-threaded for the text engine)')
+    parser.add_argument('--chunk-mode', choices=CHUNK_MODES, default='lines',
+                        help="Split chunks by line counts or by byte offsets; in 'bytes' mode "
+                             "--chunk-size is the number of bytes per chunk (default: lines)")
+    parser.add_argument('--engine', choices=ENGINES, default='auto',
+                        help="'auto' picks the engine, workers and chunk size from the size of the file, "
+                             "whether it is seekable or compressed, the CPUs available and --top, measuring "
+                             "the parse speed on a sample of large files, and logs the plan; "
+                             "'text' reads lines in the main process (threaded when --chunk-size > 0), "
+                             "'process' scans byte ranges in worker processes, --chunk-size being the "
+                             "number of bytes per chunk, 'mmap' scans the memory-mapped file as raw "
+                             "bytes, 'numpy' parses blocks of it with NumPy, 'indexed' keeps a sidecar "
+                             "index of per-block maximum values to skip blocks on later runs, --chunk-size "
+                             "being the number of bytes per block, 'stream' reads blocks ahead in a thread "
+                             "and parses them in worker processes, used for stdin ('-') and pipes "
+                             "(default: auto)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Number of worker processes for the process engine (default: the number of CPUs '
+                             'available, capped by the cgroup CPU quota)')
+    parser.add_argument('--queue-depth', type=int, default=8,
+                        help='Number of 4 MB blocks the stream engine reads ahead of the parser (default: 8)')
+    parser.add_argument('--max-inflight-chunks', type=int, default=0,
+                        help='Number of chunks the threaded text engine runs or holds at a time '
+                             '(default: twice the number of threads)')
+    parser.add_argument('--follow', action='store_true',
+                        help='Keep following the file as it grows, reading only appended lines, and print the '
+                             'top URLs every --interval seconds, each refresh followed by an empty line; '
+                             'rotation and truncation are detected')
+    parser.add_argument('--interval', type=float, default=5.0,
+                        help='Seconds between two refreshes in follow mode (default: 5)')
+    parser.add_argument('--checkpoint', type=str, default=None, metavar='PATH',
+                        help='Periodically write the progress of a process engine scan to PATH, '
+                             'removed once the scan completes')
+    parser.add_argument('--resume', action='store_true',
+                        help='Resume the scan from the --checkpoint, scanning only the chunks not done')
+    parser.add_argument('--aggregate', choices=AGGREGATES, default=None,
+                        help='Rank URLs by the sum, max or count of the values of all their lines instead of '
+                             'ranking lines')
+    parser.add_argument('--memory-budget', type=int, default=512, metavar='MB',
+                        help='Megabytes of aggregates each process holds before spilling them to disk '
+                             '(default: 512)')
+    parser.add_argument('--spill-dir', type=str, default=None,
+                        help='Directory for spilled aggregates (default: the system temporary directory)')
+    parser.add_argument('--approximate', type=float, nargs='?', const=DEFAULT_ERROR, default=None, metavar='ERROR',
+                        help='Rank URLs by the estimated sum (or --aggregate count) of their values in fixed '
+                             'memory, printing every URL with its estimate and error bound; estimates are '
+                             f'off by at most ERROR times the total of all values (default: {DEFAULT_ERROR})')
+    parser.add_argument('--sketch', action='store_true',
+                        help='Keep a Count-Min sketch next to the approximate summary to tighten its estimates')
+    parser.add_argument('--group-by', type=str, default=None, metavar='GROUP',
+                        help="Keep the top records of every group of URLs, printed as 'group url': 'host', "
+                             "'path-prefix:<depth>' (the host and first depth path segments) or "
+                             "'regex:<pattern>' (its first group, or the whole match)")
+    parser.add_argument('--max-groups', type=int, default=None,
+                        help="Maximum number of groups, the first in name order, the records of the other "
+                             "groups being kept in an '(other)' group (default: unbounded)")
+    parser.add_argument('--url-prefix', type=str, default=None,
+                        help='Only consider lines whose URL starts with this prefix')
+    parser.add_argument('--url-contains', type=str, default=None,
+                        help='Only consider lines whose URL contains this substring')
+    parser.add_argument('--url-regex', type=str, default=None, metavar='PATTERN',
+                        help='Only consider lines whose URL matches this regular expression')
+    parser.add_argument('--min-value', type=int, default=None,
+                        help='Only consider lines whose value is at least this value')
+    parser.add_argument('--max-value', type=int, default=None,
+                        help='Only consider lines whose value is at most this value')
+    parser.add_argument('--batch', type=str, default=None, metavar='PATH',
+                        help='Answer the queries of a JSONL file in one scan, one object per line with top, '
+                             'url_prefix, url_contains, url_regex, min_value, max_value and id, printing one '
+                             'JSON line of records per query')
+    parser.add_argument('--cache-dir', type=str, default=None, metavar='DIR',
+                        help='Answer unchanged files and queries from a result cache in DIR, a cached larger '
+                             '--top answering smaller ones')
+    parser.add_argument('--cache-size', type=int, default=64,
+                        help='Size in MB above which the least recently used cache entries are removed (default: 64)')
+    parser.add_argument('--skip-malformed', action='store_true',
+                        help='Count and skip malformed lines instead of failing')
+    parser.add_argument('--stats', choices=('json', 'text'), default=None,
+                        help='Print the stage timings and counters of the scan to stderr')
+    parser.add_argument('--profile', type=str, default=None, metavar='PATH',
+                        help='Run the scan under cProfile and dump the pstats to PATH')
+    args = parser.parse_args()
+    if args.resume and not args.checkpoint:
+        parser.error("--resume needs --checkpoint")
+    if args.max_inflight_chunks < 0:
+        parser.error("--max-inflight-chunks can not be negative")
+    if args.approximate is not None:
+        if args.aggregate not in (None, *HEAVY_HITTER_AGGREGATES):
+            parser.error(f"--approximate supports --aggregate {' or '.join(HEAVY_HITTER_AGGREGATES)}")
+        if not 0 < args.approximate < 1:
+            parser.error("--approximate needs an error bound between 0 and 1")
+    elif args.sketch:
+        parser.error("--sketch needs --approximate")
+    if args.group_by is not None:
+        if args.aggregate is not None or args.approximate is not None:
+            parser.error("--group-by ranks lines and can not be combined with --aggregate or --approximate")
+        try:
+            GroupKey(args.group_by)
+        except ValueError as e:
+            parser.error(str(e))
+    elif args.max_groups is not None:
+        parser.error("--max-groups needs --group-by")
+    try:
+        args.line_filter = LineFilter(args.url_prefix, args.url_contains, args.url_regex, args.min_value,
+                                      args.max_value) or None
+    except ValueError as e:
+        parser.error(str(e))
+    args.queries = None
+    if args.batch is not None:
+        if args.line_filter or args.aggregate or args.approximate is not None or args.group_by or args.follow:
+            parser.error("--batch takes the filters of every query from its file and can not be combined with "
+                         "filters, --aggregate, --approximate, --group-by or --follow")
+        try:
+            args.queries = load_queries(args.batch, args.top)
+        except (ValueError, OSError) as e:
+            parser.error(str(e))
+    if args.cache_dir and (args.batch or args.follow or args.profile):
+        parser.error("--cache-dir can not be combined with --batch, --follow or --profile")
+    return args
 
 
 def main() -> None:
-    """Main function to execute the file processing."""
+    """Main function to execute the file processing, or the ``serve`` or ``convert`` command."""
+    if sys.argv[1:2] == ['serve']:
+        from src.server import serve  # The server builds on the service of this module
+        serve(sys.argv[2:])
+        return
+    if sys.argv[1:2] == ['convert']:
+        convert_main(sys.argv[2:])
+        return
     args = parse_arguments()
 
     logger.info("Starting file processing")
 
     try:
-        service = FileProcessorService(args.file_path, args.top, args.chunk_size)
-        top_records = service.process_file()
+        cache = ResultCache(args.cache_dir, args.cache_size * 1024 * 1024) if args.cache_dir else None
+        service = FileProcessorService(args.file_paths, args.top, args.chunk_size, args.chunk_mode,
+                                       args.engine, args.workers, args.skip_malformed, args.queue_depth,
+                                       args.checkpoint, args.resume, args.aggregate,
+                                       args.memory_budget * 1024 * 1024, args.spill_dir, args.approximate,
+                                       args.sketch, args.group_by, args.max_groups, args.line_filter,
+                                       args.max_inflight_chunks, queries=args.queries, cache=cache)
+        if args.follow:
+            try:
+                service.follow_file(print_records, args.interval)
+            except KeyboardInterrupt:
+                logger.info("Stopped following")
+            return
+        if service.cache is not None:
+            top_records, stats = service.process_file_with_stats()
+            logger.info("Processing completed successfully")
+            sys.stdout.writelines(f"{format_record(record)}\n" for record in top_records)
+        else:
+            if args.profile:
+                profiler = cProfile.Profile()
+                heap_manager, stats = profiler.runcall(service.scan)
+                profiler.dump_stats(args.profile)
+                logger.info(f"Profile written to {args.profile}")
+                pstats.Stats(profiler, stream=sys.stderr).sort_stats('cumulative').print_stats(15)
+            else:
+                heap_manager, stats = service.scan()
 
-        logger.info("Processing completed successfully")
-        for record in top_records:
-            print(record.url)
+            logger.info("Processing completed successfully")
+            try:
+                if args.queries:
+                    for query, records in zip(args.queries, heap_manager.results()):
+                        print(json.dumps({'id': query.id, 'records': [record._asdict() for record in records]}))
+                else:
+                    # Streamed, so millions of top records from spilled runs are never held in a list
+                    sys.stdout.writelines(f"{format_record(record)}\n"
+                                          for record in heap_manager.iter_top_records())
+            finally:
+                heap_manager.close()
+        if args.stats:
+            print(stats.format(args.stats), file=sys.stderr)
 
     except FileReadError as e:
         logger.error(e)
@@ -1,79 +1,31 @@
-from dataclasses import dataclass
+from typing import NamedTuple
 
 
-@dataclass
-class Record:
+class Record(NamedTuple):
+    """
+    A URL and its value.
+
+    Records are plain tuples ordered by value and then by URL. ``heapq`` compares them
+    natively, and records with the same value are ordered deterministically by their URL.
+    """
     value: int
     url: str
 
-    def __lt__(self, other: 'Record') -> bool:
-        """
-        Check if this record is less than another record.
-
-        Args:
-            other (Record): The other record to compare against.
-
-        Returns:
-            bool: True if this record's value is less than the other record's value, False otherwise.
-        """
-        return self.value < other.value
-
-    def __le__(self, other: 'Record') -> bool:
-        """
-        Check if this record is less than or equal to another record.
-
-        Args:
-            other (Record): The other record to compare against.
-
-        Returns:
-            bool: True if this record's value is less than or equal to the other record's value, False otherwise.
-        """
-        return self.value <= other.value
-
-    def __gt__(self, other: 'Record') -> bool:
-        """
-        Check if this record is greater than another record.
-
-        Args:
-            other (Record): The other record to compare against.
-
-        Returns:
-            bool: True if this record's value is greater than the other record's value, False otherwise.
-        """
-        return self.value > other.value
 
-    def __ge__(self, other: 'Record') -> bool:
-        """
-        Check if this record is greater than or equal to another record.
+class Estimate(NamedTuple):
+    """
+    A URL, an estimate of its value and the bound of the error of the estimate.
 
-        Args:
-            other (Record): The other record to compare against.
-
-        Returns:
-            bool: True if this record's value is greater than or equal to the other record's value, False otherwise.
-        """
-        return self.value >= other.value
-
-    def __eq__(self, other: 'Record') -> bool:
-        """
-        Check if this record is equal to another record.
-
-        Args:
-            other (Record): The other record to compare against.
-
-        Returns:
-            bool: True if this record's value is equal to the other record's value, False otherwise.
-        """
-        return self.value == other.value
-
-    def __ne__(self, other: 'Record') -> bool:
-        """
-        Check if this record is not equal to another record.
+    The true value lies between ``value - error`` and ``value``. Estimates are ordered
+    like records, by value and then by URL.
+    """
+    value: int
+    url: str
+    error: int
 
-        Args:
-            other (Record): The other record to compare against.
 
-        Returns:
-            bool: True if this record's value is not equal to the other record's value, False otherwise.
-        """
-        return self.value != other.value
+class GroupedRecord(NamedTuple):
+    """A URL, its value and the group of the URL, such as its host."""
+    value: int
+    url: str
+    group: str
@@ -0,0 +1,73 @@
+from typing import NamedTuple, Optional
+
+MB = 1024 * 1024
+CALIBRATION_BYTES = 4 * MB  # The sample at the start of a file whose parse speed is measured
+CALIBRATION_MIN_SIZE = 16 * CALIBRATION_BYTES  # Smaller files are planned with the default speeds
+DEFAULT_RATES = {'mmap': 60 * MB, 'numpy': 120 * MB}  # Bytes parsed per second by one process
+WORKER_START_S = 0.02  # Starting a worker process and shipping it its first chunk
+MERGE_RECORD_S = 2e-6  # Sending one top record of a chunk back and merging it
+CHUNKS_PER_WORKER = 4  # Enough chunks for the workers to even out, few enough to merge cheaply
+MIN_CHUNK_BYTES = 4 * MB
+MAX_CHUNK_BYTES = 256 * MB
+
+
+class ScanPlan(NamedTuple):
+    """The engine, number of workers and chunk size chosen to scan a file, and why."""
+    engine: str
+    workers: int
+    chunk_size: int
+    reason: str
+
+    def describe(self) -> str:
+        """
+        Describe the plan for the logs.
+
+        Returns:
+            str: The engine, the workers and chunk size of the parallel engines, and the reason.
+        """
+        if self.workers <= 1:
+            return f"{self.engine} engine, single process: {self.reason}"
+        chunks = f", {self.chunk_size / MB:.0f} MB chunks" if self.chunk_size else ''
+        return f"{self.engine} engine, {self.workers} workers{chunks}: {self.reason}"
+
+
+def plan_scan(size: int, cpus: int, top: int, serial_engine: str, serial_rate: float, worker_rate: float,
+              workers: Optional[int] = None, chunk_size: int = 0) -> ScanPlan:
+    """
+    Choose between scanning a seekable, uncompressed file in this process and splitting it into byte ranges
+    for worker processes, from the estimated time of both.
+
+    A parallel scan pays for starting the workers and for merging the top records of every chunk, so it only
+    wins on files large enough for their parse time to dominate, and less so for large ``top``.
+
+    Args:
+        size (int): The size of the file in bytes.
+        cpus (int): The number of CPUs available.
+        top (int): The number of top records.
+        serial_engine (str): The fastest engine in this process, ``numpy`` or ``mmap``.
+        serial_rate (float): The bytes parsed per second by the serial engine.
+        worker_rate (float): The bytes parsed per second by one worker process.
+        workers (Optional[int], optional): The number of worker processes asked for. Defaults to None, the
+            number of CPUs.
+        chunk_size (int, optional): The number of bytes per chunk asked for. Defaults to 0, sized from the
+            file and the workers.
+
+    Returns:
+        ScanPlan: The chosen plan.
+    """
+    serial_s = size / serial_rate
+    reason = f"{size / MB:.1f} MB at {serial_rate / MB:.0f} MB/s, about {serial_s:.2f} s"
+    workers = workers or cpus
+    if workers <= 1:
+        return ScanPlan(serial_engine, 1, 0, f"{reason} on a single CPU")
+    if chunk_size <= 0:
+        chunk_size = -(-size // (workers * CHUNKS_PER_WORKER))
+        chunk_size = min(max(chunk_size, MIN_CHUNK_BYTES), MAX_CHUNK_BYTES)
+    chunks = max(1, -(-size // chunk_size))
+    workers = min(workers, chunks)
+    parallel_s = (size / (worker_rate * min(workers, cpus)) + workers * WORKER_START_S
+                  + top * chunks * MERGE_RECORD_S)
+    if workers > 1 and parallel_s < serial_s:
+        return ScanPlan('process', workers, chunk_size, f"{reason} in this process, about {parallel_s:.2f} s "
+                                                        f"in {chunks} chunks")
+    return ScanPlan(serial_engine, 1, 0, f"{reason}, no faster in worker processes")
@@ -0,0 +1,225 @@
+import hashlib
+import json
+import os
+import stat
+import threading
+from collections import OrderedDict
+from typing import Any, Optional, Union
+
+from src.helpers import Logger, write_json_atomic
+from src.models import Estimate, GroupedRecord, Record
+
+logger = Logger().get_logger()
+
+CACHE_VERSION = 1
+ENTRY_SUFFIX = '.topn-cache.json'
+ENTRY_RECORD_BYTES = 64  # Approximate size of the JSON of a record, besides its URL
+RECORD_TYPES = {record_type.__name__: record_type for record_type in (Record, Estimate, GroupedRecord)}
+
+TopRecords = list[Union[Record, Estimate, GroupedRecord]]
+
+
+def file_identity(file_path: str) -> Optional[list]:
+    """
+    Get the identity of a file: its resolved path, inode, size and modification time.
+
+    Args:
+        file_path (str): The path to the file.
+
+    Returns:
+        Optional[list]: The identity, or None if the path is not a regular file, such as standard input or a pipe.
+    """
+    try:
+        file_stat = os.stat(file_path)
+    except OSError:
+        return None
+    if not stat.S_ISREG(file_stat.st_mode):
+        return None
+    return [os.path.realpath(file_path), file_stat.st_ino, file_stat.st_size, file_stat.st_mtime_ns]
+
+
+def first_records(records: TopRecords, top: int) -> TopRecords:
+    """
+    Get the top records of a smaller query from those of a larger one: the first records, or the first records of
+    every group for grouped records.
+
+    Args:
+        records (TopRecords): The top records of the larger query, in descending order (per group).
+        top (int): The number of top records of the smaller query.
+
+    Returns:
+        TopRecords: The top records of the smaller query.
+    """
+    if not records or not isinstance(records[0], GroupedRecord):
+        return records[:top]
+    counts: dict[str, int] = {}
+    kept = []
+    for record in records:
+        counts[record.group] = counts.get(record.group, 0) + 1
+        if counts[record.group] <= top:
+            kept.append(record)
+    return kept
+
+
+class ResultCache:
+    """
+    Caches top records on disk, keyed by the identity of the files and the query, and optionally in memory.
+
+    Entries are written atomically, so several processes can share a cache directory. Every entry keeps the
+    number of top records it was computed for and answers any smaller number. Once the entries take more than
+    ``max_bytes``, the least recently used ones are removed.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 64 * 1024 * 1024, memory_entries: int = 0) -> None:
+        """
+        Initialize the result cache.
+
+        Args:
+            directory (str): The directory of the entries, created if missing.
+            max_bytes (int, optional): The size of the entries above which the least recently used are removed.
+                Defaults to 64 MB.
+            memory_entries (int, optional): The number of entries also kept in memory, for long-running
+                processes. Defaults to 0.
+
+        Raises:
+            OSError: If the directory can not be created.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self.hits = 0
+        self.misses = 0
+        self.__memory: OrderedDict[str, tuple[int, TopRecords]] = OrderedDict()
+        self.__lock = threading.Lock()
+
+    @staticmethod
+    def key(file_paths: list[str], query: dict[str, Any]) -> Optional[str]:
+        """
+        Get the cache key of a query.
+
+        Args:
+            file_paths (list[str]): The paths to the files of the query.
+            query (dict[str, Any]): The JSON-serializable options the top records depend on, besides their number.
+
+        Returns:
+            Optional[str]: The key, or None if a file is not a regular file and the query can not be cached.
+        """
+        identities = [file_identity(file_path) for file_path in file_paths]
+        if not identities or None in identities:
+            return None
+        data = json.dumps({'version': CACHE_VERSION, 'files': identities, 'query': query}, sort_keys=True)
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    def get(self, key: str, top: int) -> Optional[TopRecords]:
+        """
+        Get the cached top records of a query, from an entry computed for at least as many records.
+
+        Args:
+            key (str): The cache key of the query.
+            top (int): The number of top records.
+
+        Returns:
+            Optional[TopRecords]: The top records, or None on a miss.
+        """
+        with self.__lock:
+            entry = self.__memory.get(key)
+            if entry is not None and entry[0] >= top:
+                self.__memory.move_to_end(key)
+                self.hits += 1
+                return first_records(entry[1], top)
+        entry = self.__load(key)
+        with self.__lock:
+            if entry is None or entry[0] < top:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.__remember(key, entry)
+        return first_records(entry[1], top)
+
+    def put(self, key: str, top: int, records: TopRecords) -> None:
+        """
+        Cache the top records of a query, unless a larger entry is cached already or the records alone exceed
+        the size of the cache. Failures to write are logged, not raised.
+
+        Args:
+            key (str): The cache key of the query.
+            top (int): The number of top records the records were computed for.
+            records (TopRecords): The top records.
+        """
+        if sum(len(record.url) + ENTRY_RECORD_BYTES for record in records) > self.max_bytes:
+            logger.info(f"Not caching {len(records)} top records larger than the cache")
+            return
+        with self.__lock:
+            entry = self.__memory.get(key)
+            if entry is not None and entry[0] >= top:
+                return
+            self.__remember(key, (top, records))
+        data = {'version': CACHE_VERSION, 'top': top,
+                'type': type(records[0]).__name__ if records else Record.__name__,
+                'records': [list(record) for record in records]}
+        try:
+            write_json_atomic(self.__path(key), data)
+            self.__evict()
+        except OSError as e:
+            logger.warning(f"Unable to write the result cache {self.directory}: {e}")
+
+    def __path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ENTRY_SUFFIX)
+
+    def __load(self, key: str) -> Optional[tuple[int, TopRecords]]:
+        """
+        Load an entry from disk, marking it as recently used.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            Optional[tuple[int, TopRecords]]: The number of top records of the entry and its records, or None if
+                it is missing or unreadable.
+        """
+        path = self.__path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+            if data['version'] != CACHE_VERSION:
+                return None
+            record_type = RECORD_TYPES[data['type']]
+            entry = data['top'], [record_type(*record) for record in data['records']]
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable cache entry {path}: {e}")
+            return None
+        return entry
+
+    def __remember(self, key: str, entry: tuple[int, TopRecords]) -> None:
+        """Keep an entry in memory, dropping the least recently used one beyond ``memory_entries``. Holds the lock."""
+        if self.memory_entries <= 0:
+            return
+        self.__memory[key] = entry
+        self.__memory.move_to_end(key)
+        while len(self.__memory) > self.memory_entries:
+            self.__memory.popitem(last=False)
+
+    def __evict(self) -> None:
+        """Remove the least recently used entries on disk while they take more than ``max_bytes``."""
+        entries = []
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if entry.name.endswith(ENTRY_SUFFIX):
+                    try:
+                        entry_stat = entry.stat()
+                    except FileNotFoundError:  # Removed by another process
+                        continue
+                    entries.append((entry_stat.st_mtime_ns, entry_stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
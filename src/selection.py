@@ -0,0 +1,372 @@
+import heapq
+import os
+import shutil
+import tempfile
+from bisect import bisect_left, bisect_right
+from contextlib import ExitStack
+from itertools import islice
+from operator import itemgetter
+from typing import IO, Iterable, Iterator, Optional
+
+from src.heap_manager import HeapManager
+from src.helpers import Logger
+from src.models import Record
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, batches are then selected by sorting them
+    np = None
+
+logger = Logger().get_logger()
+
+HEAP_MAX_N = 10_000  # Up to this N a heap is the cheapest, above it records are selected in batches
+RECORD_BYTES = 200  # Approximate memory of a record, its int and a typical URL
+MIN_BATCH = 1024
+MERGE_FAN_IN = 16  # The runs merged at once, so few files are open and the threshold keeps rising
+_VALUE = itemgetter(0)
+
+
+def selector_for(n: int, memory_budget: int = 512 * 1024 * 1024, spill_dir: Optional[str] = None) -> HeapManager:
+    """
+    Create the sink selecting the top N records with the strategy suiting N.
+
+    A heap for small N, batched selection in memory when N records fit in the memory budget, and
+    sorted runs spilled to disk and merged otherwise.
+
+    Args:
+        n (int): The number of top records.
+        memory_budget (int, optional): The approximate number of bytes of records held in memory.
+            Defaults to 512 MB.
+        spill_dir (Optional[str], optional): The directory runs are spilled to. Defaults to the temporary
+            directory of the system.
+
+    Returns:
+        HeapManager: The heap manager, batch selector or external selector.
+    """
+    if n <= HEAP_MAX_N:
+        return HeapManager(n)
+    if (n + n // 4) * RECORD_BYTES <= memory_budget:  # The kept records and a batch of a quarter of them
+        return BatchSelector(n)
+    return ExternalSelector(n, max(memory_budget // RECORD_BYTES, MIN_BATCH), spill_dir)
+
+
+def _negative_value(record: Record) -> int:
+    return -record.value
+
+
+def _sort_descending(records: list[Record]) -> None:
+    """
+    Sort records in descending order, first on their value alone, which is much cheaper than comparing
+    tuples, then on the whole records, which only reorders the ties of the already sorted list.
+
+    Args:
+        records (list[Record]): The records to sort in place.
+    """
+    records.sort(key=_VALUE, reverse=True)
+    records.sort(reverse=True)
+
+
+class BatchSelector(HeapManager):
+    """
+    Selects the top N records for large N by buffering them and keeping the top N of every batch.
+
+    Appending to a list and selecting the top N of a batch of more records at once is much cheaper
+    than pushing every record through a heap of N records. With NumPy the values of a batch are
+    partitioned around the N-th largest one (quickselect); without it the batch is sorted on the
+    value alone, the kept records being an already sorted run merged in linear time. Only the
+    records tied with the N-th largest value are compared on their URL. The threshold is the
+    smallest value kept by the last batch, so readers keep rejecting lines early.
+    """
+
+    def __init__(self, n: int, batch: Optional[int] = None) -> None:
+        """
+        Initialize the batch selector.
+
+        Args:
+            n (int): The number of top records to keep.
+            batch (Optional[int], optional): The number of records buffered beyond N before a batch is
+                selected. Defaults to a quarter of N, so the threshold rises often enough for readers to
+                reject most lines early.
+        """
+        super().__init__(n)
+        self.capacity = n + max(batch or n // 4, MIN_BATCH)
+        self.records: list[Record] = []
+
+    def add_record(self, record: Record) -> None:
+        """
+        Buffer a record, selecting the top N records once the buffer is full.
+
+        Args:
+            record (Record): The record to add.
+        """
+        if record.value < self.threshold:
+            self.rejected += 1
+            return
+        self.records.append(record)
+        if len(self.records) >= self.capacity:
+            self.select()
+
+    def select(self) -> None:
+        """Keep only the top N buffered records and raise the threshold to the smallest one kept."""
+        if len(self.records) > self.n:
+            self.rejected += len(self.records) - self.n
+            if self.n <= 0:
+                self.records = []
+            elif np is None or not self.__partition():
+                self.__sort()
+            self.threshold = min(self.records, key=_VALUE).value
+
+    def __partition(self) -> bool:
+        """
+        Keep the top N buffered records by partitioning their values with NumPy.
+
+        Returns:
+            bool: Whether the records were selected, False if a value does not fit in an ``int64``.
+        """
+        records = self.records
+        try:
+            values = np.fromiter(map(_VALUE, records), dtype=np.int64, count=len(records))
+        except OverflowError:
+            return False
+        kth = len(records) - self.n
+        cut = values[np.argpartition(values, kth)[kth]]
+        above = [records[i] for i in np.flatnonzero(values > cut).tolist()]
+        ties = [records[i] for i in np.flatnonzero(values == cut).tolist()]
+        # The records tied at the cut are ordered by URL, so the greatest URLs are kept
+        self.records = above + heapq.nlargest(self.n - len(above), ties)
+        return True
+
+    def __sort(self) -> None:
+        """Keep the top N buffered records by sorting them on their value."""
+        records = self.records
+        records.sort(key=_VALUE, reverse=True)
+        cut = records[self.n].value
+        if cut == records[self.n - 1].value:
+            # The records tied at the cut are ordered by URL, so the greatest URLs are kept
+            low = bisect_left(records, -cut, key=_negative_value)
+            high = bisect_right(records, -cut, key=_negative_value)
+            records[low:high] = sorted(records[low:high], reverse=True)
+        del records[self.n:]
+
+    def merge(self, *others: 'BatchSelector') -> None:
+        """
+        Merge the records of other batch selectors into this one.
+
+        Args:
+            *others (BatchSelector): The batch selectors to merge into this one.
+        """
+        for other in others:
+            self.records.extend(other.records)
+            self.select()
+            self.replacements += other.replacements
+            self.rejected += other.rejected
+            self.rejected_early += other.rejected_early
+
+    def empty_copy(self) -> 'BatchSelector':
+        """
+        Create an empty batch selector with the same capacity.
+
+        Returns:
+            BatchSelector: A new, empty batch selector.
+        """
+        return BatchSelector(self.n, self.capacity - self.n)
+
+    def max_value(self) -> Optional[int]:
+        """
+        Get the largest value held.
+
+        Returns:
+            Optional[int]: The largest value of the buffered records, or None when there is none.
+        """
+        return max(map(_VALUE, self.records), default=None)
+
+    def get_top_records(self) -> list[Record]:
+        """
+        Get the top records sorted in descending order.
+
+        Returns:
+            List[Record]: A list of the top records sorted in descending order.
+        """
+        self.select()
+        records = list(self.records)
+        _sort_descending(records)
+        return records
+
+
+class ExternalSelector(HeapManager):
+    """
+    Selects the top N records when N records do not fit in memory.
+
+    Records are buffered up to the run size, then every full buffer is sorted and its top N
+    records are spilled to a run file. Once ``MERGE_FAN_IN`` runs are spilled they are merged
+    into a single run of their top N records, whose N-th value raises the threshold even when
+    no single run holds N records. The top records are the first N of the k-way merge of the
+    remaining runs and the buffer, streamed from the files without building a list.
+    """
+
+    def __init__(self, n: int, run_records: int, spill_dir: Optional[str] = None) -> None:
+        """
+        Initialize the external selector.
+
+        Args:
+            n (int): The number of top records to keep.
+            run_records (int): The number of records buffered in memory before a run is spilled.
+            spill_dir (Optional[str], optional): The directory runs are spilled to. Defaults to the
+                temporary directory of the system.
+        """
+        super().__init__(n)
+        self.run_records = run_records
+        self.spill_dir = spill_dir
+        self.records: list[Record] = []
+        self.runs: list[str] = []
+        self.directories: list[str] = []
+
+    def add_record(self, record: Record) -> None:
+        """
+        Buffer a record, spilling the buffer to a run once it is full.
+
+        Args:
+            record (Record): The record to add.
+        """
+        if record.value < self.threshold:
+            self.rejected += 1
+            return
+        self.records.append(record)
+        if len(self.records) >= self.run_records:
+            self.spill()
+
+    def spill(self) -> None:
+        """Write the top N buffered records to a new sorted run and clear the buffer."""
+        if not self.records:
+            return
+        _sort_descending(self.records)
+        path = self.__write_run(self.records)
+        logger.debug(f"Spilled a run of {min(len(self.records), self.n)} records to {path}")
+        self.records = []
+        self.__add_run(path)
+
+    def __add_run(self, path: str) -> None:
+        """
+        Add a sorted run, merging the runs once there are ``MERGE_FAN_IN`` of them.
+
+        Args:
+            path (str): The path of the run file.
+        """
+        self.runs.append(path)
+        if len(self.runs) < MERGE_FAN_IN:
+            return
+        with ExitStack() as stack:
+            runs = [self.__read_run(stack.enter_context(open(run, 'r', encoding='utf-8'))) for run in self.runs]
+            merged = self.__write_run(heapq.merge(*runs, reverse=True))
+        for run in self.runs:
+            os.remove(run)
+        logger.debug(f"Merged {len(self.runs)} runs into {merged}")
+        self.runs = [merged]
+
+    def __write_run(self, records: Iterable[Record]) -> str:
+        """
+        Write the first N of sorted records to a new run file, raising the threshold to the N-th one.
+
+        No record below the N-th record of a run can be in the top N, and a merged run holds the top N
+        records of every run merged into it.
+
+        Args:
+            records (Iterable[Record]): The records, in descending order.
+
+        Returns:
+            str: The path of the run file.
+        """
+        if not self.directories:
+            self.directories.append(tempfile.mkdtemp(prefix='topn-runs-', dir=self.spill_dir))
+        descriptor, path = tempfile.mkstemp(prefix='run-', dir=self.directories[0])
+        written = 0
+        with open(descriptor, 'w', encoding='utf-8') as file:
+            for value, url in islice(records, self.n):
+                file.write(f"{value} {url}\n")
+                written += 1
+        if written >= self.n > 0:
+            self.threshold = max(self.threshold, value)
+        return path
+
+    def merge(self, *others: 'ExternalSelector') -> None:
+        """
+        Merge the runs and buffered records of other external selectors, such as the workers', into this one.
+
+        Args:
+            *others (ExternalSelector): The external selectors to merge into this one.
+        """
+        for other in others:
+            self.directories.extend(other.directories)
+            self.threshold = max(self.threshold, other.threshold)
+            for path in other.runs:
+                self.__add_run(path)
+            for record in other.records:
+                self.add_record(record)
+            self.replacements += other.replacements
+            self.rejected += other.rejected
+            self.rejected_early += other.rejected_early
+
+    def empty_copy(self) -> 'ExternalSelector':
+        """
+        Create an empty external selector with the same run size and spill directory.
+
+        Returns:
+            ExternalSelector: A new, empty external selector.
+        """
+        return ExternalSelector(self.n, self.run_records, self.spill_dir)
+
+    def max_value(self) -> Optional[int]:
+        """
+        Get the largest value held, reading the first record of every run.
+
+        Returns:
+            Optional[int]: The largest value of the runs and the buffer, or None when there is none.
+        """
+        values = list(map(_VALUE, self.records))
+        for path in self.runs:
+            with open(path, 'r', encoding='utf-8') as file:
+                values.extend(record.value for record in islice(self.__read_run(file), 1))
+        return max(values, default=None)
+
+    def iter_top_records(self) -> Iterator[Record]:
+        """
+        Stream the top records in descending order, k-way merging the runs and the buffer.
+
+        Yields:
+            Iterator[Record]: The top records sorted in descending order.
+        """
+        _sort_descending(self.records)
+        with ExitStack() as stack:
+            runs = [self.__read_run(stack.enter_context(open(path, 'r', encoding='utf-8'))) for path in self.runs]
+            yield from islice(heapq.merge(self.records, *runs, reverse=True), self.n)
+
+    def get_top_records(self) -> list[Record]:
+        """
+        Get the top records sorted in descending order.
+
+        Returns:
+            List[Record]: A list of the top records sorted in descending order.
+        """
+        return list(self.iter_top_records())
+
+    def close(self) -> None:
+        """Remove the spilled runs."""
+        for directory in self.directories:
+            shutil.rmtree(directory, ignore_errors=True)
+        self.directories = []
+        self.runs = []
+
+    @staticmethod
+    def __read_run(file: IO) -> Iterator[Record]:
+        """
+        Read the records of a run.
+
+        Args:
+            file (IO): The run file.
+
+        Yields:
+            Iterator[Record]: The records of the run, in descending order.
+        """
+        for line in file:
+            value, url = line.rstrip('\n').split(' ', 1)
+            yield Record(int(value), url)
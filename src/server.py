@@ -0,0 +1,545 @@
+import argparse
+import json
+import os
+import socket
+import socketserver
+import threading
+from collections import deque
+from concurrent.futures import CancelledError, Executor, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional, Union
+
+from src.aggregator import AGGREGATES
+from src.file_processors import CHUNK_MODES, ENGINES, STDIN_PATH
+from src.filters import LineFilter
+from src.helpers import Logger, FileReadError, available_cpus
+from src.main import FileProcessorService
+from src.models import Estimate, GroupedRecord, Record
+from src.result_cache import ResultCache
+
+logger = Logger().get_logger()
+
+DEFAULT_HOST = '127.0.0.1'
+# The options of a query, their types and defaults. ``memory_budget`` is in MB, like ``--memory-budget``.
+QUERY_OPTIONS: dict[str, tuple[tuple[type, ...], Any]] = {
+    'top': ((int,), 10),
+    'chunk_size': ((int,), 0),
+    'chunk_mode': ((str,), 'lines'),
+    'engine': ((str,), 'process'),
+    'skip_malformed': ((bool,), False),
+    'aggregate': ((str,), None),
+    'memory_budget': ((int,), 512),
+    'spill_dir': ((str,), None),
+    'approximate': ((int, float), None),
+    'sketch': ((bool,), False),
+    'group_by': ((str,), None),
+    'max_groups': ((int,), None),
+    'url_prefix': ((str,), None),
+    'url_contains': ((str,), None),
+    'url_regex': ((str,), None),
+    'min_value': ((int,), None),
+    'max_value': ((int,), None),
+    'max_inflight_chunks': ((int,), 0),
+}
+
+
+class QueryError(Exception):
+    """Exception raised when the server can not answer a query."""
+    pass
+
+
+class FairExecutor:
+    """
+    Shares an executor between concurrent queries.
+
+    Every query submits its chunks to its own session. At most ``slots`` tasks are handed to the executor at a
+    time, taken from the sessions in turn, so a query of a few chunks is not queued behind every chunk of a large
+    query submitted before it.
+    """
+
+    def __init__(self, executor: Executor, slots: int) -> None:
+        """
+        Initialize the fair executor.
+
+        Args:
+            executor (Executor): The executor running the tasks.
+            slots (int): The number of tasks handed to the executor at a time, usually its number of workers.
+        """
+        self.executor = executor
+        self.slots = slots
+        self.running = 0
+        self.__ready: deque[FairSession] = deque()
+        self.__lock = threading.Lock()
+
+    def session(self) -> 'FairSession':
+        """
+        Open a session for the tasks of a query.
+
+        Returns:
+            FairSession: The session, an executor to submit the tasks of the query to.
+        """
+        return FairSession(self)
+
+    def enqueue(self, session: 'FairSession', task: tuple[Future, Callable, tuple, dict]) -> None:
+        """
+        Queue a task of a session and hand tasks to the executor while it has free slots.
+
+        Args:
+            session (FairSession): The session of the task.
+            task (tuple[Future, Callable, tuple, dict]): The future of the task, its function and arguments.
+        """
+        with self.__lock:
+            session.tasks.append(task)
+            if session not in self.__ready:
+                self.__ready.append(session)
+        self.__dispatch()
+
+    def __dispatch(self) -> None:
+        """Hand queued tasks to the executor, one session after the other, while there are free slots."""
+        started = []
+        with self.__lock:
+            while self.running < self.slots and self.__ready:
+                session = self.__ready.popleft()
+                future, function, args, kwargs = session.tasks.popleft()
+                if session.tasks:
+                    self.__ready.append(session)
+                if future.set_running_or_notify_cancel():
+                    self.running += 1
+                    started.append((future, function, args, kwargs))
+        # Submitted outside the lock, as a task that is already done runs its callback right away
+        for future, function, args, kwargs in started:
+            try:
+                inner = self.executor.submit(function, *args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+                self.__release()
+            else:
+                inner.add_done_callback(lambda inner, future=future: self.__complete(inner, future))
+
+    def __complete(self, inner: Future, future: Future) -> None:
+        """
+        Pass the outcome of a task on to the future of its session and free its slot.
+
+        Args:
+            inner (Future): The future of the executor.
+            future (Future): The future of the session.
+        """
+        if inner.cancelled():
+            future.set_exception(CancelledError())
+        elif inner.exception() is not None:
+            future.set_exception(inner.exception())
+        else:
+            future.set_result(inner.result())
+        self.__release()
+
+    def __release(self) -> None:
+        """Free the slot of a finished task and hand the next queued task to the executor."""
+        with self.__lock:
+            self.running -= 1
+        self.__dispatch()
+
+    def discard(self, session: 'FairSession') -> None:
+        """
+        Cancel the queued tasks of a session, the tasks already handed to the executor running to completion.
+
+        Args:
+            session (FairSession): The session.
+        """
+        with self.__lock:
+            if session in self.__ready:
+                self.__ready.remove(session)
+            tasks, session.tasks = session.tasks, deque()
+        for future, _, _, _ in tasks:
+            future.cancel()
+
+
+class FairSession(Executor):
+    """The tasks of one query on a fair executor."""
+
+    def __init__(self, fair_executor: FairExecutor) -> None:
+        """
+        Initialize the session.
+
+        Args:
+            fair_executor (FairExecutor): The fair executor running the tasks.
+        """
+        self.fair_executor = fair_executor
+        self.tasks: deque[tuple[Future, Callable, tuple, dict]] = deque()
+
+    def submit(self, fn: Callable, /, *args: Any, **kwargs: Any) -> Future:
+        """
+        Queue a task, run once the other sessions had their turn.
+
+        Args:
+            fn (Callable): The function to run.
+            *args (Any): Its positional arguments.
+            **kwargs (Any): Its keyword arguments.
+
+        Returns:
+            Future: The future of the task.
+        """
+        future: Future = Future()
+        self.fair_executor.enqueue(self, (future, fn, args, kwargs))
+        return future
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        """
+        End the session, leaving the shared executor running.
+
+        Args:
+            wait (bool, optional): Unused, the tasks of a query are waited for by the query. Defaults to True.
+            cancel_futures (bool, optional): Whether the queued tasks are cancelled. Defaults to False.
+        """
+        if cancel_futures:
+            self.fair_executor.discard(self)
+
+
+def service_options(request: dict[str, Any]) -> dict[str, Any]:
+    """
+    Validate a query and convert it to the arguments of a file processor service.
+
+    Args:
+        request (dict[str, Any]): The query: ``path`` (a path or a list of paths, directories and glob
+            patterns) and any of ``QUERY_OPTIONS``.
+
+    Returns:
+        dict[str, Any]: The keyword arguments of ``FileProcessorService``.
+
+    Raises:
+        ValueError: If the query is invalid.
+    """
+    if not isinstance(request, dict):
+        raise ValueError("A query must be a JSON object")
+    unknown = set(request) - {'path', *QUERY_OPTIONS}
+    if unknown:
+        raise ValueError(f"Unknown query options: {', '.join(sorted(unknown))}")
+    path = request.get('path')
+    paths = [path] if isinstance(path, str) else path
+    if not paths or not isinstance(paths, list) or not all(isinstance(item, str) for item in paths):
+        raise ValueError("A query needs a path or a list of paths")
+    if STDIN_PATH in paths:
+        raise ValueError("Standard input can not be queried")
+    options = {}
+    for name, (types, default) in QUERY_OPTIONS.items():
+        value = request.get(name, default)
+        # bool is an int, so flags and numbers are told apart explicitly
+        if value is not None and (not isinstance(value, types) or isinstance(value, bool) != (types == (bool,))):
+            raise ValueError(f"Invalid {name}: {value!r}")
+        options[name] = value
+    for name, choices in (('engine', ENGINES), ('chunk_mode', CHUNK_MODES), ('aggregate', AGGREGATES)):
+        if options[name] is not None and options[name] not in choices:
+            raise ValueError(f"Invalid {name}: {options[name]!r}")
+    if options['approximate'] is not None and not 0 < options['approximate'] < 1:
+        raise ValueError("approximate needs an error bound between 0 and 1")
+    line_filter = LineFilter(*(options.pop(name) for name in ('url_prefix', 'url_contains', 'url_regex',
+                                                              'min_value', 'max_value')))
+    options['file_path'] = paths
+    options['memory_budget'] *= 1024 * 1024
+    options['line_filter'] = line_filter or None
+    return options
+
+
+def record_from_dict(record: dict[str, Any]) -> Union[Record, Estimate, GroupedRecord]:
+    """
+    Convert a top record of an answer back to a record, an estimate or a grouped record.
+
+    Args:
+        record (dict[str, Any]): The fields of the record.
+
+    Returns:
+        Union[Record, Estimate, GroupedRecord]: The record.
+    """
+    if 'group' in record:
+        return GroupedRecord(**record)
+    if 'error' in record:
+        return Estimate(**record)
+    return Record(**record)
+
+
+class QueryServer:
+    """
+    Answers top N queries on a local socket, with a warm pool of worker processes shared by all queries.
+
+    Every connection sends one JSON query per line and gets one JSON answer per line, ``{"records": [...],
+    "stats": {...}}`` or ``{"error": "..."}``. Connections are served by threads, so queries run concurrently;
+    their chunks take turns on the pool.
+    """
+
+    def __init__(self, socket_path: Optional[str] = None, host: str = DEFAULT_HOST, port: int = 0,
+                 workers: Optional[int] = None, cache: Optional[ResultCache] = None) -> None:
+        """
+        Initialize the server, bind its socket and start its worker processes.
+
+        Args:
+            socket_path (Optional[str], optional): The path of a Unix socket to listen on, only accessible to
+                its owner. Defaults to None, which listens on a TCP port.
+            host (str, optional): The address of the TCP port. Defaults to the loopback address.
+            port (int, optional): The TCP port, 0 for any free port. Defaults to 0.
+            workers (Optional[int], optional): The number of worker processes. Defaults to the CPUs available.
+            cache (Optional[ResultCache], optional): The cache queries on unchanged files are answered from.
+                Defaults to None.
+
+        Raises:
+            OSError: If the socket can not be bound.
+        """
+        self.workers = workers or available_cpus()
+        self.cache = cache
+        self.__pool_lock = threading.Lock()
+        # Started before any handler thread exists
+        self.__start_pool()
+        self.socket_path = socket_path
+        try:
+            if socket_path is not None:
+                self.server: socketserver.BaseServer = _UnixQueryServer(socket_path, _QueryHandler)
+                os.chmod(socket_path, 0o600)
+            else:
+                self.server = _TCPQueryServer((host, port), _QueryHandler)
+        except BaseException:
+            self.pool.shutdown(cancel_futures=True)
+            raise
+        self.server.query_server = self  # type: ignore[attr-defined]
+
+    def __start_pool(self) -> None:
+        """Start the worker processes, so every query skips their start-up, and the fair executor sharing them."""
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        wait([self.pool.submit(os.getpid) for _ in range(self.workers)])
+        self.executor = FairExecutor(self.pool, self.workers)
+
+    def __restart_pool(self, broken: FairExecutor) -> None:
+        """
+        Replace a pool a worker process died in, which fails every task submitted to it.
+
+        Args:
+            broken (FairExecutor): The fair executor of the broken pool.
+        """
+        with self.__pool_lock:
+            if self.executor is not broken:
+                return  # Already replaced by another query
+            broken.executor.shutdown(wait=False, cancel_futures=True)
+            self.__start_pool()
+
+    @property
+    def address(self) -> Union[str, tuple[str, int]]:
+        """The path of the Unix socket or the host and port the server listens on."""
+        return self.server.server_address
+
+    def answer(self, request: dict[str, Any]) -> dict[str, Any]:
+        """
+        Answer a query.
+
+        Args:
+            request (dict[str, Any]): The query.
+
+        Returns:
+            dict[str, Any]: The top records and the stats of the scan, or the error. When a worker process died,
+            the error is answered and the pool is replaced for the next queries.
+        """
+        executor = self.executor
+        try:
+            options = service_options(request)
+            session = executor.session()
+            try:
+                service = FileProcessorService(**options, workers=self.workers, executor=session, cache=self.cache)
+                top_records, stats = service.process_file_with_stats()
+            finally:
+                session.shutdown(cancel_futures=True)
+        except BrokenProcessPool as e:
+            logger.error(f"A worker process died, restarting the workers: {e}")
+            self.__restart_pool(executor)
+            return {'error': f"A worker process died: {e}"}
+        except (ValueError, FileReadError, OSError) as e:
+            logger.warning(f"Query failed: {e}")
+            return {'error': str(e)}
+        return {'records': [record._asdict() for record in top_records], 'stats': stats.to_dict()}
+
+    def serve_forever(self) -> None:
+        """Answer queries until the server is shut down."""
+        logger.info(f"Serving top N queries on {self.address} with {self.workers} workers")
+        self.server.serve_forever()
+
+    def shutdown(self) -> None:
+        """Stop ``serve_forever``, from another thread."""
+        self.server.shutdown()
+
+    def close(self) -> None:
+        """Close the socket and stop the worker processes."""
+        self.server.server_close()
+        if self.socket_path is not None and os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        self.pool.shutdown(cancel_futures=True)
+
+    def __enter__(self) -> 'QueryServer':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+class _QueryHandler(socketserver.StreamRequestHandler):
+    """Answers the JSON queries of a connection, one per line."""
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                answer = {'error': f"Invalid JSON: {e}"}
+            else:
+                answer = self.server.query_server.answer(request)  # type: ignore[attr-defined]
+            self.wfile.write(json.dumps(answer).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+
+class _UnixQueryServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class _TCPQueryServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class QueryClient:
+    """
+    Sends queries to a query server over one connection, so repeated queries only cost the scan itself.
+
+    Example:
+        with QueryClient(port=8765) as client:
+            top = client.query('input/access.log', top=20)
+    """
+
+    def __init__(self, socket_path: Optional[str] = None, host: str = DEFAULT_HOST, port: Optional[int] = None,
+                 timeout: Optional[float] = None) -> None:
+        """
+        Connect to a query server.
+
+        Args:
+            socket_path (Optional[str], optional): The path of the Unix socket of the server. Defaults to None.
+            host (str, optional): The address of the TCP port of the server. Defaults to the loopback address.
+            port (Optional[int], optional): The TCP port of the server, when no socket path is given.
+                Defaults to None.
+            timeout (Optional[float], optional): The number of seconds to wait for an answer. Defaults to
+                None, which waits until the scan completes.
+
+        Raises:
+            ValueError: If neither a socket path nor a port is given.
+            OSError: If the server can not be reached.
+        """
+        if socket_path is not None:
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            address: Union[str, tuple[str, int]] = socket_path
+        elif port is not None:
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            address = (host, port)
+        else:
+            raise ValueError("A socket path or a port is needed")
+        self.socket.settimeout(timeout)
+        try:
+            self.socket.connect(address)
+        except OSError:
+            self.socket.close()
+            raise
+        self.file = self.socket.makefile('rwb')
+
+    def request(self, request: dict[str, Any]) -> dict[str, Any]:
+        """
+        Send a query and read its answer.
+
+        Args:
+            request (dict[str, Any]): The query.
+
+        Returns:
+            dict[str, Any]: The answer: the top records as dictionaries and the stats of the scan.
+
+        Raises:
+            QueryError: If the server could not answer the query or closed the connection.
+        """
+        self.file.write(json.dumps(request).encode('utf-8') + b'\n')
+        self.file.flush()
+        line = self.file.readline()
+        if not line:
+            raise QueryError("The server closed the connection")
+        answer = json.loads(line)
+        if 'error' in answer:
+            raise QueryError(answer['error'])
+        return answer
+
+    def query(self, path: Union[str, list[str]], top: int = 10,
+              **options: Any) -> list[Union[Record, Estimate, GroupedRecord]]:
+        """
+        Get the top records of files.
+
+        Args:
+            path (Union[str, list[str]]): The path of the file, or a list of paths, directories and glob patterns.
+            top (int, optional): The number of top records. Defaults to 10.
+            **options (Any): Any other option of ``QUERY_OPTIONS``, such as ``engine`` or ``aggregate``.
+
+        Returns:
+            list[Union[Record, Estimate, GroupedRecord]]: The top records.
+
+        Raises:
+            QueryError: If the server could not answer the query.
+        """
+        answer = self.request({'path': path, 'top': top, **options})
+        return [record_from_dict(record) for record in answer['records']]
+
+    def close(self) -> None:
+        """Close the connection."""
+        self.file.close()
+        self.socket.close()
+
+    def __enter__(self) -> 'QueryClient':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+def parse_serve_arguments(argv: list[str]) -> argparse.Namespace:
+    """
+    Parse the arguments of the ``serve`` command.
+
+    Args:
+        argv (list[str]): The arguments following ``serve``.
+
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(prog='main.py serve',
+                                     description='Answer JSON top N queries with a warm pool of worker processes')
+    address = parser.add_mutually_exclusive_group(required=True)
+    address.add_argument('--socket', type=str, default=None, metavar='PATH',
+                         help='Listen on a Unix socket at PATH, only accessible to its owner')
+    address.add_argument('--port', type=int, default=None, help='Listen on a TCP port')
+    parser.add_argument('--host', type=str, default=DEFAULT_HOST,
+                        help=f'Address of the TCP port (default: {DEFAULT_HOST})')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Number of worker processes shared by all queries (default: the number of CPUs '
+                             'available, capped by the cgroup CPU quota)')
+    parser.add_argument('--cache-dir', type=str, default=None, metavar='DIR',
+                        help='Answer queries on unchanged files from a result cache in DIR')
+    parser.add_argument('--cache-size', type=int, default=64,
+                        help='Size in MB above which the least recently used cache entries are removed (default: 64)')
+    parser.add_argument('--cache-entries', type=int, default=128,
+                        help='Number of cache entries also kept in memory (default: 128)')
+    return parser.parse_args(argv)
+
+
+def serve(argv: list[str]) -> None:
+    """
+    Run the ``serve`` command until interrupted.
+
+    Args:
+        argv (list[str]): The arguments following ``serve``.
+    """
+    args = parse_serve_arguments(argv)
+    cache = None
+    if args.cache_dir:
+        cache = ResultCache(args.cache_dir, args.cache_size * 1024 * 1024, args.cache_entries)
+    with QueryServer(args.socket, args.host, args.port or 0, args.workers, cache) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            logger.info("Stopped serving")
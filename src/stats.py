@@ -0,0 +1,106 @@
+import json
+from dataclasses import asdict, dataclass, field, fields
+from typing import Any
+
+
+@dataclass
+class ChunkStats:
+    """Timings of a single chunk or byte range of a scan."""
+    start: int
+    end: int
+    seconds: float
+    lines: int
+    worker: int
+    path: str = ''
+
+
+@dataclass
+class ScanStats:
+    """Counters and stage timings of a scan."""
+    open_s: float = 0.0
+    io_s: float = 0.0
+    parse_s: float = 0.0
+    heap_s: float = 0.0
+    total_s: float = 0.0
+    lines: int = 0
+    bytes_read: int = 0
+    heap_replacements: int = 0
+    rejected_early: int = 0
+    malformed_lines: int = 0
+    filtered_lines: int = 0
+    blocks_read: int = 0
+    blocks_skipped: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    chunks: list[ChunkStats] = field(default_factory=list)
+
+    def merge(self, other: 'ScanStats') -> None:
+        """
+        Add the counters and timings of another scan, such as a worker's, to these stats.
+
+        Args:
+            other (ScanStats): The stats to add.
+        """
+        for stat in fields(self):
+            if stat.name == 'chunks':
+                self.chunks.extend(other.chunks)
+            elif stat.name != 'total_s':
+                setattr(self, stat.name, getattr(self, stat.name) + getattr(other, stat.name))
+
+    def add_scan(self, seconds: float, io_s: float, heap_s: float) -> None:
+        """
+        Account the time of a scan loop, the part not spent on I/O or the heap being parse time.
+
+        Args:
+            seconds (float): The elapsed time of the scan loop.
+            io_s (float): The I/O time spent inside the loop.
+            heap_s (float): The heap time spent inside the loop.
+        """
+        self.heap_s += heap_s
+        self.parse_s += max(0.0, seconds - io_s - heap_s)
+
+    def to_dict(self) -> dict[str, Any]:
+        """
+        Get the stats as a dictionary.
+
+        Returns:
+            dict[str, Any]: The stats, with every chunk as a dictionary.
+        """
+        return asdict(self)
+
+    def format(self, output_format: str) -> str:
+        """
+        Format the stats.
+
+        Args:
+            output_format (str): ``json`` or ``text``.
+
+        Returns:
+            str: The formatted stats.
+        """
+        if output_format == 'json':
+            return json.dumps(self.to_dict(), indent=2)
+        megabytes = self.bytes_read / 1024 ** 2
+        lines = [
+            f"total        {self.total_s:10.3f} s",
+            f"open         {self.open_s:10.3f} s",
+            f"io           {self.io_s:10.3f} s",
+            f"parse        {self.parse_s:10.3f} s",
+            f"heap         {self.heap_s:10.3f} s",
+            f"lines        {self.lines:10d}",
+            f"bytes        {self.bytes_read:10d} ({megabytes:.1f} MB)",
+            f"replacements {self.heap_replacements:10d}",
+            f"rejected     {self.rejected_early:10d} (before building a record)",
+            f"malformed    {self.malformed_lines:10d}",
+            f"filtered     {self.filtered_lines:10d}",
+        ]
+        if self.blocks_read or self.blocks_skipped:
+            lines.append(f"blocks       {self.blocks_read:10d} read, {self.blocks_skipped} skipped")
+        if self.cache_hits or self.cache_misses:
+            lines.append(f"cache        {self.cache_hits:10d} hits, {self.cache_misses} misses")
+        if self.total_s > 0:
+            lines.append(f"throughput   {self.lines / self.total_s:10.0f} lines/s {megabytes / self.total_s:.1f} MB/s")
+        for chunk in sorted(self.chunks, key=lambda chunk: (chunk.path, chunk.start)):
+            lines.append(f"chunk {chunk.start:>12}-{chunk.end:<12} {chunk.seconds:8.3f} s "
+                         f"{chunk.lines:>10} lines (worker {chunk.worker}) {chunk.path}".rstrip())
+        return "\n".join(lines)
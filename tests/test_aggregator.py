@@ -0,0 +1,78 @@
+import os
+import unittest
+
+from src.aggregator import Aggregator
+from src.models import Record
+
+
+def lines():
+    for index in range(200):
+        for value in (index, index + 1, 1):
+            yield Record(value, f"http://example.com/{index}")
+
+
+class TestAggregator(unittest.TestCase):
+    def test_aggregates(self):
+        for aggregate, expected in (('sum', [400, 398]), ('max', [200, 199]), ('count', [3, 3])):
+            with self.subTest(aggregate=aggregate):
+                aggregator = Aggregator(2, aggregate)
+                for record in lines():
+                    aggregator.add_record(record)
+                top_records = aggregator.get_top_records()
+                self.assertEqual([record.value for record in top_records], expected)
+                if aggregate != 'count':
+                    self.assertEqual(top_records[0].url, "http://example.com/199")
+                self.assertEqual(aggregator.spills, 0)
+
+    def test_unknown_aggregate(self):
+        with self.assertRaises(ValueError):
+            Aggregator(2, 'avg')
+
+    def test_spill(self):
+        expected = Aggregator(5)
+        aggregator = Aggregator(5, memory_budget=2000)
+        for record in lines():
+            expected.add_record(record)
+            aggregator.add_record(record)
+        try:
+            self.assertGreater(aggregator.spills, 0)
+            directory = aggregator.directories[0]
+            self.assertEqual(aggregator.get_top_records(), expected.get_top_records())
+        finally:
+            aggregator.close()
+        self.assertFalse(os.path.exists(directory))
+
+    def test_merge_spilled(self):
+        expected = Aggregator(5, 'max')
+        aggregators = [Aggregator(5, 'max', memory_budget=1000) for _ in range(3)]
+        for index, record in enumerate(lines()):
+            expected.add_record(record)
+            aggregators[index % 3].add_record(record)
+        aggregator = aggregators[0].empty_copy()
+        aggregator.merge(*aggregators)
+        try:
+            self.assertGreater(aggregator.spills, 0)
+            self.assertEqual(aggregator.get_top_records(), expected.get_top_records())
+        finally:
+            aggregator.close()
+
+    def test_partition_spill(self):
+        # A budget smaller than a single URL makes every partition spill into sub-partitions again
+        expected = Aggregator(3, 'count')
+        aggregator = Aggregator(3, 'count', memory_budget=10)
+        for record in lines():
+            expected.add_record(record)
+            aggregator.add_record(record)
+        try:
+            self.assertEqual(aggregator.get_top_records(), expected.get_top_records())
+        finally:
+            aggregator.close()
+
+    def test_zero_top(self):
+        aggregator = Aggregator(0)
+        self.assertEqual(aggregator.threshold, float('inf'))
+        self.assertEqual(aggregator.get_top_records(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
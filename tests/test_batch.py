@@ -0,0 +1,95 @@
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+from src.batch import BatchHeapManager, BatchQuery, load_queries, shared_filter
+from src.filters import LineFilter
+from src.heap_manager import HeapManager
+from src.models import Record
+from src.selection import BatchSelector
+
+
+class TestLoadQueries(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'queries.jsonl')
+
+    def write(self, content: str) -> None:
+        with open(self.path, 'w') as file:
+            file.write(content)
+
+    def test_load_queries(self):
+        self.write('{"top": 3, "id": "all"}\n\n{"url_prefix": "http://a", "min_value": 5}\n')
+        self.assertEqual(load_queries(self.path, default_top=7),
+                         [BatchQuery(3, None, "all"), BatchQuery(7, LineFilter(url_prefix="http://a", min_value=5), 3)])
+
+    def test_invalid_queries(self):
+        for content in ('', '[1]\n', '{"top": -1}\n', '{"top": "3"}\n', '{"top": 3, "engine": "mmap"}\n',
+                        '{"min_value": 5, "max_value": 1}\n', '{"top": 3\n'):
+            with self.subTest(content=content), self.assertRaises(ValueError):
+                self.write(content)
+                load_queries(self.path)
+
+
+class TestSharedFilter(unittest.TestCase):
+    def test_shared_filter(self):
+        self.assertEqual(shared_filter([LineFilter(url_prefix="http://a.com/x", min_value=5, url_contains="q"),
+                                        LineFilter(url_prefix="http://a.com/y", min_value=2, max_value=9,
+                                                   url_contains="q")]),
+                         LineFilter(url_prefix="http://a.com/", url_contains="q", min_value=2))
+
+    def test_no_shared_filter(self):
+        self.assertIsNone(shared_filter([LineFilter(min_value=5), None]))
+        self.assertIsNone(shared_filter([LineFilter(url_prefix="a.com/"), LineFilter(url_prefix="b.com/")]))
+
+
+class TestBatchHeapManager(unittest.TestCase):
+    def setUp(self):
+        self.queries = [BatchQuery(2), BatchQuery(1, LineFilter(max_value=15)),
+                        BatchQuery(2, LineFilter(url_contains="b"))]
+        self.records = [Record(value, url) for value, url in
+                        ((10, "a"), (20, "b"), (5, "bb"), (30, "c"), (15, "ab"), (1, "b"))]
+
+    def expected(self) -> list[list[Record]]:
+        results = []
+        for query in self.queries:
+            heap = HeapManager(query.top)
+            test = query.line_filter.record_test() if query.line_filter else (lambda record: True)
+            for record in filter(test, self.records):
+                heap.add_record(record)
+            results.append(heap.get_top_records())
+        return results
+
+    def test_results(self):
+        manager = BatchHeapManager(self.queries)
+        for record in self.records:
+            manager.add_record(record)
+        self.assertEqual(manager.results(), self.expected())
+        self.assertEqual(manager.get_top_records(), [record for records in self.expected() for record in records])
+        # The second query takes no value above 15, so its threshold bounds the batch
+        self.assertEqual(manager.threshold, 15)
+
+    def test_threshold_starts_at_value_ranges(self):
+        manager = BatchHeapManager([BatchQuery(2, LineFilter(min_value=5)), BatchQuery(2, LineFilter(min_value=8))])
+        self.assertEqual(manager.threshold, 5)
+        self.assertEqual(BatchHeapManager([BatchQuery(0)]).threshold, float('inf'))
+
+    def test_merge_pickled_copies(self):
+        manager = BatchHeapManager(self.queries)
+        workers = [pickle.loads(pickle.dumps(manager.empty_copy())) for _ in range(2)]
+        for index, record in enumerate(self.records):
+            workers[index % 2].add_record(record)
+        manager.merge(*workers)
+        self.assertEqual(manager.results(), self.expected())
+
+    def test_large_top_uses_selector(self):
+        manager = BatchHeapManager([BatchQuery(20_000)])
+        self.assertIsInstance(manager.selectors[0], BatchSelector)
+        manager.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import io
+import unittest
+
+from benchmarks.generate import DISTRIBUTIONS, generate_file, parse_size
+
+from tests.helpers import parameterized_test
+
+
+class TestGenerate(unittest.TestCase):
+    @parameterized_test(
+        ("512", 512),
+        ("1KB", 1024),
+        ("1.5MB", 1572864),
+        ("50gb", 50 * 1024 ** 3),
+    )
+    def test_parse_size(self, size, expected):
+        self.assertEqual(parse_size(size), expected)
+
+    def test_generate_file_is_reproducible(self):
+        for distribution in DISTRIBUTIONS:
+            with self.subTest(distribution=distribution):
+                first, second = io.StringIO(), io.StringIO()
+                lines = generate_file(first, 50_000, url_length=40, distribution=distribution, seed=7)
+                generate_file(second, 50_000, url_length=40, distribution=distribution, seed=7)
+                content = first.getvalue()
+                self.assertEqual(content, second.getvalue())
+                self.assertGreaterEqual(len(content), 50_000)
+                self.assertEqual(content.count("\n"), lines)
+                url, value = content.splitlines()[0].rsplit(maxsplit=1)
+                self.assertEqual(len(url), 40)
+                int(value)
+
+    def test_generate_file_sorted_values(self):
+        file = io.StringIO()
+        generate_file(file, 10_000, distribution='ascending')
+        values = [int(line.rsplit(maxsplit=1)[1]) for line in file.getvalue().splitlines()]
+        self.assertEqual(values, sorted(values))
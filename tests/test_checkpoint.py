@@ -0,0 +1,60 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from src.checkpoint import Checkpoint, CheckpointWriter, scan_query
+from src.filters import LineFilter
+from src.heap_manager import HeapManager
+from src.models import Record
+
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'access.log')
+        with open(self.path, 'w') as file:
+            file.write("http://example.com 10\nhttp://example.org 20\n")
+        self.checkpoint_path = os.path.join(directory, 'scan.checkpoint')
+
+    def test_save_and_load(self):
+        query = scan_query(LineFilter(url_prefix="http://example", min_value=5), skip_malformed=True)
+        checkpoint = Checkpoint.for_file(self.path, 2, [(0, 22), (22, 44)], query)
+        checkpoint.done.append((22, 44))
+        checkpoint.records = [Record(20, "http://example.org")]
+        checkpoint.save(self.checkpoint_path)
+        loaded = Checkpoint.load(self.checkpoint_path, self.path, 2, query)
+        self.assertEqual(loaded, checkpoint)
+        self.assertEqual(loaded.pending(), [(0, 22)])
+        self.assertEqual(loaded.heap_manager().get_top_records(), [Record(20, "http://example.org")])
+        self.assertEqual(sorted(os.listdir(os.path.dirname(self.path))), ['access.log', 'scan.checkpoint'])
+
+    def test_load_for_another_file_or_query(self):
+        Checkpoint.for_file(self.path, 2, [(0, 44)]).save(self.checkpoint_path)
+        self.assertIsNone(Checkpoint.load(self.checkpoint_path, self.path, 3))
+        self.assertIsNone(Checkpoint.load(self.checkpoint_path, self.path, 2, scan_query(LineFilter(max_value=10))))
+        self.assertIsNone(Checkpoint.load(self.checkpoint_path, self.path, 2, scan_query(skip_malformed=True)))
+        self.assertIsNotNone(Checkpoint.load(self.checkpoint_path, self.path, 2, scan_query()))
+        with open(self.path, 'a') as file:
+            file.write("http://example.net 30\n")
+        self.assertIsNone(Checkpoint.load(self.checkpoint_path, self.path, 2))
+
+    def test_load_missing_or_unreadable(self):
+        self.assertIsNone(Checkpoint.load(self.checkpoint_path, self.path, 2))
+        with open(self.checkpoint_path, 'w') as file:
+            file.write('{"version": 1, "size"')
+        self.assertIsNone(Checkpoint.load(self.checkpoint_path, self.path, 2))
+
+    def test_writer(self):
+        writer = CheckpointWriter(self.checkpoint_path, Checkpoint.for_file(self.path, 2, [(0, 22), (22, 44)]),
+                                  interval=3600)
+        heap_manager = HeapManager(2)
+        heap_manager.add_record(Record(10, "http://example.com"))
+        writer.chunk_done(0, 22, heap_manager)
+        self.assertFalse(os.path.exists(self.checkpoint_path))  # Not due yet
+        writer.interval = 0
+        writer.chunk_done(22, 44, heap_manager)
+        self.assertEqual(Checkpoint.load(self.checkpoint_path, self.path, 2).done, [(0, 22), (22, 44)])
+        writer.finish()
+        self.assertFalse(os.path.exists(self.checkpoint_path))
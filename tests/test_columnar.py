@@ -0,0 +1,119 @@
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from src.aggregator import Aggregator
+from src.columnar import HEADER, ColumnarHeader, ColumnarWriter, is_columnar
+from src.convert import convert
+from src.file_processors import ColumnarFileProcessor, FileProcessor, ProcessorFactory
+from src.filters import LineFilter
+from src.follow import FileFollower
+from src.groups import GroupedHeapManager, GroupKey
+from src.heap_manager import HeapManager
+from src.helpers import FileReadError
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class TestColumnar(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.text_path = os.path.join(self.directory, 'access.log')
+        self.path = os.path.join(self.directory, 'access.col')
+        lines = [f"http://host{i % 7}.com/page/{i} {(i * 7919) % 1000 - 100}\n" for i in range(3000)]
+        lines.append("http://example.com/é 99999999999\n")
+        with open(self.text_path, 'w') as file:
+            file.writelines(lines)
+        convert([self.text_path], self.path)
+
+    def scan(self, path, heap_manager, line_filter=None, processor_type=FileProcessor):
+        with processor_type(open(path, 'r' if processor_type is FileProcessor else 'rb')) as processor:
+            processor.line_filter = line_filter
+            processor.populate(heap_manager)
+        return heap_manager.get_top_records()
+
+    def assert_same_results(self):
+        filters = (None, LineFilter(min_value=0, max_value=500), LineFilter(url_prefix="http://host3"),
+                   LineFilter(url_contains="/1", min_value=100))
+        for line_filter in filters:
+            for heap_manager in (lambda: HeapManager(5), lambda: HeapManager(0), lambda: HeapManager(5000),
+                                 lambda: Aggregator(3, 'sum'),
+                                 lambda: GroupedHeapManager(2, GroupKey('host'))):
+                with self.subTest(line_filter=line_filter, heap_manager=heap_manager()):
+                    self.assertEqual(self.scan(self.path, heap_manager(), line_filter, ColumnarFileProcessor),
+                                     self.scan(self.text_path, heap_manager(), line_filter))
+
+    def test_header_round_trip(self):
+        with open(self.path, 'rb') as file:
+            header = ColumnarHeader.read(file.read(HEADER.size))
+        self.assertEqual(header.count, 3001)
+        self.assertEqual(ColumnarHeader.read(header.pack()), header)
+        with self.assertRaises(FileReadError):
+            ColumnarHeader.read(b"http://example.com 1\n" * 3)
+        self.assertTrue(is_columnar(self.path))
+        self.assertFalse(is_columnar(self.text_path))
+
+    def test_read_records(self):
+        with ColumnarFileProcessor(open(self.path, 'rb')) as processor:
+            records = list(processor.read_records())
+        with FileProcessor(open(self.text_path, 'r')) as processor:
+            self.assertEqual(records, list(processor.read_records()))
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_numpy_results(self):
+        with patch.object(ColumnarFileProcessor, 'block_values', 1000):
+            self.assert_same_results()
+
+    def test_pure_python_results(self):
+        with patch('src.file_processors.np', None):
+            self.assert_same_results()
+
+    def test_factory_detects_columnar_files(self):
+        for engine in ('text', 'mmap', 'numpy', 'process', 'stream'):
+            with self.subTest(engine=engine):
+                with ProcessorFactory.create_processor(self.path, engine=engine) as processor:
+                    self.assertIsInstance(processor, ColumnarFileProcessor)
+
+    def test_follow_rejects_columnar_files(self):
+        follower = FileFollower(self.path, HeapManager(3))
+        self.addCleanup(follower.close)
+        with self.assertRaisesRegex(FileReadError, "can not be followed"):
+            follower.poll()
+
+    def test_convert_compressed_files(self):
+        compressed_path = os.path.join(self.directory, 'access.log.gz')
+        with open(self.text_path, 'rb') as source, gzip.open(compressed_path, 'wb') as target:
+            shutil.copyfileobj(source, target)
+        output = os.path.join(self.directory, 'compressed.col')
+        stats = convert([compressed_path], output)
+        self.assertEqual(stats.lines, 3001)
+        with open(self.path, 'rb') as expected, open(output, 'rb') as converted:
+            self.assertEqual(converted.read(), expected.read())
+
+    def test_overflow_keeps_previous_file(self):
+        with open(self.text_path, 'a') as file:
+            file.write(f"http://example.com/big {2 ** 63}\n")
+        with self.assertRaises(FileReadError):
+            convert([self.text_path], self.path)
+        self.assertEqual(sorted(os.listdir(self.directory)), ['access.col', 'access.log'])
+        self.assertTrue(is_columnar(self.path))
+
+    def test_empty_file(self):
+        with ColumnarWriter(self.path):
+            pass
+        with ColumnarFileProcessor(open(self.path, 'rb')) as processor:
+            self.assertEqual(list(processor.read_records()), [])
+            heap_manager = HeapManager(3)
+            processor.populate(heap_manager)
+        self.assertEqual(heap_manager.get_top_records(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
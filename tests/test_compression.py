@@ -0,0 +1,51 @@
+import bz2
+import gzip
+import io
+import lzma
+import os
+import tempfile
+import unittest
+
+from src.compression import bgzf_compress, bgzf_members, detect_compression, inflate_line_end, open_compressed
+from tests.helpers import parameterized_test
+
+CONTENT = b"".join(b"http://example.com/%d %d\n" % (i, (i * 7919) % 1000) for i in range(2000))
+
+
+class TestCompression(unittest.TestCase):
+    def write_temp_file(self, data: bytes) -> str:
+        with tempfile.NamedTemporaryFile('wb', delete=False) as file:
+            file.write(data)
+        self.addCleanup(os.remove, file.name)
+        return file.name
+
+    @parameterized_test(
+        (gzip.compress, 'gzip'),
+        (bz2.compress, 'bz2'),
+        (lzma.compress, 'xz'),
+        (bgzf_compress, 'gzip'),
+        (lambda data: data, None),
+    )
+    def test_detect_and_open(self, compress, compression):
+        path = self.write_temp_file(compress(CONTENT))
+        self.assertEqual(detect_compression(path), compression)
+        if compression is not None:
+            with open_compressed(path, compression, 'rb') as file:
+                self.assertEqual(file.read(), CONTENT)
+
+    def test_bgzf_members(self):
+        data = bgzf_compress(CONTENT, member_size=1000)
+        members = bgzf_members(io.BytesIO(data))
+        self.assertEqual(members[0].start, 0)
+        self.assertEqual(members[-1].end, len(data))
+        self.assertEqual(members[-1].size, 0)  # End of file marker
+        self.assertEqual(sum(member.size for member in members), len(CONTENT))
+        self.assertTrue(all(a.end == b.start for a, b in zip(members, members[1:])))
+
+    def test_bgzf_members_of_plain_gzip(self):
+        self.assertIsNone(bgzf_members(io.BytesIO(gzip.compress(CONTENT))))
+
+    def test_inflate_line_end(self):
+        data = bgzf_compress(b"abc" * 10 + b"\nnext line\n", member_size=7)
+        members = bgzf_members(io.BytesIO(data))
+        self.assertEqual(inflate_line_end(io.BytesIO(data), members[1].start), (b"abc" * 10)[7:] + b"\n")
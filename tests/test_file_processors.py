@@ -1,9 +1,39 @@
+import bz2
+import gzip
+import io
+import os
+import shutil
+import tempfile
+import threading
 import unittest
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
 from unittest.mock import mock_open, patch
 
+from src.aggregator import Aggregator
 from src.models import Record
 from src.helpers import FileReadError
-from src.file_processors import FileProcessor, ChunkFileProcessor, ParallelFileProcessor, ProcessorFactory
+from src.heap_manager import HeapManager
+from src.block_index import BlockIndex
+from src.checkpoint import Checkpoint
+from src.compression import bgzf_compress, bgzf_members
+from src.filters import LineFilter
+from src.selection import BatchSelector, ExternalSelector
+from src.file_processors import (FileProcessor, ChunkFileProcessor, ByteRangeFileProcessor, ParallelFileProcessor,
+                                 MmapFileProcessor, NumpyBlockFileProcessor, IndexedFileProcessor,
+                                 ProcessPoolFileProcessor, BgzfFileProcessor, MultiFileProcessor, StreamFileProcessor,
+                                 ProcessorFactory, RecordBatch, expand_paths, split_byte_ranges)
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def write_temp_file(content: str) -> str:
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as file:
+        file.write(content)
+    return file.name
 
 
 class TestFileProcessor(unittest.TestCase):
@@ -27,6 +57,32 @@ class TestFileProcessor(unittest.TestCase):
                 with self.assertRaises(FileReadError):
                     list(processor.read_records())
 
+    def test_populate_skips_records_below_threshold(self):
+        mock_file_content = "http://example.com 30\nhttp://example.org 20\nhttp://example.net\t40\nhttp://example.info 10\n"
+        with patch('builtins.open', mock_open(read_data=mock_file_content)):
+            with open('dummy', 'r') as f:
+                heap = HeapManager(1)
+                with patch('src.file_processors.Record', wraps=Record) as record_type:
+                    FileProcessor(f).populate(heap)
+                self.assertEqual([record.url for record in heap.get_top_records()], ["http://example.net"])
+                self.assertEqual(heap.rejected_early, 2)
+                self.assertEqual(record_type.call_count, 2)
+
+    def test_populate_ties_at_threshold(self):
+        mock_file_content = "http://example.com 10\nhttp://example.org 10\nhttp://example.net 10\n"
+        with patch('builtins.open', mock_open(read_data=mock_file_content)):
+            with open('dummy', 'r') as f:
+                heap = HeapManager(1)
+                FileProcessor(f).populate(heap)
+                self.assertEqual(heap.get_top_records(), [Record(10, "http://example.org")])
+
+    def test_populate_error(self):
+        mock_file_content = "http://example.com 10\n20\n"
+        with patch('builtins.open', mock_open(read_data=mock_file_content)):
+            with open('dummy', 'r') as f:
+                with self.assertRaises(FileReadError):
+                    FileProcessor(f).populate(HeapManager(1))
+
 
 class TestChunkFileProcessor(unittest.TestCase):
     def test_read_records(self):
@@ -52,6 +108,203 @@ class TestChunkFileProcessor(unittest.TestCase):
                 self.assertEqual(records[0].value, 20)
 
 
+class TestSplitByteRanges(unittest.TestCase):
+    def setUp(self):
+        self.content = "".join(f"http://example.com/{i} {i}\n" for i in range(100))
+        self.path = write_temp_file(self.content)
+        self.addCleanup(os.remove, self.path)
+
+    def test_ranges_cover_file_on_line_boundaries(self):
+        data = self.content.encode()
+        ranges = split_byte_ranges(self.path, chunk_bytes=100)
+        self.assertGreater(len(ranges), 1)
+        self.assertEqual(ranges[0][0], 0)
+        self.assertEqual(ranges[-1][1], len(data))
+        for (_, end), (start, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(end, start)
+            self.assertEqual(data[start - 1:start], b"\n")
+
+    def test_empty_file(self):
+        path = write_temp_file("")
+        self.addCleanup(os.remove, path)
+        self.assertEqual(split_byte_ranges(path, chunk_bytes=100), [])
+
+    def test_chunk_larger_than_file(self):
+        self.assertEqual(split_byte_ranges(self.path, chunk_bytes=10 ** 9), [(0, len(self.content))])
+
+
+class TestByteRangeFileProcessor(unittest.TestCase):
+    def test_read_records(self):
+        content = b"http://example.com 10\nhttp://example.org 20\nhttp://example.net 30\n"
+        processor = ByteRangeFileProcessor(io.BytesIO(content), start=22, end=44)
+        records = list(processor.read_records())
+        self.assertEqual(records, [Record(20, "http://example.org")])
+        self.assertEqual(records[0].url, "http://example.org")
+
+    def test_read_records_error(self):
+        processor = ByteRangeFileProcessor(io.BytesIO(b"http://example.com\n"), start=0, end=19)
+        with self.assertRaises(FileReadError):
+            list(processor.read_records())
+
+    def test_populate(self):
+        content = b"http://example.com 10\nhttp://example.org 20\nhttp://example.net 30\nhttp://example.info 5\n"
+        heap = HeapManager(1)
+        ByteRangeFileProcessor(io.BytesIO(content), start=22, end=len(content)).populate(heap)
+        self.assertEqual([(record.value, record.url) for record in heap.get_top_records()],
+                         [(30, "http://example.net")])
+        self.assertEqual(heap.rejected_early, 1)
+
+
+class TestMmapFileProcessor(unittest.TestCase):
+    def open_temp_file(self, content: str):
+        path = write_temp_file(content)
+        self.addCleanup(os.remove, path)
+        file = open(path, 'rb')
+        self.addCleanup(file.close)
+        return file
+
+    def test_read_records(self):
+        file = self.open_temp_file("http://example.com 10\nhttp://example.org 20")
+        records = list(MmapFileProcessor(file).read_records())
+        self.assertEqual([(record.value, record.url) for record in records],
+                         [(10, "http://example.com"), (20, "http://example.org")])
+
+    def test_read_records_range(self):
+        file = self.open_temp_file("http://example.com 10\nhttp://example.org 20\nhttp://example.net 30\n")
+        records = list(MmapFileProcessor(file, start=22, end=44).read_records())
+        self.assertEqual([(record.value, record.url) for record in records], [(20, "http://example.org")])
+
+    def test_populate(self):
+        content = "".join(f"http://example.com/{i} {(i * 7919) % 1000}\n" for i in range(500))
+        file = self.open_temp_file(content + "http://example.org/tab\t999\n")
+        heap = HeapManager(5)
+        MmapFileProcessor(file).populate(heap)
+        expected = HeapManager(5)
+        for record in MmapFileProcessor(file).read_records():
+            expected.add_record(record)
+        self.assertEqual([(record.value, record.url) for record in heap.get_top_records()],
+                         [(record.value, record.url) for record in expected.get_top_records()])
+        self.assertIn("http://example.org/tab", [record.url for record in heap.get_top_records()])
+
+    def test_populate_empty_file(self):
+        heap = HeapManager(5)
+        MmapFileProcessor(self.open_temp_file("")).populate(heap)
+        self.assertEqual(heap.get_top_records(), [])
+
+    def test_populate_error(self):
+        file = self.open_temp_file("http://example.com 10\nhttp://example.org twenty\n")
+        with self.assertRaises(FileReadError):
+            MmapFileProcessor(file).populate(HeapManager(5))
+
+    def test_error_quotes_start_of_long_line(self):
+        file = self.open_temp_file("\x00" * 10_000 + " binary")
+        with self.assertRaises(FileReadError) as context:
+            MmapFileProcessor(file).populate(HeapManager(5))
+        self.assertLess(len(str(context.exception)), 1000)
+        self.assertTrue(str(context.exception).endswith("... (10007 bytes)"))
+
+
+@unittest.skipIf(numpy is None, "NumPy is not installed")
+class TestNumpyBlockFileProcessor(unittest.TestCase):
+    def populate(self, content: str, top: int, block_size: int = 64) -> tuple[HeapManager, HeapManager]:
+        path = write_temp_file(content)
+        self.addCleanup(os.remove, path)
+        heap = HeapManager(top)
+        with open(path, 'rb') as f:
+            processor = NumpyBlockFileProcessor(f)
+            processor.block_size = block_size
+            processor.populate(heap)
+        expected = HeapManager(top)
+        with open(path, 'rb') as f:
+            MmapFileProcessor(f).populate(expected)
+        return heap, expected
+
+    def test_populate_matches_mmap(self):
+        content = "".join(f"http://example.com/{i} {(i * 7919) % 1000 - 500}\n" for i in range(300))
+        for top in (1, 5, 50, 1000):
+            heap, expected = self.populate(content, top)
+            self.assertEqual(heap.get_top_records(), expected.get_top_records())
+
+    def test_populate_ties_and_special_lines(self):
+        content = ("http://example.com 7\r\nhttp://example.org\t7\nhttp://example.net 7 \n"
+                   "http://example.info 12345678901234567890\nhttp://example.edu 7\nhttp://example.gov -7")
+        for top in (1, 2, 3, 10):
+            heap, expected = self.populate(content, top, block_size=40)
+            self.assertEqual(heap.get_top_records(), expected.get_top_records())
+
+    def test_populate_error(self):
+        with self.assertRaises(FileReadError):
+            self.populate("http://example.com 10\n\nhttp://example.org 20\n", 2)
+
+    def test_sinks_needing_every_line(self):
+        path = write_temp_file("http://a 5\nhttp://b 9\nhttp://a 7\n")
+        self.addCleanup(os.remove, path)
+        aggregator = Aggregator(1, 'sum')
+        with open(path, 'rb') as f:
+            NumpyBlockFileProcessor(f).populate(aggregator)
+        self.assertEqual(aggregator.get_top_records(), [Record(12, "http://a")])
+
+
+class TestIndexedFileProcessor(unittest.TestCase):
+    def setUp(self):
+        content = "".join(f"http://example.com/{i} {(i * 7919) % 1000}\n" for i in range(500))
+        self.path = write_temp_file(content)
+        self.addCleanup(os.remove, self.path)
+        self.addCleanup(lambda: os.path.exists(self.path + '.topn-index') and os.remove(self.path + '.topn-index'))
+
+    def populate(self, top: int, heap: Optional[HeapManager] = None) -> IndexedFileProcessor:
+        heap = heap or HeapManager(top)
+        self.addCleanup(heap.close)
+        with open(self.path, 'rb') as f:
+            processor = IndexedFileProcessor(f, block_size=256)
+            processor.populate(heap)
+        expected = HeapManager(top)
+        with open(self.path, 'rb') as f:
+            MmapFileProcessor(f).populate(expected)
+        self.assertEqual(heap.get_top_records(), expected.get_top_records())
+        return processor
+
+    def test_builds_index_on_first_scan(self):
+        processor = self.populate(5)
+        index = BlockIndex.load(self.path + '.topn-index', self.path)
+        self.assertIsNotNone(index)
+        self.assertEqual(sum(block.lines for block in index.blocks), 500)
+        self.assertEqual(len(index.blocks), processor.stats.blocks_read)
+        self.assertEqual(max(block.max_value for block in index.blocks), 999)
+
+    def test_skips_blocks_with_index(self):
+        blocks = self.populate(3).stats.blocks_read
+        for top in (1, 3, 20):
+            processor = self.populate(top)
+            self.assertLess(processor.stats.blocks_read, blocks)
+            self.assertEqual(processor.stats.blocks_read + processor.stats.blocks_skipped, blocks)
+
+    def test_index_built_by_selectors(self):
+        for heap in (BatchSelector(600), ExternalSelector(600, run_records=20)):
+            with self.subTest(heap=heap):
+                self.populate(600, heap)
+                index = BlockIndex.load(self.path + '.topn-index', self.path)
+                self.assertEqual(max(block.max_value for block in index.blocks), 999)
+                self.assertGreater(self.populate(5).stats.blocks_read, 0)
+                os.remove(self.path + '.topn-index')
+
+    def test_reads_blocks_tied_with_threshold(self):
+        content = "http://example.com/a 5\n" * 20 + "http://example.com/z 5\n"
+        with open(self.path, 'w') as f:
+            f.write(content)
+        self.populate(1)
+        self.assertEqual(self.populate(1).stats.blocks_skipped, 0)
+
+    def test_rebuilds_stale_index(self):
+        self.populate(5)
+        with open(self.path, 'a') as f:
+            f.write("http://example.org 5000\n")
+        self.assertIsNone(BlockIndex.load(self.path + '.topn-index', self.path))
+        processor = self.populate(1)
+        self.assertEqual(processor.stats.blocks_skipped, 0)
+        self.assertIsNotNone(BlockIndex.load(self.path + '.topn-index', self.path))
+
+
 class TestParallelFileProcessor(unittest.TestCase):
     def test_read_records(self):
         mock_file_content = "http://example.com 10\nhttp://example.org 20\nhttp://example.net 30\n"
@@ -64,14 +317,424 @@ class TestParallelFileProcessor(unittest.TestCase):
                 self.assertIn(Record(20, "http://example.org"), records)
                 self.assertIn(Record(30, "http://example.net"), records)
 
+    def test_read_records_byte_ranges(self):
+        content = "".join(f"http://example.com/{i} {i}\n" for i in range(100))
+        path = write_temp_file(content)
+        self.addCleanup(os.remove, path)
+        with open(path, 'r') as f:
+            processor = ParallelFileProcessor(f, chunk_size=64, chunk_mode='bytes')
+            records = list(processor.read_records())
+        self.assertEqual(sorted(record.value for record in records), list(range(100)))
+        self.assertEqual({record.url for record in records}, {f"http://example.com/{i}" for i in range(100)})
+
+    def test_unknown_chunk_mode(self):
+        with self.assertRaises(ValueError):
+            ParallelFileProcessor(io.StringIO(""), chunk_size=2, chunk_mode='pages')
+
+    def test_inflight_chunks_are_bounded(self):
+        path = write_temp_file("".join(f"http://example.com/{i} {i}\n" for i in range(100)))
+        self.addCleanup(os.remove, path)
+        started = []
+
+        class CountingChunkFileProcessor(ChunkFileProcessor):
+            def __init__(self, file, start, size):
+                started.append(start)
+                super().__init__(file, start, size)
+
+        with open(path, 'r') as f, patch('src.file_processors.ChunkFileProcessor', CountingChunkFileProcessor):
+            processor = ParallelFileProcessor(f, chunk_size=5)
+            processor.max_inflight_chunks = 2
+            records = processor.read_records()
+            next(records)
+            self.assertLessEqual(len(started), 2)  # A slow consumer holds back the other 18 chunks
+            self.assertEqual(len(list(records)), 99)
+        self.assertEqual(len(started), 20)
+
+    def test_populate_matches_single_threaded(self):
+        path = write_temp_file("".join(f"http://example.com/{i} {(i * 37) % 101}\n" for i in range(200)))
+        self.addCleanup(os.remove, path)
+        for chunk_mode, chunk_size in (('lines', 7), ('bytes', 300)):
+            with self.subTest(chunk_mode=chunk_mode):
+                heap = HeapManager(10)
+                with open(path, 'r') as f:
+                    processor = ParallelFileProcessor(f, chunk_size, chunk_mode)
+                    processor.max_inflight_chunks = 3
+                    processor.populate(heap)
+                expected = HeapManager(10)
+                with open(path, 'r') as f:
+                    FileProcessor(f).populate(expected)
+                self.assertEqual(heap.get_top_records(), expected.get_top_records())
+                self.assertEqual(processor.stats.lines, 200)
+
+    def test_populate_copies_once_per_chunk(self):
+        path = write_temp_file("".join(f"http://example.com/{i} {i}\n" for i in range(20)))
+        self.addCleanup(os.remove, path)
+        with open(path, 'r') as f, patch.object(HeapManager, 'empty_copy', autospec=True,
+                                                side_effect=lambda manager: HeapManager(manager.n)) as empty_copy:
+            ParallelFileProcessor(f, chunk_size=5).populate(HeapManager(3))
+        self.assertEqual(empty_copy.call_count, 4)
+
+
+class TestRecordBatch(unittest.TestCase):
+    def test_pack_and_unpack(self):
+        records = [Record(10, "http://a.com"), Record(-3, "http://b.com"), Record(2 ** 70, "http://c.com")]
+        batch = RecordBatch.pack(records)
+        self.assertEqual(len(batch), 3)
+        self.assertEqual(list(batch), records)
+        self.assertEqual(list(RecordBatch.pack([])), [])
+
+
+class TestProcessPoolFileProcessor(unittest.TestCase):
+    def setUp(self):
+        content = "".join(f"http://example.com/{i} {(i * 37) % 101}\n" for i in range(200))
+        self.path = write_temp_file(content)
+        self.addCleanup(os.remove, self.path)
+
+    def test_read_records(self):
+        with open(self.path, 'rb') as f:
+            processor = ProcessPoolFileProcessor(f, top=5, chunk_size=256, workers=2)
+            records = list(processor.read_records())
+        self.assertEqual([record.value for record in records], [100, 100, 99, 99, 98])
+
+    def test_populate_matches_single_threaded(self):
+        heap = HeapManager(10)
+        with open(self.path, 'rb') as f:
+            ProcessPoolFileProcessor(f, top=10, workers=3).populate(heap)
+        expected = HeapManager(10)
+        with open(self.path, 'r') as f:
+            FileProcessor(f).populate(expected)
+        self.assertEqual([record.value for record in heap.get_top_records()],
+                         [record.value for record in expected.get_top_records()])
+
+    def run_with_checkpoint(self, checkpoint_path: str, resume: bool = False, path: str = None,
+                            line_filter: LineFilter = None) -> tuple:
+        with open(path or self.path, 'rb') as f, RecordingExecutor() as executor:
+            processor = ProcessPoolFileProcessor(f, top=5, chunk_size=512, executor=executor)
+            processor.line_filter = line_filter
+            processor.checkpoint_path = checkpoint_path
+            processor.checkpoint_interval = 0
+            processor.resume = resume
+            heap = HeapManager(5)
+            processor.populate(heap)
+        return heap, processor, executor
+
+    def test_resume_from_checkpoint(self):
+        checkpoint_path = self.path + '.checkpoint'
+        self.addCleanup(lambda: os.path.exists(checkpoint_path) and os.remove(checkpoint_path))
+        ranges = split_byte_ranges(self.path, 512)
+        checkpoint = Checkpoint.for_file(self.path, 5, ranges)
+        checkpoint.done = ranges[:2]
+        with open(self.path, 'rb') as f:
+            done = HeapManager(5)
+            for start, end in ranges[:2]:
+                MmapFileProcessor(f, start, end).populate(done)
+        checkpoint.records = done.min_heap
+        checkpoint.save(checkpoint_path)
+
+        heap, processor, executor = self.run_with_checkpoint(checkpoint_path, resume=True)
+        self.assertEqual([(start, end) for _, start, end, *_ in executor.submitted], ranges[2:])
+        self.assertEqual([record.value for record in heap.get_top_records()], [100, 100, 99, 99, 98])
+        self.assertFalse(os.path.exists(checkpoint_path))  # Removed once the scan completes
+
+    def test_resume_with_another_filter(self):
+        checkpoint_path = self.path + '.checkpoint'
+        self.addCleanup(lambda: os.path.exists(checkpoint_path) and os.remove(checkpoint_path))
+        ranges = split_byte_ranges(self.path, 512)
+        checkpoint = Checkpoint.for_file(self.path, 5, ranges)
+        checkpoint.done = ranges[:2]
+        checkpoint.records = [Record(100, "http://example.com/unfiltered")] * 5
+        checkpoint.save(checkpoint_path)
+
+        heap, _, executor = self.run_with_checkpoint(checkpoint_path, resume=True,
+                                                     line_filter=LineFilter(max_value=10))
+        self.assertEqual([(start, end) for _, start, end, *_ in executor.submitted], ranges)
+        self.assertTrue(all(record.value <= 10 for record in heap.get_top_records()))
+
+    def test_checkpoint_of_failed_scan(self):
+        path = write_temp_file("".join(f"http://example.com/{i} {i}\n" for i in range(100)) + "http://example.org x\n")
+        self.addCleanup(os.remove, path)
+        checkpoint_path = path + '.checkpoint'
+        self.addCleanup(lambda: os.path.exists(checkpoint_path) and os.remove(checkpoint_path))
+        with self.assertRaises(FileReadError):
+            self.run_with_checkpoint(checkpoint_path, path=path)
+        checkpoint = Checkpoint.load(checkpoint_path, path, 5)
+        self.assertGreater(len(checkpoint.ranges), 1)
+        self.assertNotIn(checkpoint.ranges[-1], checkpoint.done)  # The chunk with the malformed line
+
+    def test_read_records_error(self):
+        path = write_temp_file("http://example.com 10\nhttp://example.org twenty\n")
+        self.addCleanup(os.remove, path)
+        with open(path, 'rb') as f:
+            with self.assertRaises(FileReadError):
+                list(ProcessPoolFileProcessor(f, top=2, workers=2).read_records())
+
+
+class TestBgzfFileProcessor(unittest.TestCase):
+    def setUp(self):
+        self.content = "".join(f"http://example.com/{i} {(i * 37) % 101}\n" for i in range(300))
+        self.path = write_temp_file("")
+        self.addCleanup(os.remove, self.path)
+
+    def populate(self, member_size: int, chunk_size: int, top: int) -> tuple[HeapManager, BgzfFileProcessor]:
+        with open(self.path, 'wb') as f:
+            f.write(bgzf_compress(self.content.encode(), member_size))
+        heap = HeapManager(top)
+        with open(self.path, 'rb') as f, ThreadPoolExecutor(max_workers=2) as executor:
+            processor = BgzfFileProcessor(f, bgzf_members(f), top, chunk_size, workers=2, executor=executor)
+            processor.populate(heap)
+        return heap, processor
+
+    def test_every_line_is_read_once(self):
+        for member_size, chunk_size in ((7, 1), (13, 50), (100, 200), (1000, 0), (100000, 0)):
+            with self.subTest(member_size=member_size, chunk_size=chunk_size):
+                heap, processor = self.populate(member_size, chunk_size, top=1000)
+                self.assertEqual(processor.stats.lines, 300)
+                self.assertEqual(sorted(record.url for record in heap.get_top_records()),
+                                 sorted(line.rsplit(' ', 1)[0] for line in self.content.splitlines()))
+
+    def test_populate_matches_single_threaded(self):
+        heap, _ = self.populate(64, 128, top=5)
+        self.assertEqual([record.value for record in heap.get_top_records()], [100, 100, 100, 99, 99])
+
+    def test_line_longer_than_chunks(self):
+        self.content = "http://example.com/" + "x" * 500 + " 7\nhttp://example.org 3\n"
+        heap, processor = self.populate(16, 32, top=5)
+        self.assertEqual([record.value for record in heap.get_top_records()], [7, 3])
+        self.assertEqual(processor.stats.lines, 2)
+
+    def test_process_pool(self):
+        with open(self.path, 'wb') as f:
+            f.write(bgzf_compress(self.content.encode(), 256))
+        with ProcessorFactory.create_processor(self.path, engine='process', workers=2, top=3) as processor:
+            self.assertIsInstance(processor, BgzfFileProcessor)
+            self.assertEqual([record.value for record in processor.read_records()], [100, 100, 100])
+
+
+class TestStreamFileProcessor(unittest.TestCase):
+    content = ("http://example.com/" + "x" * 300 + " 5000\n" +
+               "".join(f"http://example.com/{i} {(i * 37) % 101}\n" for i in range(300)))
+
+    def populate(self, workers: int, top: int, content: str = content) -> tuple[HeapManager, StreamFileProcessor]:
+        processor = StreamFileProcessor(io.BytesIO(content.encode()), workers=workers, queue_depth=2)
+        processor.block_size = 64
+        heap = HeapManager(top)
+        processor.populate(heap)
+        return heap, processor
+
+    def test_populate(self):
+        for workers in (1, 2):
+            with self.subTest(workers=workers):
+                heap, processor = self.populate(workers, top=4)
+                self.assertEqual([record.value for record in heap.get_top_records()], [5000, 100, 100, 100])
+                self.assertEqual(processor.stats.lines, 301)
+                self.assertEqual(processor.stats.bytes_read, len(self.content))
+
+    def test_populate_without_trailing_newline(self):
+        heap, processor = self.populate(1, top=2, content="http://example.com 10\nhttp://example.org 20")
+        self.assertEqual(heap.get_top_records(), [Record(20, "http://example.org"), Record(10, "http://example.com")])
+
+    def test_read_records(self):
+        processor = StreamFileProcessor(io.BytesIO(self.content.encode()), workers=1)
+        processor.block_size = 100
+        self.assertEqual(len(list(processor.read_records())), 301)
+
+    def test_populate_error(self):
+        for workers in (1, 2):
+            with self.subTest(workers=workers), self.assertRaises(FileReadError):
+                self.populate(workers, top=2, content="http://example.com 10\n" * 20 + "http://example.org twenty\n")
+
+    def test_read_error(self):
+        file = io.BytesIO(self.content.encode())
+        file.close()
+        with self.assertRaises(FileReadError):
+            StreamFileProcessor(file, workers=1).populate(HeapManager(2))
+
+    def test_create_processor_for_pipe(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'pipe')
+        os.mkfifo(path)
+
+        def write():
+            with open(path, 'w') as pipe:
+                pipe.write(self.content)
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        with ProcessorFactory.create_processor(path, workers=1) as processor:
+            self.assertIsInstance(processor, StreamFileProcessor)
+            heap = HeapManager(1)
+            processor.populate(heap)
+        writer.join()
+        self.assertEqual([record.value for record in heap.get_top_records()], [5000])
+
+
+class RecordingExecutor(ThreadPoolExecutor):
+    def __init__(self):
+        super().__init__(max_workers=1)
+        self.submitted = []
+
+    def submit(self, fn, *args, **kwargs):
+        self.submitted.append(args)
+        return super().submit(fn, *args, **kwargs)
+
+
+class TestMultiFileProcessor(unittest.TestCase):
+    def setUp(self):
+        self.paths = []
+        for lines in (5, 200, 40):
+            path = write_temp_file("".join(f"http://example.com/{lines}/{i} {i}\n" for i in range(lines)))
+            self.addCleanup(os.remove, path)
+            self.paths.append(path)
+
+    def test_populate_largest_chunks_first(self):
+        heap = HeapManager(4)
+        with RecordingExecutor() as executor:
+            processor = MultiFileProcessor(self.paths, top=4, chunk_size=1024, workers=2, executor=executor)
+            processor.populate(heap)
+        self.assertEqual([record.url for record in heap.get_top_records()],
+                         [f"http://example.com/200/{i}" for i in (199, 198, 197, 196)])
+        self.assertEqual(processor.stats.lines, 245)
+        sizes = [end - start for _, start, end, *_ in executor.submitted]
+        self.assertEqual(sizes, sorted(sizes, reverse=True))
+        self.assertGreater(len(sizes), len(self.paths))  # The largest file is split into byte ranges
+
+    def test_populate_compressed_file(self):
+        path = write_temp_file("")
+        self.addCleanup(os.remove, path)
+        with open(path, 'wb') as f:
+            f.write(bz2.compress(b"http://example.org 1000\n"))
+        heap = HeapManager(2)
+        with RecordingExecutor() as executor:
+            MultiFileProcessor(self.paths + [path], top=2, workers=2, executor=executor).populate(heap)
+        self.assertEqual([record.value for record in heap.get_top_records()], [1000, 199])
+
+
+class TestExpandPaths(unittest.TestCase):
+    def test_expand_paths(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        os.mkdir(os.path.join(directory, 'sub'))
+        for name in ('a.log', 'b.txt', 'a.log.topn-index', os.path.join('sub', 'c.log')):
+            open(os.path.join(directory, name), 'w').close()
+        self.assertEqual(expand_paths([directory]), [os.path.join(directory, name)
+                                                     for name in ('a.log', 'b.txt', os.path.join('sub', 'c.log'))])
+        self.assertEqual(expand_paths([os.path.join(directory, '**', '*.log'), os.path.join(directory, 'a.log')]),
+                         [os.path.join(directory, 'a.log'), os.path.join(directory, 'sub', 'c.log')])
+        self.assertEqual(expand_paths(['missing.log']), ['missing.log'])
+        with self.assertRaises(FileReadError):
+            expand_paths([os.path.join(directory, '*.gz')])
+
+
+class TestLineFilter(unittest.TestCase):
+    content = "".join(f"http://example.{'com' if i % 2 else 'org'}/item/{i} {i}\n" for i in range(200)) + \
+        "http://example.com/item/odd\t150\n"  # Parsed by the fallback parser, filtered as a record
+
+    def setUp(self):
+        self.path = write_temp_file(self.content)
+        self.addCleanup(os.remove, self.path)
+        self.addCleanup(lambda: os.path.exists(self.path + '.topn-index') and os.remove(self.path + '.topn-index'))
+
+    def expected(self, line_filter, top=5):
+        records = [Record(int(value), url) for url, value in (line.split() for line in self.content.splitlines())]
+        return sorted((record for record in records if line_filter.record_test()(record)), reverse=True)[:top]
+
+    def test_engines(self):
+        line_filters = [
+            LineFilter(url_prefix="http://example.com/"),
+            LineFilter(url_contains="/item/1"),
+            LineFilter(url_regex=r"item/\d*7$"),
+            LineFilter(min_value=20, max_value=60),
+            LineFilter(url_prefix="http://example.org", url_contains="5", url_regex="[05]$", max_value=150),
+        ]
+        for line_filter in line_filters:
+            for engine in ('text', 'mmap', 'numpy', 'indexed', 'process', 'stream'):
+                with self.subTest(line_filter=line_filter, engine=engine):
+                    with ProcessorFactory.create_processor(self.path, engine=engine, workers=2, top=5,
+                                                           line_filter=line_filter) as processor:
+                        heap = HeapManager(5)
+                        processor.populate(heap)
+                        self.assertEqual(heap.get_top_records(), self.expected(line_filter))
+                        if engine not in ('process', 'stream'):
+                            self.assertGreater(processor.stats.filtered_lines, 0)
+
+    def test_regex_on_unicode_urls(self):
+        path = write_temp_file("http://x/café 10\nhttp://x/cafe 20\nhttp://x/caf/é 30\nhttp://x/naïve 40\n")
+        self.addCleanup(os.remove, path)
+        for pattern, values in (("caf.$", [20, 10]), (r"/\w+$", [40, 30, 20, 10])):
+            for engine in ('text', 'mmap', 'numpy', 'process', 'stream'):
+                with self.subTest(pattern=pattern, engine=engine):
+                    with ProcessorFactory.create_processor(path, engine=engine, workers=2,
+                                                           line_filter=LineFilter(url_regex=pattern)) as processor:
+                        heap = HeapManager(5)
+                        processor.populate(heap)
+                        self.assertEqual([record.value for record in heap.get_top_records()], values)
+
+    def test_read_records(self):
+        line_filter = LineFilter(url_contains=".org", min_value=190)
+        with open(self.path, 'rb') as file:
+            processor = ByteRangeFileProcessor(file, 0, os.path.getsize(self.path))
+            processor.line_filter = line_filter
+            self.assertEqual(sorted(processor.read_records(), reverse=True), self.expected(line_filter))
+            self.assertEqual(processor.stats.filtered_lines, 196)
+
+    def test_indexed_skips_blocks_below_min_value(self):
+        with open(self.path, 'rb') as file:
+            IndexedFileProcessor(file, block_size=512).populate(HeapManager(1))
+            processor = IndexedFileProcessor(file, block_size=512)
+            processor.line_filter = LineFilter(min_value=190)
+            heap = HeapManager(20)
+            processor.populate(heap)
+        self.assertEqual([record.value for record in heap.get_top_records()], list(range(199, 189, -1)))
+        self.assertGreater(processor.stats.blocks_skipped, 0)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            LineFilter(url_regex="(")
+        with self.assertRaises(ValueError):
+            LineFilter(min_value=10, max_value=5)
+        self.assertFalse(LineFilter())
+
 
 class TestProcessorFactory(unittest.TestCase):
+    @patch('src.file_processors.detect_compression', return_value=None)
     @patch('builtins.open', new_callable=mock_open, read_data="http://example.com 10\nhttp://example.org 20\n")
-    def test_create_processor_single_thread(self, mock_file):
+    def test_create_processor_single_thread(self, mock_file, mock_detect):
         processor = ProcessorFactory.create_processor('dummy', chunk_size=0)
         self.assertIsInstance(processor, FileProcessor)
 
+    @patch('src.file_processors.detect_compression', return_value=None)
     @patch('builtins.open', new_callable=mock_open, read_data="http://example.com 10\nhttp://example.org 20\n")
-    def test_create_processor_parallel(self, mock_file):
+    def test_create_processor_parallel(self, mock_file, mock_detect):
         processor = ProcessorFactory.create_processor('dummy', chunk_size=2)
         self.assertIsInstance(processor, ParallelFileProcessor)
+
+    def test_create_processor_process_engine(self):
+        path = write_temp_file("http://example.com 10\n")
+        self.addCleanup(os.remove, path)
+        with ProcessorFactory.create_processor(path, engine='process', workers=2) as processor:
+            self.assertIsInstance(processor, ProcessPoolFileProcessor)
+            self.assertEqual(processor.workers, 2)
+
+    def test_create_processor_numpy_engine(self):
+        path = write_temp_file("http://example.com 10\n")
+        self.addCleanup(os.remove, path)
+        with ProcessorFactory.create_processor(path, engine='numpy') as processor:
+            self.assertIsInstance(processor, NumpyBlockFileProcessor if numpy else MmapFileProcessor)
+
+    def test_create_processor_compressed(self):
+        content = b"http://example.com 10\nhttp://example.org 20\n"
+        for compress in (gzip.compress, bz2.compress):
+            path = write_temp_file("")
+            self.addCleanup(os.remove, path)
+            with open(path, 'wb') as f:
+                f.write(compress(content))
+            with ProcessorFactory.create_processor(path, engine='mmap') as processor:
+                self.assertIsInstance(processor, FileProcessor)
+                heap = HeapManager(1)
+                processor.populate(heap)
+                self.assertEqual(heap.get_top_records(), [Record(20, "http://example.org")])
+
+    def test_create_processor_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            ProcessorFactory.create_processor('dummy', engine='gpu')
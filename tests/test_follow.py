@@ -0,0 +1,95 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from src.follow import FileFollower
+from src.heap_manager import HeapManager
+from src.helpers import FileReadError
+from src.main import FileProcessorService
+
+
+class TestFileFollower(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'access.log')
+        self.write("http://example.com/1 10\nhttp://example.com/2 20\n", 'w')
+        self.follower = FileFollower(self.path, HeapManager(2))
+        self.addCleanup(self.follower.close)
+
+    def write(self, content: str, mode: str = 'a') -> None:
+        with open(self.path, mode) as file:
+            file.write(content)
+
+    def top_values(self) -> list[int]:
+        return [record.value for record in self.follower.heap_manager.get_top_records()]
+
+    def test_poll_reads_appended_lines(self):
+        self.assertEqual(self.follower.poll(), 48)
+        self.assertEqual(self.top_values(), [20, 10])
+        self.assertEqual(self.follower.poll(), 0)
+        self.write("http://example.com/3 30\n")
+        self.assertEqual(self.follower.poll(), 24)
+        self.assertEqual(self.top_values(), [30, 20])
+        self.assertEqual(self.follower.stats.lines, 3)
+
+    def test_poll_waits_for_complete_lines(self):
+        self.follower.poll()
+        self.write("http://example.com/3 3")
+        self.assertEqual(self.follower.poll(), 0)
+        self.write("00\n")
+        self.follower.poll()
+        self.assertEqual(self.top_values(), [300, 20])
+
+    def test_truncation(self):
+        self.follower.poll()
+        self.write("http://example.com/3 5\n", 'w')
+        self.follower.poll()
+        self.assertEqual(self.follower.offset, 23)
+        self.write("http://example.com/4 15\n")
+        self.follower.poll()
+        self.assertEqual(self.top_values(), [20, 15])
+
+    def test_rotation(self):
+        self.follower.poll()
+        os.rename(self.path, self.path + '.1')
+        with open(self.path + '.1', 'a') as file:
+            file.write("http://example.com/3 30\n")  # Written before the writer reopened the log
+        self.assertEqual(self.follower.poll(), 24)
+        self.write("http://example.com/4 40\n", 'w')
+        self.follower.poll()
+        self.assertEqual(self.top_values(), [40, 30])
+        self.assertEqual(self.follower.offset, 24)
+
+    def test_run(self):
+        emitted = []
+
+        def emit(records):
+            emitted.append([record.value for record in records])
+            self.write(f"http://example.com/{len(emitted)} {100 + len(emitted)}\n")
+
+        self.follower.run(emit, interval=0, refreshes=3)
+        self.assertEqual(emitted, [[20, 10], [101, 20], [102, 101]])
+
+    def test_poll_error(self):
+        follower = FileFollower(self.path + '.missing', HeapManager(2))
+        with self.assertRaises(FileReadError):
+            follower.poll()
+        self.write("http://example.com/3 thirty\n")
+        with self.assertRaises(FileReadError):
+            self.follower.poll()
+
+
+class TestFollowService(unittest.TestCase):
+    def test_follow_file(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.log', delete=False) as file:
+            file.write("http://example.com 10\nhttp://example.org 20\n")
+        self.addCleanup(os.remove, file.name)
+        emitted = []
+        stats = FileProcessorService(file.name, top=1, chunk_size=0).follow_file(emitted.append, 0, refreshes=2)
+        self.assertEqual([[record.url for record in records] for records in emitted],
+                         [["http://example.org"], ["http://example.org"]])
+        self.assertEqual(stats.lines, 2)
+        with self.assertRaises(FileReadError):
+            FileProcessorService([file.name, file.name + '.missing'], top=1, chunk_size=0).follow_file(print, 0, 1)
@@ -0,0 +1,88 @@
+import unittest
+
+from src.groups import GroupedHeapManager, GroupKey
+from src.models import GroupedRecord, Record
+
+from tests.helpers import parameterized_test
+
+
+class TestGroupKey(unittest.TestCase):
+    @parameterized_test(
+        ("host", "http://example.com/a/b?c=d", "example.com"),
+        ("host", "https://example.com", "example.com"),
+        ("host", "example.com/a", "example.com"),
+        ("host", "http://example.com?a/b", "example.com"),
+        ("path-prefix:0", "http://example.com/a/b", "example.com"),
+        ("path-prefix:1", "http://example.com/a/b", "example.com/a"),
+        ("path-prefix:2", "http://example.com/a/b/c", "example.com/a/b"),
+        ("path-prefix:3", "http://example.com/a/b#c/d", "example.com/a/b"),
+        ("regex:/item/(\\d+)", "http://example.com/item/42/x", "42"),
+        ("regex:\\.(org|net)", "http://example.net/a", "net"),
+        ("regex:item", "http://example.com/item/1", "item"),
+        ("regex:item", "http://example.com/user/1", None),
+    )
+    def test_key(self, spec, url, expected):
+        self.assertEqual(GroupKey(spec)(url), expected)
+
+    def test_invalid(self):
+        for spec in ("domain", "host:1", "path-prefix", "path-prefix:x", "regex:(", "regex:"):
+            with self.subTest(spec=spec), self.assertRaises(ValueError):
+                GroupKey(spec)
+
+
+class TestGroupedHeapManager(unittest.TestCase):
+    def records(self):
+        for value in range(10):
+            for host in ("a.com", "b.com", "c.com"):
+                yield Record(value, f"http://{host}/{value}")
+
+    def test_groups(self):
+        heap = GroupedHeapManager(2, GroupKey("host"))
+        for record in self.records():
+            heap.add_record(record)
+        self.assertEqual(heap.get_top_records(), [
+            GroupedRecord(9, "http://a.com/9", "a.com"), GroupedRecord(8, "http://a.com/8", "a.com"),
+            GroupedRecord(9, "http://b.com/9", "b.com"), GroupedRecord(8, "http://b.com/8", "b.com"),
+            GroupedRecord(9, "http://c.com/9", "c.com"), GroupedRecord(8, "http://c.com/8", "c.com"),
+        ])
+
+    def test_merge_and_cap(self):
+        heaps = [GroupedHeapManager(1, GroupKey("host"), max_groups=2) for _ in range(2)]
+        for index, record in enumerate(self.records()):
+            heaps[index % 2].add_record(record)
+        merged = heaps[0].empty_copy()
+        merged.merge(*heaps)
+        top_records = merged.get_top_records()
+        # The first two hosts in name order are kept, whatever the worker that saw them first
+        self.assertEqual([(record.group, record.value) for record in top_records],
+                         [("(other)", 9), ("a.com", 9), ("b.com", 9)])
+
+    def test_cap_does_not_depend_on_order(self):
+        records = list(self.records())
+        expected = None
+        for ordered in (records, records[::-1], sorted(records, key=lambda record: record.url[::-1])):
+            heap = GroupedHeapManager(2, GroupKey("host"), max_groups=2)
+            for record in ordered:
+                heap.add_record(record)
+            if expected is None:
+                expected = heap.get_top_records()
+            self.assertEqual(heap.get_top_records(), expected)
+        self.assertEqual({record.group for record in expected}, {"a.com", "b.com", "(other)"})
+
+    def test_merge_counters(self):
+        heap = GroupedHeapManager(1, GroupKey("host"))
+        other = heap.empty_copy()
+        other.replacements, other.rejected, other.rejected_early = 1, 2, 3
+        heap.merge(other)
+        self.assertEqual((heap.replacements, heap.rejected, heap.rejected_early), (1, 2, 3))
+
+    def test_unmatched(self):
+        heap = GroupedHeapManager(1, GroupKey("regex:/(\\d)$"))
+        heap.add_record(Record(5, "http://a.com/x"))
+        heap.add_record(Record(3, "http://a.com/3"))
+        self.assertEqual(heap.get_top_records(), [GroupedRecord(3, "http://a.com/3", "3")])
+        self.assertEqual(heap.rejected, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
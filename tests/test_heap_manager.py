@@ -24,3 +24,59 @@ class TestHeapManager(unittest.TestCase):
         self.assertEqual(top_records[0].value, 20)
         self.assertEqual(top_records[1].value, 10)
 
+    def test_merge(self):
+        heap = HeapManager(3)
+        other = HeapManager(3)
+        for value in (10, 40, 20):
+            heap.add_record(Record(value, f"http://example.com/{value}"))
+        for value in (30, 50, 5):
+            other.add_record(Record(value, f"http://example.org/{value}"))
+        heap.merge(other, HeapManager(3))
+        self.assertEqual([record.value for record in heap.get_top_records()], [50, 40, 30])
+        heap.add_record(Record(35, "http://example.net"))
+        self.assertEqual([record.value for record in heap.get_top_records()], [50, 40, 35])
+
+    def test_empty_copy(self):
+        heap = HeapManager(2)
+        heap.add_record(Record(10, "http://example.com"))
+        copy = heap.empty_copy()
+        self.assertEqual(copy.n, 2)
+        self.assertEqual(copy.get_top_records(), [])
+
+    def test_threshold(self):
+        heap = HeapManager(2)
+        self.assertEqual(heap.threshold, float('-inf'))
+        heap.add_record(Record(10, "http://example.com"))
+        self.assertEqual(heap.threshold, float('-inf'))
+        heap.add_record(Record(20, "http://example.org"))
+        self.assertEqual(heap.threshold, 10)
+        heap.add_record(Record(30, "http://example.net"))
+        self.assertEqual(heap.threshold, 20)
+        heap.add_record(Record(5, "http://example.info"))
+        self.assertEqual(heap.threshold, 20)
+        self.assertEqual(heap.replacements, 1)
+        self.assertEqual(heap.rejected, 1)
+
+    def test_threshold_empty_heap(self):
+        heap = HeapManager(0)
+        self.assertEqual(heap.threshold, float('inf'))
+        heap.add_record(Record(10, "http://example.com"))
+        self.assertEqual(heap.get_top_records(), [])
+
+    def test_merge_threshold_and_counters(self):
+        heap = HeapManager(2)
+        other = HeapManager(2)
+        for value in (10, 20, 30):
+            other.add_record(Record(value, f"http://example.com/{value}"))
+        other.rejected_early = 4
+        heap.merge(other)
+        self.assertEqual(heap.threshold, 20)
+        self.assertEqual(heap.replacements, 1)
+        self.assertEqual(heap.rejected_early, 4)
+
+    def test_ties_are_broken_by_url(self):
+        heap = HeapManager(2)
+        for url in ("http://example.org", "http://example.com", "http://example.net"):
+            heap.add_record(Record(10, url))
+        self.assertEqual([record.url for record in heap.get_top_records()],
+                         ["http://example.org", "http://example.net"])
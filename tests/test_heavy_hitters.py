@@ -0,0 +1,101 @@
+import random
+import unittest
+from collections import Counter
+
+from src.heavy_hitters import CountMinSketch, SpaceSaving
+from src.models import Estimate, Record
+
+
+def skewed_records(seed, count=20000):
+    generator = random.Random(seed)
+    for _ in range(count):
+        if generator.random() < 0.3:
+            url = f"http://example.com/hot/{generator.randrange(5)}"
+        else:
+            url = f"http://example.com/cold/{generator.randrange(5000)}"
+        yield Record(generator.randrange(1, 100), url)
+
+
+class TestSpaceSaving(unittest.TestCase):
+    def assert_bounded(self, estimates, totals):
+        for estimate in estimates:
+            self.assertLessEqual(estimate.value - estimate.error, totals[estimate.url])
+            self.assertGreaterEqual(estimate.value, totals[estimate.url])
+
+    def test_heavy_hitters(self):
+        for aggregate in ('sum', 'count'):
+            for sketch in (False, True):
+                with self.subTest(aggregate=aggregate, sketch=sketch):
+                    summary = SpaceSaving(5, aggregate, error=0.01, sketch=sketch)
+                    totals = Counter()
+                    for record in skewed_records(1):
+                        summary.add_record(record)
+                        totals[record.url] += 1 if aggregate == 'count' else record.value
+                    estimates = summary.get_top_records()
+                    self.assertTrue(all(isinstance(estimate, Estimate) for estimate in estimates))
+                    self.assertEqual({estimate.url for estimate in estimates},
+                                     {url for url, _ in totals.most_common(5)})
+                    self.assert_bounded(estimates, totals)
+                    self.assertLessEqual(max(estimate.error for estimate in estimates), 0.01 * summary.total)
+                    self.assertEqual(len(summary.counts), 100)
+
+    def test_sketch_tightens(self):
+        plain = SpaceSaving(5, 'count', error=0.01)
+        sketched = SpaceSaving(5, 'count', error=0.01, sketch=True)
+        for record in skewed_records(2):
+            plain.add_record(record)
+            sketched.add_record(record)
+        for estimate, tighter in zip(plain.get_top_records(), sketched.get_top_records()):
+            self.assertLessEqual(tighter.error, estimate.error)
+
+    def test_merge(self):
+        totals = Counter()
+        summaries = [SpaceSaving(5, error=0.01, sketch=True) for _ in range(3)]
+        for seed, summary in enumerate(summaries):
+            for record in skewed_records(seed):
+                summary.add_record(record)
+                totals[record.url] += record.value
+        merged = summaries[0].empty_copy()
+        merged.merge(*summaries)
+        estimates = merged.get_top_records()
+        self.assertEqual({estimate.url for estimate in estimates}, {url for url, _ in totals.most_common(5)})
+        self.assert_bounded(estimates, totals)
+        self.assertEqual(merged.total, sum(totals.values()))
+        self.assertEqual(len(merged.counts), 100)
+        # A merged summary keeps adding and evicting within its bounds
+        for record in skewed_records(3):
+            merged.add_record(record)
+            totals[record.url] += record.value
+        self.assert_bounded(merged.get_top_records(), totals)
+
+    def test_exact_below_capacity(self):
+        summary = SpaceSaving(2, error=0.1)
+        for value, url in ((10, "a"), (5, "b"), (7, "a"), (1, "c"), (-3, "c")):
+            summary.add_record(Record(value, url))
+        self.assertEqual(summary.get_top_records(), [Estimate(17, "a", 0), Estimate(5, "b", 0)])
+        self.assertEqual(summary.rejected, 1)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            SpaceSaving(2, 'max')
+        with self.assertRaises(ValueError):
+            SpaceSaving(2, error=0)
+
+
+class TestCountMinSketch(unittest.TestCase):
+    def test_estimate(self):
+        sketch = CountMinSketch.for_error(0.01)
+        self.assertEqual((sketch.width, sketch.depth), (272, 5))
+        other = CountMinSketch.for_error(0.01)
+        sketch.add(b"a", 3)
+        other.add(b"a", 4)
+        other.add(b"b", 1)
+        sketch.merge(other)
+        self.assertEqual(sketch.estimate(b"a"), 7)
+        self.assertGreaterEqual(sketch.estimate(b"b"), 1)
+        with self.assertRaises(ValueError):
+            sketch.merge(CountMinSketch(10, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,18 @@
+import gzip
+import io
+import os
+import shutil
+import tempfile
 import unittest
 from unittest.mock import mock_open, patch
 
 from src.helpers import FileReadError
-from src.models import Record
+from src.models import Estimate, GroupedRecord, Record
 from src.file_processors import FileProcessor, ParallelFileProcessor
 from src.main import FileProcessorService
+from src.batch import BatchQuery
+from src.filters import LineFilter
+from src.result_cache import ResultCache
 
 from tests.helpers import parameterized_test
 
@@ -30,9 +38,9 @@ class TestFileProcessorService(unittest.TestCase):
         ("http://example.com 10\nhttp://example.org 20\nhttp://example.net 30\nhttp://example.info 40\n", 3, 0,
          [Record(40, "http://example.info"), Record(30, "http://example.net"), Record(20, "http://example.org")]),  # Four records
         ("http://example.com 10\nhttp://example.org 10\nhttp://example.net 10\nhttp://example.info 10\nhttp://example.edu 10\n", 3,
-         0, [Record(10, "http://example.com"), Record(10, "http://example.org"), Record(10, "http://example.net")]),  # Same values -- The behavior is strange here (compared to tuples)
+         0, [Record(10, "http://example.org"), Record(10, "http://example.net"), Record(10, "http://example.info")]),  # Same values -- Ties are broken by URL
         ("http://example.com 10\nhttp://example.org 10\nhttp://example.net 20\nhttp://example.info 20\nhttp://example.edu 30\nhttp://example.gov 30\n", 4, 0,
-         [Record(value=30, url='http://example.gov'), Record(value=30, url='http://example.edu'), Record(value=20, url='http://example.net'), Record(value=20, url='http://example.info')]),  # Mixed values -- The behavior is strange here as well
+         [Record(value=30, url='http://example.gov'), Record(value=30, url='http://example.edu'), Record(value=20, url='http://example.net'), Record(value=20, url='http://example.info')]),  # Mixed values -- Ties are broken by URL
     )
     @patch('src.file_processors.ProcessorFactory.create_processor')
     def test_process_file_single_thread(self, mock_file_content, top, chunk_size, expected, mock_create_processor):
@@ -87,3 +95,195 @@ class TestFileProcessorService(unittest.TestCase):
                 for record, expected_record in zip(top_records, expected):
                     self.assertEqual(record.url, expected_record.url)
                     self.assertEqual(record.value, expected_record.value)
+
+    def test_process_file_process_engine(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as file:
+            file.write("".join(f"http://example.com/{i} {i}\n" for i in range(50)))
+        self.addCleanup(os.remove, file.name)
+
+        service = FileProcessorService(file.name, top=3, chunk_size=64, engine='process', workers=2)
+        top_records = service.process_file()
+        self.assertEqual([record.url for record in top_records],
+                         ["http://example.com/49", "http://example.com/48", "http://example.com/47"])
+
+    def test_process_file_with_stats(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as file:
+            file.write("".join(f"http://example.com/{i} {i}\n" for i in range(50)))
+        self.addCleanup(os.remove, file.name)
+
+        for engine, chunk_size in (('text', 0), ('text', 8), ('mmap', 0), ('process', 256)):
+            with self.subTest(engine=engine, chunk_size=chunk_size):
+                service = FileProcessorService(file.name, top=3, chunk_size=chunk_size, engine=engine, workers=2)
+                top_records, stats = service.process_file_with_stats()
+                self.assertEqual([record.value for record in top_records], [49, 48, 47])
+                self.assertEqual(stats.lines, 50)
+                self.assertGreater(stats.total_s, 0)
+                if engine != 'text' or chunk_size == 0:
+                    self.assertEqual(stats.bytes_read, os.path.getsize(file.name))
+                if chunk_size:
+                    self.assertGreater(len(stats.chunks), 1)
+
+    def test_process_file_skip_malformed(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as file:
+            file.write("http://example.com 10\nhttp://example.org twenty\n\nhttp://example.net 30\n")
+        self.addCleanup(os.remove, file.name)
+
+        for engine in ('text', 'mmap', 'process'):
+            with self.subTest(engine=engine):
+                service = FileProcessorService(file.name, top=3, chunk_size=0, engine=engine, skip_malformed=True)
+                top_records, stats = service.process_file_with_stats()
+                self.assertEqual([record.value for record in top_records], [30, 10])
+                self.assertEqual(stats.malformed_lines, 2)
+                with self.assertRaises(FileReadError):
+                    FileProcessorService(file.name, top=3, chunk_size=0, engine=engine).process_file()
+
+    def test_process_many_files(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        os.mkdir(os.path.join(directory, 'day'))
+        for hour in range(6):
+            with open(os.path.join(directory, 'day', f"{hour:02d}.log"), 'w') as file:
+                file.write("".join(f"http://example.com/{hour}/{i} {hour * 100 + i}\n" for i in range(hour * 10)))
+        with gzip.open(os.path.join(directory, 'day', 'archive.log.gz'), 'wt') as file:
+            file.write("http://example.org/archived 10000\n")
+
+        for paths in ([directory], [os.path.join(directory, '*', '*.log*')],
+                      [os.path.join(directory, 'day', '05.log'), os.path.join(directory, 'day', '04.log'),
+                       os.path.join(directory, 'day', 'archive.log.gz')]):
+            with self.subTest(paths=paths):
+                service = FileProcessorService(paths, top=3, chunk_size=0, workers=2)
+                top_records, stats = service.process_file_with_stats()
+                self.assertEqual([record.value for record in top_records], [10000, 549, 548])
+                self.assertGreaterEqual(len({chunk.path for chunk in stats.chunks}), 3)
+
+    def test_process_many_files_errors(self):
+        with self.assertRaises(FileReadError):
+            FileProcessorService([os.path.join(tempfile.gettempdir(), 'no-such-dir-*', '*.log')], top=3,
+                                 chunk_size=0).process_file()
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as file:
+            file.write("http://example.com 10\n")
+        self.addCleanup(os.remove, file.name)
+        with self.assertRaises(FileReadError):
+            FileProcessorService([file.name, file.name + '.missing'], top=3, chunk_size=0).process_file()
+
+    def test_process_aggregate(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'access.log')
+            with open(path, 'w') as file:
+                file.write("http://example.com 10\nhttp://example.org 25\nhttp://example.com 20\n" * 50)
+            for engine in ('text', 'process', 'indexed'):
+                with self.subTest(engine=engine):
+                    service = FileProcessorService(path, top=2, chunk_size=0, engine=engine, workers=2,
+                                                   aggregate='sum', memory_budget=100, spill_dir=directory)
+                    self.assertEqual(service.process_file(), [Record(1500, "http://example.com"),
+                                                              Record(1250, "http://example.org")])
+            self.assertEqual(os.listdir(directory), ['access.log'])
+
+    def test_process_approximate(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'access.log')
+            with open(path, 'w') as file:
+                file.write("http://example.com 10\nhttp://example.org 25\nhttp://example.com 20\n" * 50)
+            service = FileProcessorService(path, top=1, chunk_size=0, engine='process', workers=2,
+                                           approximate=0.1, sketch=True)
+            self.assertEqual(service.process_file(), [Estimate(1500, "http://example.com", 0)])
+
+    def test_process_grouped(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'access.log')
+            with open(path, 'w') as file:
+                file.write("http://a.com/1 10\nhttp://b.com/1 25\nhttp://a.com/2 20\nhttp://b.com/2 5\n" * 50)
+            for engine in ('mmap', 'process', 'numpy'):
+                with self.subTest(engine=engine):
+                    service = FileProcessorService(path, top=1, chunk_size=0, engine=engine, workers=2,
+                                                   group_by='host')
+                    self.assertEqual(service.process_file(), [GroupedRecord(20, "http://a.com/2", "a.com"),
+                                                              GroupedRecord(25, "http://b.com/1", "b.com")])
+
+    def test_process_grouped_with_cap(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'access.log')
+            with open(path, 'w') as file:
+                # The chunks of the process engine see the hosts in different orders
+                file.writelines(f"http://h{(i // 40 + i) % 7}.com/{i} {i * 37 % 101}\n" for i in range(400))
+            expected = FileProcessorService(path, top=2, chunk_size=0, engine='text', group_by='host',
+                                            max_groups=3).process_file()
+            self.assertEqual([record.group for record in expected][::2], ["(other)", "h0.com", "h1.com", "h2.com"])
+            service = FileProcessorService(path, top=2, chunk_size=256, engine='process', workers=2,
+                                           group_by='host', max_groups=3)
+            self.assertEqual(service.process_file(), expected)
+
+    def test_process_large_top(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'access.log')
+            with open(path, 'w') as file:
+                file.writelines(f"http://example.com/{i} {i % 1000}\n" for i in range(30000))
+            expected = FileProcessorService(path, top=15000, chunk_size=0, engine='mmap').process_file()
+            self.assertEqual(len(expected), 15000)
+            self.assertEqual(expected[0], Record(999, "http://example.com/9999"))
+            service = FileProcessorService(path, top=15000, chunk_size=0, engine='process', workers=2,
+                                           memory_budget=200 * 4000, spill_dir=directory)
+            heap_manager, _ = service.scan()
+            try:
+                self.assertTrue(heap_manager.runs)
+                self.assertEqual(list(heap_manager.iter_top_records()), expected)
+            finally:
+                heap_manager.close()
+            self.assertEqual(os.listdir(directory), ['access.log'])
+
+    def test_process_batch(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'access.log')
+            with open(path, 'w') as file:
+                file.writelines(f"http://example.com/{i % 13}/{i} {(i * 37) % 101}\n" for i in range(2000))
+            queries = [BatchQuery(5), BatchQuery(3, LineFilter(url_prefix="http://example.com/1", max_value=50)),
+                       BatchQuery(4, LineFilter(min_value=90, url_contains="/7/"))]
+            expected = [FileProcessorService(path, query.top, 0, engine='mmap', line_filter=query.line_filter)
+                        .process_file() for query in queries]
+            for engine in ('text', 'mmap', 'numpy', 'process'):
+                with self.subTest(engine=engine):
+                    service = FileProcessorService(path, 10, 256, engine=engine, workers=2, queries=queries)
+                    results, stats = service.process_batch()
+                    self.assertEqual(results, expected)
+                    self.assertEqual(stats.lines, 2000)
+            with self.assertRaises(ValueError):
+                FileProcessorService(path, 10, 0, queries=queries, line_filter=LineFilter(min_value=1))
+
+    def test_process_cached(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'access.log')
+            with open(path, 'w') as file:
+                file.writelines(f"http://example.com/{i} {(i * 37) % 101}\n" for i in range(500))
+            cache = ResultCache(os.path.join(directory, 'cache'))
+            expected, stats = FileProcessorService(path, 5, 0, engine='mmap', cache=cache).process_file_with_stats()
+            self.assertEqual((stats.cache_hits, stats.cache_misses, stats.lines), (0, 1, 500))
+            with patch.object(FileProcessorService, 'scan', side_effect=AssertionError("scanned")):
+                top_records, stats = FileProcessorService(path, 3, 0, engine='process', cache=cache) \
+                    .process_file_with_stats()
+            self.assertEqual(top_records, expected[:3])
+            self.assertEqual((stats.cache_hits, stats.lines), (1, 0))
+            # A filtered query is another entry
+            filtered = FileProcessorService(path, 3, 0, line_filter=LineFilter(max_value=50), cache=cache)
+            self.assertEqual(filtered.process_file(), FileProcessorService(path, 3, 0, line_filter=LineFilter(
+                max_value=50)).process_file())
+            self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+    def test_cache_skip_malformed(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'access.log')
+            with open(path, 'w') as file:
+                file.write("http://example.com/1 10\nmalformed\nhttp://example.com/2 20\n")
+            cache = ResultCache(os.path.join(directory, 'cache'))
+            skipped = FileProcessorService(path, 2, 0, skip_malformed=True, cache=cache).process_file()
+            self.assertEqual([record.value for record in skipped], [20, 10])
+            # A query failing on the malformed line is not answered from the entry of the skipping one
+            with self.assertRaises(FileReadError):
+                FileProcessorService(path, 2, 0, cache=cache).process_file()
+
+    def test_process_stdin(self):
+        stdin = io.TextIOWrapper(io.BytesIO(b"http://example.com 10\nhttp://example.org 20\nhttp://example.net 5\n"))
+        with patch('sys.stdin', stdin):
+            top_records = FileProcessorService('-', top=2, chunk_size=0, workers=1).process_file()
+        self.assertEqual([record.value for record in top_records], [20, 10])
+        with self.assertRaises(FileReadError):
+            FileProcessorService(['-', 'other.log'], top=2, chunk_size=0).process_file()
@@ -11,3 +11,15 @@ class TestRecord(unittest.TestCase):
         self.assertTrue(r2 > r1)
         self.assertTrue(r2 >= r1)
         self.assertTrue(r1 != r2)
+
+    def test_ties_are_broken_by_url(self):
+        r1 = Record(10, "http://example.com")
+        r2 = Record(10, "http://example.org")
+        self.assertTrue(r1 < r2)
+        self.assertEqual(sorted([r2, r1]), [r1, r2])
+        self.assertEqual(r1, Record(value=10, url="http://example.com"))
+
+    def test_attributes(self):
+        record = Record(10, "http://example.com")
+        self.assertEqual(record.value, 10)
+        self.assertEqual(record.url, "http://example.com")
@@ -0,0 +1,139 @@
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from src.convert import convert
+from src.file_processors import (ColumnarFileProcessor, FileProcessor, MmapFileProcessor, ProcessPoolFileProcessor,
+                                 ProcessorFactory, STDIN_PATH)
+from src.helpers import cgroup_cpu_limit
+from src.heap_manager import HeapManager
+from src.planner import MB, MIN_CHUNK_BYTES, ScanPlan, plan_scan
+from src.selection import HEAP_MAX_N, BatchSelector
+
+
+class TestPlanScan(unittest.TestCase):
+    def test_small_file_stays_in_process(self):
+        plan = plan_scan(MB, cpus=8, top=10, serial_engine='numpy', serial_rate=100 * MB, worker_rate=50 * MB)
+        self.assertEqual(plan[:3], ('numpy', 1, 0))
+
+    def test_large_file_is_split(self):
+        plan = plan_scan(4096 * MB, cpus=8, top=10, serial_engine='mmap', serial_rate=50 * MB, worker_rate=50 * MB)
+        self.assertEqual((plan.engine, plan.workers), ('process', 8))
+        self.assertEqual(plan.chunk_size, 128 * MB)
+        self.assertIn("8 workers, 128 MB chunks", plan.describe())
+
+    def test_single_cpu_and_single_worker(self):
+        for cpus, workers in ((1, None), (8, 1)):
+            with self.subTest(cpus=cpus, workers=workers):
+                plan = plan_scan(4096 * MB, cpus, 10, 'mmap', 50 * MB, 50 * MB, workers=workers)
+                self.assertEqual(plan.engine, 'mmap')
+
+    def test_large_top_stays_in_process(self):
+        args = (256 * MB, 4, 10, 'numpy', 100 * MB, 50 * MB)
+        self.assertEqual(plan_scan(*args).engine, 'process')
+        self.assertEqual(plan_scan(*args[:2], 1_000_000, *args[3:]).engine, 'numpy')
+
+    def test_chunk_size_and_workers_asked_for(self):
+        plan = plan_scan(64 * MB, 8, 10, 'mmap', 10 * MB, 10 * MB, workers=2, chunk_size=MIN_CHUNK_BYTES)
+        self.assertEqual(plan[:3], ('process', 2, MIN_CHUNK_BYTES))
+        # There are no more workers than chunks
+        self.assertEqual(plan_scan(8 * MB, 8, 10, 'mmap', MB, MB).workers, 2)
+
+
+class TestCgroupCpuLimit(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+
+    def write(self, name: str, content: str) -> None:
+        os.makedirs(os.path.dirname(os.path.join(self.root, name)), exist_ok=True)
+        with open(os.path.join(self.root, name), 'w') as file:
+            file.write(content)
+
+    def test_no_cgroup(self):
+        self.assertIsNone(cgroup_cpu_limit(self.root))
+
+    def test_cgroup_v2(self):
+        self.write('cpu.max', "150000 100000\n")
+        self.assertEqual(cgroup_cpu_limit(self.root), 1.5)
+        self.write('cpu.max', "max 100000\n")
+        self.assertIsNone(cgroup_cpu_limit(self.root))
+
+    def test_cgroup_v1(self):
+        self.write('cpu,cpuacct/cpu.cfs_quota_us', "200000\n")
+        self.write('cpu,cpuacct/cpu.cfs_period_us', "100000\n")
+        self.assertEqual(cgroup_cpu_limit(self.root), 2)
+        self.write('cpu,cpuacct/cpu.cfs_quota_us', "-1\n")
+        self.assertIsNone(cgroup_cpu_limit(self.root))
+
+
+class TestAutoEngine(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, 'access.log')
+        with open(self.path, 'w') as file:
+            file.writelines(f"http://example.com/{i} {i * 37 % 1000}\n" for i in range(2000))
+
+    def test_plans(self):
+        compressed_path = self.path + '.gz'
+        with open(self.path, 'rb') as source, gzip.open(compressed_path, 'wb') as target:
+            shutil.copyfileobj(source, target)
+        columnar_path = os.path.join(self.directory, 'access.col')
+        convert([self.path], columnar_path)
+        with patch('src.file_processors.available_cpus', return_value=4):
+            self.assertEqual(ProcessorFactory.plan(STDIN_PATH).engine, 'stream')
+            self.assertEqual(ProcessorFactory.plan(compressed_path)[:2], ('text', 1))
+            self.assertEqual(ProcessorFactory.plan(columnar_path).engine, 'mmap')
+            self.assertEqual(ProcessorFactory.plan(self.path).workers, 1)
+        for path, processor_type in ((compressed_path, FileProcessor), (columnar_path, ColumnarFileProcessor)):
+            with self.subTest(path=path):
+                with ProcessorFactory.create_processor(path, engine='auto') as processor:
+                    self.assertIsInstance(processor, processor_type)
+
+    @patch('src.file_processors.np', None)  # Both speeds are then measured on the mmap engine
+    @patch('src.planner.CHUNKS_PER_WORKER', 1)
+    @patch('src.planner.MIN_CHUNK_BYTES', 1024)
+    @patch('src.file_processors.CALIBRATION_BYTES', 4096)
+    @patch('src.file_processors.CALIBRATION_MIN_SIZE', 8192)
+    @patch('src.planner.WORKER_START_S', 0)
+    @patch('src.planner.MERGE_RECORD_S', 0)
+    def test_calibrated_plan_matches_single_process(self):
+        with patch('src.file_processors.available_cpus', return_value=2):
+            plan = ProcessorFactory.plan(self.path, top=3)
+            self.assertEqual(plan.workers, 2)
+            processor = ProcessorFactory.create_processor(self.path, engine='auto', top=3)
+        self.assertIsInstance(processor, ProcessPoolFileProcessor)
+        expected = HeapManager(3)
+        with MmapFileProcessor(open(self.path, 'rb')) as serial:
+            serial.populate(expected)
+        heap_manager = HeapManager(3)
+        with processor:
+            processor.populate(heap_manager)
+        self.assertEqual(heap_manager.get_top_records(), expected.get_top_records())
+
+    @patch('src.file_processors.CALIBRATION_BYTES', 4096)
+    @patch('src.file_processors.CALIBRATION_MIN_SIZE', 8192)
+    def test_calibration_uses_the_selected_sink(self):
+        sinks = []
+
+        def selector(n):
+            sinks.append(BatchSelector(n))
+            return sinks[-1]
+
+        with patch('src.file_processors.available_cpus', return_value=2), \
+                patch('src.file_processors.selector_for', side_effect=selector), \
+                patch.object(BatchSelector, 'close', autospec=True) as close:
+            ProcessorFactory.plan(self.path, top=HEAP_MAX_N + 1)
+        self.assertTrue(sinks)
+        self.assertEqual(close.call_count, len(sinks))
+
+    def test_scan_plan_description(self):
+        self.assertEqual(ScanPlan('mmap', 1, 0, "small file").describe(), "mmap engine, single process: small file")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+
+from src.models import GroupedRecord, Record
+from src.result_cache import ENTRY_SUFFIX, ResultCache, first_records
+
+
+def put_and_get(directory: str, key: str, index: int) -> list[Record]:
+    cache = ResultCache(directory)
+    records = [Record(value, f"http://example.com/{index}/{value}") for value in range(100, 0, -1)]
+    cache.put(key, 100, records)
+    return cache.get(key, 10)
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, 'access.log')
+        with open(self.path, 'w') as file:
+            file.write("http://example.com 10\n")
+        self.cache = ResultCache(os.path.join(self.directory, 'cache'))
+        self.records = [Record(30, "c"), Record(20, "b"), Record(10, "a")]
+
+    def test_larger_top_answers_smaller(self):
+        key = self.cache.key([self.path], {'aggregate': None})
+        self.assertIsNone(self.cache.get(key, 3))
+        self.cache.put(key, 3, self.records)
+        self.assertEqual(self.cache.get(key, 2), self.records[:2])
+        self.assertEqual(self.cache.get(key, 3), self.records)
+        self.assertIsNone(self.cache.get(key, 4))
+        self.assertEqual((self.cache.hits, self.cache.misses), (2, 2))
+        # Another process sees the entry on disk
+        self.assertEqual(ResultCache(self.cache.directory).get(key, 1), self.records[:1])
+
+    def test_key_changes_with_file_and_query(self):
+        key = self.cache.key([self.path], {'aggregate': None})
+        self.assertEqual(self.cache.key([self.path], {'aggregate': None}), key)
+        self.assertNotEqual(self.cache.key([self.path], {'aggregate': 'sum'}), key)
+        with open(self.path, 'a') as file:
+            file.write("http://example.org 20\n")
+        self.assertNotEqual(self.cache.key([self.path], {'aggregate': None}), key)
+        self.assertIsNone(self.cache.key([self.path + '.missing'], {}))
+        self.assertIsNone(self.cache.key([self.directory], {}))
+
+    def test_grouped_records(self):
+        records = [GroupedRecord(9, "a/1", "a"), GroupedRecord(8, "a/2", "a"), GroupedRecord(7, "b/1", "b")]
+        self.assertEqual(first_records(records, 1), [records[0], records[2]])
+        key = self.cache.key([self.path], {'group_by': 'host'})
+        self.cache.put(key, 2, records)
+        self.assertEqual(ResultCache(self.cache.directory).get(key, 1), [records[0], records[2]])
+
+    def test_least_recently_used_are_evicted(self):
+        cache = ResultCache(self.cache.directory, max_bytes=250)
+        cache.put('first', 3, self.records)
+        cache.put('second', 3, self.records)
+        os.utime(os.path.join(cache.directory, 'first' + ENTRY_SUFFIX), ns=(0, 0))
+        cache.put('third', 3, self.records)
+        self.assertEqual(sorted(os.listdir(cache.directory)), ['second' + ENTRY_SUFFIX, 'third' + ENTRY_SUFFIX])
+        cache.put('huge', 100, [Record(1, "x" * 300)])
+        self.assertIsNone(cache.get('huge', 1))
+
+    def test_memory_entries(self):
+        cache = ResultCache(self.cache.directory, memory_entries=1)
+        cache.put('first', 3, self.records)
+        shutil.rmtree(cache.directory)
+        self.assertEqual(cache.get('first', 3), self.records)
+        cache.put('second', 3, self.records)
+        self.assertIsNone(cache.get('first', 3))
+
+    def test_unreadable_entry_is_a_miss(self):
+        with open(os.path.join(self.cache.directory, 'broken' + ENTRY_SUFFIX), 'w') as file:
+            file.write('{"version": 1, "top"')
+        self.assertIsNone(self.cache.get('broken', 1))
+
+    def test_concurrent_processes(self):
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            results = list(executor.map(put_and_get, [self.cache.directory] * 4, ['shared'] * 4, range(4)))
+        self.assertTrue(all(len(records) == 10 for records in results))
+        self.assertEqual(len(self.cache.get('shared', 100)), 100)
+        self.assertEqual([name for name in os.listdir(self.cache.directory) if not name.endswith(ENTRY_SUFFIX)], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import os
+import random
+import unittest
+from unittest.mock import patch
+
+from src.heap_manager import HeapManager
+from src.models import Record
+from src import selection
+from src.selection import HEAP_MAX_N, BatchSelector, ExternalSelector, selector_for
+
+
+def random_records(seed, count=5000):
+    generator = random.Random(seed)
+    # Few distinct values, so many records are tied at the cut
+    return [Record(generator.randrange(100), f"http://example.com/{generator.randrange(10 ** 6)}")
+            for _ in range(count)]
+
+
+def expected_top(records, n):
+    heap = HeapManager(n)
+    for record in records:
+        heap.add_record(record)
+    return heap.get_top_records()
+
+
+class TestSelectorFor(unittest.TestCase):
+    def test_strategies(self):
+        self.assertIs(type(selector_for(HEAP_MAX_N)), HeapManager)
+        self.assertIsInstance(selector_for(HEAP_MAX_N + 1), BatchSelector)
+        selector = selector_for(10 ** 8, memory_budget=1024 ** 2)
+        self.assertIsInstance(selector, ExternalSelector)
+        self.assertEqual(selector.run_records, 1024 ** 2 // 200)
+
+
+class TestBatchSelector(unittest.TestCase):
+    def test_matches_heap(self):
+        records = random_records(1)
+        for partition in (True, False):
+            for n in (0, 1, 700, 5000, 6000):
+                with self.subTest(partition=partition, n=n):
+                    with patch.object(selection, 'np', selection.np if partition else None):
+                        selector = BatchSelector(n, batch=100)
+                        for record in records:
+                            selector.add_record(record)
+                        self.assertEqual(selector.get_top_records(), expected_top(records, n))
+                        if 0 < n < len(records):
+                            self.assertEqual(selector.threshold, selector.get_top_records()[-1].value)
+
+    def test_merge(self):
+        records = random_records(2)
+        selectors = [BatchSelector(300) for _ in range(3)]
+        for index, record in enumerate(records):
+            selectors[index % 3].add_record(record)
+        merged = selectors[0].empty_copy()
+        merged.merge(*selectors)
+        self.assertEqual(merged.get_top_records(), expected_top(records, 300))
+
+
+class TestExternalSelector(unittest.TestCase):
+    def test_matches_heap(self):
+        records = random_records(3)
+        selector = ExternalSelector(2000, run_records=1500)
+        try:
+            for record in records:
+                selector.add_record(record)
+            self.assertEqual(len(selector.runs), 3)
+            directory = selector.directories[0]
+            self.assertEqual(list(selector.iter_top_records()), expected_top(records, 2000))
+            self.assertEqual(selector.get_top_records(), expected_top(records, 2000))
+        finally:
+            selector.close()
+        self.assertFalse(os.path.exists(directory))
+
+    def test_threshold_from_runs(self):
+        selector = ExternalSelector(10, run_records=100)
+        try:
+            for value in range(100):
+                selector.add_record(Record(value, f"http://example.com/{value}"))
+            self.assertEqual(selector.threshold, 90)
+            selector.add_record(Record(5, "http://example.com/low"))
+            self.assertEqual(selector.rejected, 1)
+            self.assertEqual([record.value for record in selector.get_top_records()], list(range(99, 89, -1)))
+        finally:
+            selector.close()
+
+    @patch.object(selection, 'MERGE_FAN_IN', 4)
+    def test_runs_are_merged(self):
+        records = random_records(5)
+        selector = ExternalSelector(1000, run_records=300)
+        try:
+            for record in records[:1200]:
+                selector.add_record(record)
+            # No run holds 1000 records, the merge of the first four does
+            self.assertEqual(len(selector.runs), 1)
+            self.assertEqual(selector.threshold, expected_top(records[:1200], 1000)[-1].value)
+            for record in records[1200:]:
+                selector.add_record(record)
+            self.assertLess(len(selector.runs), 4)
+            self.assertEqual(len(os.listdir(selector.directories[0])), len(selector.runs))
+            self.assertEqual(selector.get_top_records(), expected_top(records, 1000))
+        finally:
+            selector.close()
+
+    @patch.object(selection, 'MERGE_FAN_IN', 4)
+    def test_merge(self):
+        records = random_records(4)
+        selectors = [ExternalSelector(1000, run_records=700) for _ in range(2)]
+        for index, record in enumerate(records):
+            selectors[index % 2].add_record(record)
+        merged = selectors[0].empty_copy()
+        try:
+            merged.merge(*selectors)
+            self.assertEqual(merged.get_top_records(), expected_top(records, 1000))
+        finally:
+            merged.close()
+        self.assertEqual(merged.directories, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from unittest.mock import patch
+
+from src.main import FileProcessorService
+from src.models import Estimate, GroupedRecord, Record
+from src.server import FairExecutor, QueryClient, QueryError, QueryServer, record_from_dict, service_options
+
+
+class TestFairExecutor(unittest.TestCase):
+    def setUp(self):
+        self.pool = ThreadPoolExecutor(1)
+        self.addCleanup(self.pool.shutdown)
+        self.executor = FairExecutor(self.pool, slots=1)
+        self.release = threading.Event()
+        self.order = []
+
+    def task(self, name: str) -> str:
+        self.release.wait()
+        self.order.append(name)
+        return name
+
+    def test_sessions_take_turns(self):
+        large, small = self.executor.session(), self.executor.session()
+        futures = [large.submit(self.task, f"large-{i}") for i in range(4)]
+        futures += [small.submit(self.task, f"small-{i}") for i in range(2)]
+        self.assertEqual(self.executor.running, 1)
+        self.release.set()
+        self.assertEqual([future.result(timeout=5) for future in futures],
+                         ["large-0", "large-1", "large-2", "large-3", "small-0", "small-1"])
+        # The small query is not queued behind every task of the large one
+        self.assertEqual(self.order, ["large-0", "large-1", "small-0", "large-2", "small-1", "large-3"])
+        self.assertEqual(self.executor.running, 0)
+
+    def test_shutdown_cancels_queued_tasks(self):
+        session = self.executor.session()
+        running, queued = session.submit(self.task, "running"), session.submit(self.task, "queued")
+        session.shutdown(cancel_futures=True)
+        self.release.set()
+        self.assertEqual(running.result(timeout=5), "running")
+        self.assertTrue(queued.cancelled())
+
+    def test_exception_is_passed_on(self):
+        future = self.executor.session().submit(int, "x")
+        with self.assertRaises(ValueError):
+            future.result(timeout=5)
+        self.assertEqual(self.executor.running, 0)
+
+
+class TestServiceOptions(unittest.TestCase):
+    def test_options(self):
+        options = service_options({'path': 'a.log', 'top': 5, 'memory_budget': 2, 'url_prefix': 'http://a'})
+        self.assertEqual(options['file_path'], ['a.log'])
+        self.assertEqual(options['top'], 5)
+        self.assertEqual(options['engine'], 'process')
+        self.assertEqual(options['memory_budget'], 2 * 1024 * 1024)
+        self.assertEqual(options['line_filter'].url_prefix, 'http://a')
+        self.assertIsNone(service_options({'path': ['a.log', 'b/']})['line_filter'])
+
+    def test_invalid_options(self):
+        for request in ({'top': 5}, {'path': '-'}, {'path': 'a.log', 'follow': True}, {'path': 'a.log', 'top': '5'},
+                        {'path': 'a.log', 'top': True}, {'path': 'a.log', 'sketch': 1},
+                        {'path': 'a.log', 'engine': 'gpu'}, {'path': 'a.log', 'approximate': 2},
+                        {'path': 'a.log', 'min_value': 5, 'max_value': 1}, ['a.log']):
+            with self.subTest(request=request), self.assertRaises(ValueError):
+                service_options(request)
+
+    def test_record_from_dict(self):
+        for record in (Record(1, "a"), Estimate(2, "b", 1), GroupedRecord(3, "c", "g")):
+            self.assertEqual(record_from_dict(record._asdict()), record)
+
+
+class TestQueryServer(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'access.log')
+        with open(self.path, 'w') as file:
+            file.writelines(f"http://example.com/{i % 7} {(i * 37) % 101}\n" for i in range(500))
+        self.socket_path = os.path.join(directory, 'topn.sock')
+
+    def start(self, **kwargs) -> QueryServer:
+        server = QueryServer(workers=2, **kwargs)
+        self.addCleanup(server.close)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def test_query_over_tcp(self):
+        server = self.start()
+        expected = FileProcessorService(self.path, 5, 0).process_file()
+        with QueryClient(port=server.address[1]) as client:
+            for engine in ('process', 'mmap', 'text'):
+                with self.subTest(engine=engine):
+                    self.assertEqual(client.query(self.path, top=5, engine=engine, chunk_size=256), expected)
+            answer = client.request({'path': self.path, 'top': 2, 'aggregate': 'count'})
+            self.assertEqual(answer['records'], [{'value': 72, 'url': 'http://example.com/2'},
+                                                 {'value': 72, 'url': 'http://example.com/1'}])
+            self.assertEqual(answer['stats']['lines'], 500)
+
+    def test_default_workers(self):
+        with patch('src.server.available_cpus', return_value=1):
+            with QueryServer() as server:
+                self.assertEqual(server.workers, 1)
+
+    def test_query_over_unix_socket(self):
+        self.start(socket_path=self.socket_path)
+        self.assertEqual(os.stat(self.socket_path).st_mode & 0o777, 0o600)
+        with QueryClient(self.socket_path) as client:
+            with self.assertRaises(QueryError):
+                client.query(self.path + '.missing')
+            with self.assertRaises(QueryError):
+                client.query(self.path, top='5')
+            # The connection is still usable after an error
+            self.assertEqual(len(client.query(self.path, top=3, group_by='host')), 3)
+
+    def test_broken_pool_is_replaced(self):
+        server = self.start()
+        broken = server.pool
+        with self.assertRaises(BrokenProcessPool):
+            broken.submit(os._exit, 1).result()
+        expected = FileProcessorService(self.path, 5, 0).process_file()
+        with QueryClient(port=server.address[1]) as client:
+            with self.assertRaisesRegex(QueryError, "worker process died"):
+                client.query(self.path, top=5, chunk_size=256)
+            self.assertEqual(client.query(self.path, top=5, chunk_size=256), expected)
+        self.assertIsNot(server.pool, broken)
+
+    def test_concurrent_queries(self):
+        server = self.start()
+        expected = FileProcessorService(self.path, 4, 0).process_file()
+        results = []
+
+        def query():
+            with QueryClient(port=server.address[1]) as client:
+                results.append(client.query(self.path, top=4, chunk_size=128))
+
+        threads = [threading.Thread(target=query) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [expected] * 4)
+        self.assertEqual(server.executor.running, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,30 @@
+import json
+import unittest
+
+from src.stats import ChunkStats, ScanStats
+
+
+class TestScanStats(unittest.TestCase):
+    def test_merge(self):
+        stats = ScanStats(io_s=1.0, lines=10, total_s=5.0, chunks=[ChunkStats(0, 10, 1.0, 10, 1)])
+        stats.merge(ScanStats(io_s=0.5, lines=5, malformed_lines=1, total_s=3.0,
+                              chunks=[ChunkStats(10, 20, 2.0, 5, 2)]))
+        self.assertEqual(stats.io_s, 1.5)
+        self.assertEqual(stats.lines, 15)
+        self.assertEqual(stats.malformed_lines, 1)
+        self.assertEqual(stats.total_s, 5.0)
+        self.assertEqual([chunk.start for chunk in stats.chunks], [0, 10])
+
+    def test_add_scan(self):
+        stats = ScanStats()
+        stats.add_scan(seconds=3.0, io_s=1.0, heap_s=0.5)
+        self.assertEqual(stats.parse_s, 1.5)
+        self.assertEqual(stats.heap_s, 0.5)
+
+    def test_format(self):
+        stats = ScanStats(total_s=2.0, lines=100, bytes_read=2048, chunks=[ChunkStats(0, 2048, 1.5, 100, 7)])
+        self.assertEqual(json.loads(stats.format('json'))['chunks'][0]['worker'], 7)
+        text = stats.format('text')
+        self.assertIn("lines               100", text)
+        self.assertIn("50 lines/s", text)
+        self.assertIn("(worker 7)", text)